@@ -0,0 +1,271 @@
+import threading
+import time
+from operator import attrgetter
+
+import numpy as np
+
+from reading import Environment, Reading
+
+# Numeric fields kept per sample: (name, nested under 'environment', int in the schema)
+FIELDS = (
+    ('bodyTemperature', False, True),
+    ('respiratoryRate', False, True),
+    ('heartRate', False, True),
+    ('spo2', False, True),
+    ('altitude', False, True),
+    ('relativeHumidity', False, True),
+    ('battery', False, True),
+    ('rssi', False, True),
+    ('aqi', True, True),
+    ('voc', True, False),
+    ('ambientPressure', True, False),
+    ('ambientTemperature', True, True),
+)
+TOP_FIELDS = tuple((column, name, as_int) for column, (name, nested, as_int) in enumerate(FIELDS) if not nested)
+ENVIRONMENT_FIELDS = tuple((column, name, as_int) for column, (name, nested, as_int) in enumerate(FIELDS) if nested)
+assert [column for column, _, _ in TOP_FIELDS + ENVIRONMENT_FIELDS] == list(range(len(FIELDS)))
+NAN = float('nan')
+EMPTY_ENVIRONMENT = [NAN] * len(ENVIRONMENT_FIELDS)
+_top_values = attrgetter(*(name for _, name, _ in TOP_FIELDS))
+_environment_values = attrgetter(*(name for _, name, _ in ENVIRONMENT_FIELDS))
+
+# Outside these bounds a sample is an anomaly and goes out raw, with its neighbours
+NORMAL_RANGES = {
+    'heartRate': (40, 130),
+    'spo2': (92, 100),
+    'bodyTemperature': (35, 38),
+    'respiratoryRate': (8, 25),
+}
+
+
+def out_of_range(reading):
+    """Default anomaly test: an alert field is set, or a vital is outside NORMAL_RANGES."""
+    if reading.fallDamage or reading.textCommand is not None:
+        return True
+    for name, (low, high) in NORMAL_RANGES.items():
+        value = getattr(reading, name)
+        if value is not None and not low <= value <= high:
+            return True
+    return False
+
+
+class WindowAggregator:
+    """
+    Downsample per-device vitals to windowed min/mean/max summaries.
+
+    Samples are written into one preallocated float32 array of shape
+    (max_devices, capacity, len(FIELDS)), NaN where a reading didn't carry the
+    field: a ring buffer per device with no per-sample objects, about 7 KB per
+    device at the default capacity. Every `window` seconds a device's buffered
+    samples become one summary, passed to `emit`; summaries of devices that went
+    quiet are emitted by flush() (start() runs it periodically). A device sending
+    more than `capacity` samples in a window has each full ring folded into
+    running per-field count/sum/min/max before it wraps, so every sample counts.
+
+    A summary is a dict in the reading schema: the id/uid, each field's window
+    mean in its usual place, a 'summary' with {field: {min, mean, max}} and a
+    'window' with its start, end and sample count.
+
+    When `is_anomaly(reading)` is true (default out_of_range), raw samples are
+    passed through as well: the up to `context` samples before it that weren't
+    sent yet (rebuilt from the ring; float fields are float32 there), the anomaly
+    itself, and the next `context` samples.
+    """
+
+    def __init__(self, emit, window=60.0, capacity=128, context=5, max_devices=512,
+                 is_anomaly=out_of_range, clock=time.time):
+        self.emit = emit
+        self.window = window
+        self.capacity = capacity
+        self.context = context
+        self.is_anomaly = is_anomaly
+        self.clock = clock
+
+        self.values = np.full((max_devices, capacity, len(FIELDS)), np.nan, dtype=np.float32)
+        self.times = np.zeros((max_devices, capacity))
+        self.total = np.zeros(max_devices, dtype=np.int64)       # Samples written since the window opened
+        self.window_start = np.zeros(max_devices)
+        # Running stats of the samples folded out of the ring this window
+        self.folded_count = np.zeros((max_devices, len(FIELDS)), dtype=np.int64)
+        self.folded_sum = np.zeros((max_devices, len(FIELDS)))
+        self.folded_low = np.full((max_devices, len(FIELDS)), np.nan, dtype=np.float32)
+        self.folded_high = np.full((max_devices, len(FIELDS)), np.nan, dtype=np.float32)
+        self.raw_until = np.full(max_devices, -1, dtype=np.int64)  # Pass samples through up to this index
+        self.raw_sent = np.full(max_devices, -1, dtype=np.int64)  # Last sample index already sent raw
+        self.slots = {}
+        self.identities = []
+
+        self.lock = threading.Lock()
+        self.samples = 0
+        self.summaries = 0
+        self.raw = 0
+        self.anomalies = 0
+        self.overwritten = 0
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, interval=None):
+        """Emit summaries of idle devices from a background thread every `interval` seconds."""
+        if self._thread is None:
+            interval = interval or min(self.window, 5.0)
+            self._thread = threading.Thread(target=self._run, args=(interval,), name="aggregator", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None, flush=True):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if flush:
+            self.flush(force=True)
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            self.flush()
+
+    def push(self, reading):
+        """Add one reading (a Reading or a parse_data dict) for its device."""
+        if type(reading) is not Reading:
+            reading = Reading.from_dict(reading)
+        out = []
+        with self.lock:
+            slot = self._slot(reading.id, reading.uid)
+            now = self.clock()
+            if self.total[slot] and now - self.window_start[slot] >= self.window:
+                out.append(self._summarize(slot))
+            if not self.total[slot]:
+                self.window_start[slot] = now
+
+            index = int(self.total[slot])
+            position = index % self.capacity
+            if index >= self.capacity:
+                if not position:
+                    self._fold(slot, self.capacity)
+                self.overwritten += 1
+            # One array write per sample; None becomes NaN
+            row = [NAN if value is None else value for value in _top_values(reading)]
+            environment = reading.environment
+            row.extend([NAN if value is None else value for value in _environment_values(environment)]
+                       if environment is not None else EMPTY_ENVIRONMENT)
+            self.values[slot, position] = row
+            self.times[slot, position] = now
+            self.total[slot] = index + 1
+            self.samples += 1
+
+            if self.is_anomaly(reading):
+                self.anomalies += 1
+                first = max(self.raw_sent[slot] + 1, index - self.context, index - self.capacity + 1, 0)
+                out.extend(self._rebuild(slot, i) for i in range(first, index))
+                out.append(reading)
+                self.raw_sent[slot] = index
+                self.raw_until[slot] = index + self.context
+                self.raw += index - first + 1
+            elif index <= self.raw_until[slot]:
+                out.append(reading)
+                self.raw_sent[slot] = index
+                self.raw += 1
+
+        for item in out:
+            self.emit(item)
+
+    def flush(self, force=False):
+        """Emit summaries for every device whose window has elapsed (every device with samples if `force`)."""
+        with self.lock:
+            now = self.clock()
+            active = self.total[:len(self.identities)] > 0
+            if not force:
+                active &= now - self.window_start[:len(self.identities)] >= self.window
+            out = [self._summarize(slot) for slot in np.flatnonzero(active)]
+        for item in out:
+            self.emit(item)
+        return len(out)
+
+    def _slot(self, device_id, uid):
+        key = (device_id, uid)
+        slot = self.slots.get(key)
+        if slot is None:
+            slot = len(self.identities)
+            if slot == len(self.values):
+                raise ValueError(f"more than {slot} devices; raise max_devices")
+            self.slots[key] = slot
+            self.identities.append(key)
+        return slot
+
+    def _fold(self, slot, count):
+        block = self.values[slot, :count]
+        present = ~np.isnan(block)
+        self.folded_count[slot] += present.sum(axis=0)
+        self.folded_sum[slot] += np.where(present, block, 0).sum(axis=0, dtype=np.float64)
+        # fmin/fmax skip NaN without warning on all-NaN columns
+        np.fmin(self.folded_low[slot], np.fmin.reduce(block, axis=0), out=self.folded_low[slot])
+        np.fmax(self.folded_high[slot], np.fmax.reduce(block, axis=0), out=self.folded_high[slot])
+
+    def _summarize(self, slot):
+        total = int(self.total[slot])
+        last = (total - 1) % self.capacity
+        self._fold(slot, last + 1)
+        counts = self.folded_count[slot]
+        means = self.folded_sum[slot] / np.maximum(counts, 1)
+        lows = self.folded_low[slot]
+        highs = self.folded_high[slot]
+
+        device_id, uid = self.identities[slot]
+        summary = {'id': device_id, 'uid': uid}
+        stats = {}
+        environment = {}
+        for column, (name, nested, as_int) in enumerate(FIELDS):
+            if not counts[column]:
+                continue
+            mean = round(float(means[column]), 2)
+            (environment if nested else summary)[name] = mean
+            stats[name] = {'min': _value(lows[column], as_int), 'mean': mean, 'max': _value(highs[column], as_int)}
+        if environment:
+            summary['environment'] = environment
+        summary['summary'] = stats
+        summary['window'] = {'start': float(self.window_start[slot]), 'end': float(self.times[slot, last]),
+                             'samples': total}
+
+        # Indexes restart with the next window; raw pass-through after an anomaly carries over
+        shift = self.total[slot]
+        self.total[slot] = 0
+        self.folded_count[slot] = 0
+        self.folded_sum[slot] = 0
+        self.folded_low[slot] = np.nan
+        self.folded_high[slot] = np.nan
+        self.raw_sent[slot] -= shift
+        self.raw_until[slot] -= shift
+        self.summaries += 1
+        return summary
+
+    def _rebuild(self, slot, index):
+        row = self.values[slot, index % self.capacity]
+        device_id, uid = self.identities[slot]
+        reading = Reading(device_id, uid)
+        for column, name, as_int in TOP_FIELDS:
+            if row[column] == row[column]:
+                setattr(reading, name, _value(row[column], as_int))
+        environment = {name: _value(row[column], as_int)
+                       for column, name, as_int in ENVIRONMENT_FIELDS if row[column] == row[column]}
+        if environment:
+            reading.environment = Environment(**environment)
+        return reading
+
+    def stats(self):
+        with self.lock:
+            return {
+                "devices": len(self.identities),
+                "samples": self.samples,
+                "summaries": self.summaries,
+                "raw": self.raw,
+                "anomalies": self.anomalies,
+                "overwritten": self.overwritten,
+                "buffer_bytes": (self.values.nbytes + self.times.nbytes + self.folded_count.nbytes
+                                 + self.folded_sum.nbytes + self.folded_low.nbytes + self.folded_high.nbytes),
+            }
+
+
+def _value(value, as_int):
+    # float32 -> the schema's int, or a float without float32 noise
+    return int(value) if as_int else round(float(value), 4)
@@ -0,0 +1,154 @@
+import collections
+import itertools
+import queue
+import random
+import threading
+import time
+
+import requests
+
+from backend import RETRY_STATUSES
+
+# Lanes, highest priority first
+EMERGENCY = 0
+COMMAND = 1
+
+# Messages that go out on the emergency lane; every other alert is a command reply
+EMERGENCY_WORDS = ("EMERGENCY", "FALL", "HELP")
+
+# Seconds from detection to the backend accepting the alert
+BUDGETS = {EMERGENCY: 1.0, COMMAND: 5.0}
+
+
+def classify(message):
+    """The lane for an alert message: EMERGENCY for falls, emergencies and HELP, else COMMAND."""
+    upper = message.upper()
+    return EMERGENCY if any(word in upper for word in EMERGENCY_WORDS) else COMMAND
+
+
+class AlertLane:
+    """
+    Post alerts to /api/alert/watchTosw on their own threads, ahead of telemetry.
+
+    submit() only queues, so the thread that parsed the alert (the serial read loop)
+    never waits on the backend. Queued alerts go out highest lane first, then in
+    order of detection. Each lane has a latency budget: an alert is retried with
+    short jittered backoff within its budget; after that it keeps being retried with
+    longer backoff and is counted as over budget. Only an alert the backend rejects
+    outright (a 4xx) is dropped. The backend client holds routine reading batches
+    back while an alert is in flight, and to one in flight from the moment an
+    alert is queued (BackendClient.expect_urgent).
+
+    stats() reports per-lane detection-to-accepted latency.
+    """
+
+    def __init__(self, backend, budgets=None, workers=2, retry_delay=0.05, max_retry_delay=5.0):
+        self.backend = backend
+        self.budgets = dict(BUDGETS)
+        self.budgets.update(budgets or {})
+        self.workers = workers
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.queue = queue.PriorityQueue()
+        self._order = itertools.count()
+
+        self.lock = threading.Lock()
+        # Recent latencies per lane, for percentiles
+        self.latencies = {lane: collections.deque(maxlen=1000) for lane in self.budgets}
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.over_budget = 0
+
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        if not self._threads:
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"alerts-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for _ in self._threads:
+            self.queue.put((-1, next(self._order), None))
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, jawaan_id, message, lane=None, detected=None):
+        """Queue an alert; `detected` is when it was seen (time.monotonic()), default now."""
+        if lane is None:
+            lane = classify(message)
+        detected = time.monotonic() if detected is None else detected
+        self.backend.expect_urgent()
+        self.queue.put((lane, next(self._order), (jawaan_id, message, detected)))
+
+    def pending(self):
+        return self.queue.qsize()
+
+    def _run(self):
+        while True:
+            lane, _, alert = self.queue.get()
+            if alert is None:
+                return
+            self._send(lane, *alert)
+
+    def _send(self, lane, jawaan_id, message, detected):
+        payload = {"jawaanId": jawaan_id, "message": message}
+        deadline = detected + self.budgets[lane]
+        attempt = 0
+        while not self._stop.is_set():
+            try:
+                # Retries are paced here against the budget, not inside the client
+                self.backend.request("alert", json=payload, retries=0)
+                break
+            except requests.RequestException as e:
+                if e.response is not None and e.response.status_code not in RETRY_STATUSES:
+                    print(f"Alert rejected by the backend: {e}")
+                    with self.lock:
+                        self.failed += 1
+                    return
+                attempt += 1
+                with self.lock:
+                    self.retries += 1
+                delay = random.uniform(0, min(self.max_retry_delay, self.retry_delay * 2 ** attempt))
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    delay = min(delay, remaining)
+                print(f"Error sending alert (attempt {attempt}), retrying: {e}")
+                self._stop.wait(delay)
+        else:
+            return
+
+        latency = time.monotonic() - detected
+        with self.lock:
+            self.sent += 1
+            self.latencies[lane].append(latency)
+            if latency > self.budgets[lane]:
+                self.over_budget += 1
+        print(f"Alert sent successfully API2: {payload}")
+
+    def stats(self):
+        with self.lock:
+            lanes = {}
+            for lane, latencies in self.latencies.items():
+                ordered = sorted(latencies)
+                name = "emergency" if lane == EMERGENCY else "command"
+                lanes[name] = {
+                    "samples": len(ordered),
+                    "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1) if ordered else None,
+                    "p99_ms": round(ordered[int(len(ordered) * 0.99)] * 1000, 1) if ordered else None,
+                    "max_ms": round(ordered[-1] * 1000, 1) if ordered else None,
+                }
+            return {
+                "queued": self.queue.qsize(),
+                "sent": self.sent,
+                "failed": self.failed,
+                "retries": self.retries,
+                "over_budget": self.over_budget,
+                "lanes": lanes,
+            }
@@ -0,0 +1,135 @@
+import math
+import threading
+
+from reading import Reading
+
+# Vital-sign thresholds with hysteresis: (field, direction, trigger, clear). A "low"
+# rule fires when the value is at or below `trigger` and re-arms only once it is back
+# at or above `clear`; "high" is the mirror image. One alert per excursion.
+THRESHOLDS = (
+    ('spo2', 'low', 90, 94),
+    ('heartRate', 'high', 130, 115),
+    ('heartRate', 'low', 40, 50),
+    ('bodyTemperature', 'high', 38, 37),
+    ('respiratoryRate', 'high', 30, 24),
+    ('respiratoryRate', 'low', 6, 10),
+)
+
+# Fields watched for sudden changes against their own EWMA, with a floor on the
+# standard deviation so a flat signal doesn't turn a 1-unit step into a huge z-score
+Z_FIELDS = {
+    'heartRate': 3.0,
+    'spo2': 1.0,
+    'respiratoryRate': 2.0,
+    'bodyTemperature': 0.5,
+}
+
+
+class VitalsDetector:
+    """
+    Incremental per-device anomaly detection on parsed readings.
+
+    observe() costs O(1) per sample: per device and field it keeps an exponentially
+    weighted mean and variance (weight `alpha`) and nothing else. A sample raises
+    an alert through `on_alert(jawaan_id, message)` (the scripts' send_alert_to_backend)
+    as soon as it is seen, when
+
+    - it crosses a THRESHOLDS rule; the rule then stays latched until the value
+      passes its clear level (hysteresis), so a value hovering at the threshold
+      alerts once. The message starts with "EMERGENCY" for the alert lane.
+    - after `warmup` samples, it is more than `z_threshold` standard deviations from
+      the field's EWMA; latched until the z-score drops below `z_clear`.
+
+    observe() returns True when the sample raised an alert, so it can serve as the
+    aggregator's is_anomaly.
+    """
+
+    def __init__(self, on_alert, thresholds=THRESHOLDS, z_fields=None, alpha=0.05,
+                 z_threshold=4.0, z_clear=2.0, warmup=30):
+        self.on_alert = on_alert
+        self.thresholds = tuple(thresholds)
+        self.z_fields = tuple((Z_FIELDS if z_fields is None else z_fields).items())
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.z_clear = z_clear
+        self.warmup = warmup
+
+        self.lock = threading.Lock()
+        # (id, uid) -> [samples, latched rules, then mean, variance, latched per z-field]
+        self.devices = {}
+        self.samples = 0
+        self.alerts = 0
+        self.threshold_alerts = 0
+        self.z_alerts = 0
+
+    def observe(self, reading):
+        """Update the device's statistics with `reading`; returns True if it raised an alert."""
+        if type(reading) is not Reading:
+            reading = Reading.from_dict(reading)
+        alerts = []
+        with self.lock:
+            self.samples += 1
+            state = self.devices.get((reading.id, reading.uid))
+            if state is None:
+                state = [0, [False] * len(self.thresholds)] + [None, 0.0, False] * len(self.z_fields)
+                self.devices[(reading.id, reading.uid)] = state
+            state[0] += 1
+
+            latched = state[1]
+            for i, (name, direction, trigger, clear) in enumerate(self.thresholds):
+                value = getattr(reading, name)
+                if value is None:
+                    continue
+                if latched[i]:
+                    if value >= clear if direction == 'low' else value <= clear:
+                        latched[i] = False
+                elif value <= trigger if direction == 'low' else value >= trigger:
+                    latched[i] = True
+                    self.threshold_alerts += 1
+                    alerts.append(f"EMERGENCY: {name} {value} {'at or below' if direction == 'low' else 'at or above'} "
+                                  f"{trigger} ({reading.id})")
+
+            alpha = self.alpha
+            offset = 2
+            for name, min_std in self.z_fields:
+                value = getattr(reading, name)
+                if value is not None:
+                    mean = state[offset]
+                    if mean is None:
+                        state[offset] = float(value)
+                    else:
+                        variance = state[offset + 1]
+                        z = abs(value - mean) / max(math.sqrt(variance), min_std)
+                        if state[offset + 2]:
+                            if z < self.z_clear:
+                                state[offset + 2] = False
+                        elif z > self.z_threshold and state[0] > self.warmup:
+                            state[offset + 2] = True
+                            self.z_alerts += 1
+                            alerts.append(f"Warning: {name} changed to {value} from ~{mean:.0f} "
+                                          f"(z={z:.1f}) ({reading.id})")
+                        diff = value - mean
+                        increment = alpha * diff
+                        state[offset] = mean + increment
+                        state[offset + 1] = (1 - alpha) * (variance + diff * increment)
+                offset += 3
+            self.alerts += len(alerts)
+
+        for message in alerts:
+            self.on_alert(reading.uid, message)
+        return bool(alerts)
+
+    def forget(self, device_id, uid=None):
+        """Drop a device's statistics, e.g. when a band is moved to another wearer."""
+        with self.lock:
+            self.devices.pop((device_id, uid), None)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "devices": len(self.devices),
+                "samples": self.samples,
+                "alerts": self.alerts,
+                "threshold_alerts": self.threshold_alerts,
+                "z_alerts": self.z_alerts,
+            }
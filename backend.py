@@ -0,0 +1,234 @@
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+BASE_URL = "https://cms-backend-five.vercel.app"
+
+
+class Endpoint:
+    """
+    How one backend endpoint is called: path, (connect, read) timeout, concurrency
+    and retries. Requests to an `urgent` endpoint hold back routine ones.
+    """
+
+    def __init__(self, method, path, timeout, max_concurrent, retries, urgent=False):
+        self.method = method
+        self.path = path
+        self.timeout = timeout
+        self.max_concurrent = max_concurrent
+        self.retries = retries
+        self.urgent = urgent
+
+
+ENDPOINTS = {
+    # Readings have their own outbox and backoff in BatchUploader, so one quick retry is enough
+    "readings": Endpoint("POST", "/api/ble/esp", (3.05, 10), 4, 1),
+    "alert": Endpoint("POST", "/api/alert/watchTosw", (3.05, 5), 4, 3, urgent=True),
+    "alert_replies": Endpoint("GET", "/api/alert/readAlertReply", (3.05, 10), 1, 1),
+    "alert_read": Endpoint("PUT", "/api/alert/readedSwToW/{}", (3.05, 5), 2, 3),
+    "connection_status": Endpoint("POST", "/api/device/connectionStatus", (3.05, 5), 2, 2),
+}
+
+# Worth another attempt: the request may not have reached the backend, or it was overloaded
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class BackendClient:
+    """
+    One HTTP client for every backend endpoint the gateway calls.
+
+    All requests share one requests.Session, so connections to the backend are
+    kept alive and reused instead of paying a TCP+TLS handshake per call. Each
+    endpoint has its own timeout, a cap on requests in flight (a burst of alert
+    posts can't take every pooled connection from the uploader) and a retry count;
+    retries back off exponentially with full jitter so gateways that failed
+    together don't retry in lockstep.
+
+    While a request to an urgent endpoint (alerts) is in flight, routine requests
+    wait up to `max_yield` seconds before starting, so on a slow uplink an alert is
+    not queued behind a backlog of reading batches. Requests already in flight
+    can't be preempted, so from expect_urgent() (an alert was queued) until
+    `urgent_hold` seconds after the last urgent request, routine requests are
+    also capped at one in flight: alerts come in bursts (a fall, HELP, the
+    operator's reply), and the next one then waits for at most one batch.
+
+    `request` returns the final response or raises the last error; the helpers
+    for alerts and status return True/False and log, as the scripts did.
+
+    With `metrics` (metrics.Metrics), every attempt's latency and status are
+    recorded per endpoint.
+    """
+
+    def __init__(self, base_url=BASE_URL, endpoints=None, pool_size=8,
+                 retry_delay=0.2, max_retry_delay=5.0, max_yield=5.0, urgent_hold=2.0, session=None,
+                 metrics=None):
+        self.base_url = base_url
+        self.endpoints = dict(ENDPOINTS)
+        self.endpoints.update(endpoints or {})
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_yield = max_yield
+        self.urgent_hold = urgent_hold
+        self.metrics = metrics
+
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.limits = {name: threading.BoundedSemaphore(endpoint.max_concurrent)
+                       for name, endpoint in self.endpoints.items()}
+        self.lock = threading.Lock()
+        self.counters = {name: {"requests": 0, "retries": 0, "failures": 0, "time_ms": 0.0}
+                         for name in self.endpoints}
+        self.urgent_in_flight = 0
+        self.urgent_until = 0.0  # Routine requests are held to one in flight until then
+        self.routine_in_flight = 0
+        self.urgent_idle = threading.Condition(self.lock)
+        self.yields = 0
+
+    def url(self, name, *path_args):
+        return self.base_url + self.endpoints[name].path.format(*path_args)
+
+    def request(self, name, *path_args, url=None, retries=None, **kwargs):
+        """
+        Call endpoint `name`. `path_args` fill the path template; `url` replaces
+        the whole URL (e.g. a local stub); other keyword arguments go to
+        Session.request. Raises requests.RequestException if every attempt fails.
+        """
+        endpoint = self.endpoints[name]
+        url = url or self.url(name, *path_args)
+        retries = endpoint.retries if retries is None else retries
+        kwargs.setdefault("timeout", endpoint.timeout)
+        if endpoint.urgent:
+            with self.lock:
+                self.urgent_in_flight += 1
+            try:
+                return self._request(name, endpoint, url, retries, kwargs)
+            finally:
+                with self.lock:
+                    self.urgent_in_flight -= 1
+                    self.urgent_until = time.monotonic() + self.urgent_hold
+                    if not self.urgent_in_flight:
+                        self.urgent_idle.notify_all()
+        return self._request(name, endpoint, url, retries, kwargs)
+
+    def expect_urgent(self):
+        """An urgent request is coming (an alert was queued): hold routine requests to one in flight from now."""
+        with self.lock:
+            self.urgent_until = max(self.urgent_until, time.monotonic() + self.urgent_hold)
+
+    def _routine_blocked(self):
+        if self.urgent_in_flight:
+            return True
+        return self.routine_in_flight >= 1 and time.monotonic() < self.urgent_until
+
+    def _start_routine(self):
+        with self.lock:
+            if self._routine_blocked():
+                self.yields += 1
+                deadline = time.monotonic() + self.max_yield
+                while self._routine_blocked():
+                    now = time.monotonic()
+                    if now >= deadline:
+                        break
+                    # Nothing notifies when the hold expires, so wake for it too
+                    wake = deadline if self.urgent_in_flight else min(deadline, self.urgent_until)
+                    self.urgent_idle.wait(max(wake - now, 0.001))
+            self.routine_in_flight += 1
+
+    def _end_routine(self):
+        with self.lock:
+            self.routine_in_flight -= 1
+            self.urgent_idle.notify_all()
+
+    def _request(self, name, endpoint, url, retries, kwargs):
+        counters = self.counters[name]
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(random.uniform(0, min(self.max_retry_delay, self.retry_delay * 2 ** attempt)))
+            if not endpoint.urgent:
+                self._start_routine()
+            start = time.perf_counter()
+            status = "error"
+            try:
+                try:
+                    with self.limits[name]:
+                        response = self.session.request(endpoint.method, url, **kwargs)
+                finally:
+                    if not endpoint.urgent:
+                        self._end_routine()
+                status = response.status_code
+                if response.status_code in RETRY_STATUSES and attempt < retries:
+                    raise requests.HTTPError(f"{response.status_code} from {url}", response=response)
+                response.raise_for_status()
+                return response
+            except requests.RequestException as e:
+                error = e
+                # A 4xx other than 429 will fail the same way again
+                if e.response is not None and e.response.status_code not in RETRY_STATUSES:
+                    break
+            finally:
+                elapsed = time.perf_counter() - start
+                with self.lock:
+                    counters["requests"] += 1
+                    counters["time_ms"] += elapsed * 1000
+                    if attempt:
+                        counters["retries"] += 1
+                if self.metrics is not None:
+                    self.metrics.request(name, elapsed, status)
+        with self.lock:
+            counters["failures"] += 1
+        raise error
+
+    def send_alert(self, jawaan_id, message):
+        payload = {
+            "jawaanId": jawaan_id,
+            "message": message
+        }
+        try:
+            self.request("alert", json=payload)
+            print(f"Alert sent successfully API2: {payload}")
+            return True
+        except requests.RequestException as e:
+            print(f"Error sending alert: {e}")
+            return False
+
+    def mark_read(self, message_id, url=None):
+        try:
+            self.request("alert_read", message_id, url=url)
+            return True
+        except requests.RequestException as e:
+            print(f"Error deleting message with ID {message_id}: {e}")
+            return False
+
+    def send_connection_status(self, device_id, status):
+        try:
+            self.request("connection_status", json={"deviceId": device_id, "status": status})
+            print(f"Device status {status} sent successfully")
+            return True
+        except requests.RequestException as e:
+            print(f"Error sending device status: {e}")
+            return False
+
+    def send_connection_statuses(self, statuses):
+        """Post several (device_id, status) updates in one request, as a JSON array."""
+        try:
+            self.request("connection_status", json=[{"deviceId": device_id, "status": status}
+                                                    for device_id, status in statuses])
+            print(f"Status of {len(statuses)} devices sent successfully")
+            return True
+        except requests.RequestException as e:
+            print(f"Error sending status of {len(statuses)} devices: {e}")
+            return False
+
+    def stats(self):
+        with self.lock:
+            return {
+                name: dict(counters, avg_ms=round(counters["time_ms"] / counters["requests"], 2)
+                           if counters["requests"] else None, time_ms=round(counters["time_ms"], 1))
+                for name, counters in self.counters.items()
+            }
@@ -0,0 +1,57 @@
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import telemetry
+from aggregate import WindowAggregator
+from bench_deadband import wearable_lines
+from encoding import get_encoder
+
+DEVICES = 500
+SECONDS = 600
+SPIKE_EVERY = 240  # A tachycardia sample now and then, to exercise the raw pass-through
+
+
+def main():
+    rng = random.Random(19)
+    per_device = []
+    for device in range(DEVICES):
+        lines = [line for _, line in wearable_lines(rng, SECONDS)]
+        for second in range(device % SPIKE_EVERY, SECONDS, SPIKE_EVERY):
+            lines[second] = lines[second].replace("Heart Rate: ", "Heart Rate: 1", 1)
+        per_device.append([telemetry.parse_reading(line, f"LA10AH{device:04d}", f"JW{device:03d}")
+                           for line in lines])
+
+    encoder = get_encoder()
+    emitted = []
+    now = [0.0]
+    tracemalloc.start()
+    aggregator = WindowAggregator(emitted.append, window=60, max_devices=DEVICES, clock=lambda: now[0])
+    buffers = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for second in range(SECONDS):
+        now[0] = second
+        for readings in per_device:
+            aggregator.push(readings[second])
+    now[0] = SECONDS
+    aggregator.flush()
+    elapsed = time.perf_counter() - start
+
+    raw_bytes = sum(len(encoder.encode(r)) for readings in per_device for r in readings)
+    sent_bytes = sum(len(encoder.encode(item)) for item in emitted)
+    stats = aggregator.stats()
+    samples = DEVICES * SECONDS
+    print(f"{DEVICES} devices x {SECONDS} s at 1 Hz: {samples:,} samples -> {len(emitted):,} uploads "
+          f"({stats['summaries']:,} summaries, {stats['raw']:,} raw around {stats['anomalies']:,} anomalies)")
+    print(f"uploaded bytes: {raw_bytes:,} -> {sent_bytes:,} ({raw_bytes / sent_bytes:.1f}x fewer)")
+    print(f"ring buffers: {buffers / 1024:.0f} KiB for {DEVICES} devices ({buffers / DEVICES / 1024:.1f} KiB each)")
+    print(f"push cost: {elapsed / samples * 1e6:.2f} us/sample (summaries included)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from downlink import AlertFetcher
+from stub_backend import StubBackend
+
+FLEET_SIZES = (10, 100, 500)
+MESSAGES = 2000
+ROUNDS = 6  # The list changes on rounds 0 and 3 only
+
+
+def alerts(devices, version):
+    return [{"messageId": f"m{version}-{i}", "jawaanId": f"JW{i % devices:03d}",
+             "message": "YES", "resolved": i % 3 == 0} for i in range(MESSAGES)]
+
+
+# What every script did before: one full GET and linear scan per device per interval
+def legacy_fetch(url, uid, last_message_id):
+    response = requests.get(url)
+    if response.status_code == 200:
+        data = response.json()
+        if data["success"]:
+            for message in data["mssg"]:
+                if message["jawaanId"] == uid and not message["resolved"]:
+                    if message["messageId"] != last_message_id.get(uid):
+                        last_message_id[uid] = message["messageId"]
+                        return message["message"]
+    return None
+
+
+def run_legacy(backend, url, devices):
+    last_message_id = {}
+    for round_number in range(ROUNDS):
+        if round_number in (0, 3):
+            backend.set_alerts(alerts(devices, round_number))
+        for i in range(devices):
+            legacy_fetch(url, f"JW{i:03d}", last_message_id)
+
+
+def run_shared(backend, url, devices):
+    fetcher = AlertFetcher(url)
+    delivered = [0]
+    for i in range(devices):
+        fetcher.register(f"JW{i:03d}", lambda message: delivered.__setitem__(0, delivered[0] + 1))
+    for round_number in range(ROUNDS):
+        if round_number in (0, 3):
+            backend.set_alerts(alerts(devices, round_number))
+        fetcher.poll_once()
+
+
+def main():
+    backend = StubBackend().start()
+    url = backend.url + "/api/alert/readAlertReply"
+    for devices in FLEET_SIZES:
+        for name, run in (("per-device fetch", run_legacy), ("AlertFetcher", run_shared)):
+            backend.reset()
+            start = time.perf_counter()
+            run(backend, url, devices)
+            elapsed = time.perf_counter() - start
+            print(f"{devices:4d} devices  {name:17s} {backend.requests:6d} GETs  "
+                  f"{backend.bytes_sent / 1e6:8.2f} MB downloaded  {elapsed / ROUNDS * 1000:9.1f} ms per interval")
+    backend.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import telemetry
+from alerts import AlertLane
+from backend import ENDPOINTS, BackendClient, Endpoint
+from bench_frames import text_line
+from stub_backend import StubBackend
+from uploader import BatchUploader
+
+LINES = 6000
+RATE = 1000        # Lines per second from the serial port
+ALERT_EVERY = 250  # Every 250th line is an emergency, a HELP or a reply
+SERVICE_TIME = 0.03
+BACKLOG_DRAINS = 3  # Other uploaders draining their outboxes after an outage, back to back
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000
+
+
+def line(i):
+    if i % ALERT_EVERY == ALERT_EVERY - 1:
+        return ("Emergency", "HELP", "YES")[i // ALERT_EVERY % 3]
+    return text_line(i)
+
+
+def run(lanes):
+    # The backend works one request at a time, so alerts and reading batches compete
+    stub = StubBackend(delay=SERVICE_TIME, max_concurrent=1).start()
+    if lanes:
+        client = BackendClient(stub.url)
+    else:
+        old = ENDPOINTS["alert"]
+        client = BackendClient(stub.url, endpoints={"alert": Endpoint(old.method, old.path, old.timeout,
+                                                                      old.max_concurrent, old.retries)})
+    uploader = BatchUploader(stub.url + "/api/ble/esp", max_batch=200, max_age=0.05, report_interval=0,
+                             backend=client).start()
+    lane = AlertLane(client).start()
+    body = uploader.encode_batch([telemetry.parse_reading(text_line(i), "LA10AH0002", "JW002") for i in range(200)])
+    stop = threading.Event()
+
+    def drain():
+        while not stop.is_set():
+            client.request("readings", url=stub.url + "/api/ble/esp", data=body,
+                           headers={'Content-Type': 'application/json'})
+
+    flood = [threading.Thread(target=drain, daemon=True) for _ in range(BACKLOG_DRAINS)]
+    for thread in flood:
+        thread.start()
+    sync_latencies = []
+    worst_stall = 0.0
+
+    start = time.monotonic()
+    for i in range(LINES):
+        due = start + i / RATE
+        now = time.monotonic()
+        if now < due:
+            time.sleep(due - now)
+        worst_stall = max(worst_stall, time.monotonic() - due)
+
+        data = line(i)
+        reading = telemetry.parse_reading(data, "LA10AH0001", "JW001")
+        if reading.fallDamage or telemetry.is_command(data):
+            message = "Emergency detected: FALLDAMAGE" if reading.fallDamage else data
+            if lanes:
+                lane.submit("JW001", message)
+            else:
+                # What multithreading.py did: post from the read loop and wait for it
+                detected = time.monotonic()
+                client.send_alert("JW001", message)
+                sync_latencies.append(time.monotonic() - detected)
+        if len(reading) > 2:
+            uploader.submit(reading)
+
+    while lanes and lane.stats()["sent"] < LINES // ALERT_EVERY:
+        time.sleep(0.01)
+    stop.set()
+    for thread in flood:
+        thread.join()
+    uploader.stop()
+    lane.stop()
+    stub.stop()
+    if lanes:
+        latencies = list(lane.latencies[0]) + list(lane.latencies[1])
+        return latencies, worst_stall, lane.stats(), client.yields
+    return sync_latencies, worst_stall, None, 0
+
+
+def main():
+    stdout = sys.stdout
+    results = {}
+    for lanes in (False, True):
+        sys.stdout = open(os.devnull, "w")  # The clients print every alert they send
+        try:
+            results[lanes] = run(lanes)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+    print(f"{LINES} lines at {RATE}/s, {LINES // ALERT_EVERY} alerts, {BACKLOG_DRAINS} backlog drains, "
+          f"backend serving one request at a time in {SERVICE_TIME * 1000:.0f} ms")
+    for lanes, label in ((False, "alert posted from read loop"), (True, "AlertLane + priority gate")):
+        latencies, stall, stats, yields = results[lanes]
+        print(f"{label:28s} alert latency p50 {percentile(latencies, 0.5):6.1f} ms  "
+              f"p99 {percentile(latencies, 0.99):6.1f} ms  max {max(latencies) * 1000:6.1f} ms  "
+              f"read loop stalled up to {stall * 1000:6.1f} ms")
+        if stats:
+            print(f"  lanes: {stats['lanes']}, over budget {stats['over_budget']}, "
+                  f"reading batches held back {yields} times")
+
+
+if __name__ == "__main__":
+    main()
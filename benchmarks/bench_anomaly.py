@@ -0,0 +1,67 @@
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import telemetry
+from anomaly import VitalsDetector
+from bench_deadband import wearable_lines
+
+SECONDS = 300
+FLEET_SIZES = (10, 100, 1000)
+
+
+def check():
+    alerts = []
+    detector = VitalsDetector(lambda jawaan_id, message: alerts.append(message))
+    rng = random.Random(20)
+    readings = [telemetry.parse_reading(line, "LA10AH0001", "JW001")
+                for _, line in wearable_lines(rng, 120) if "Emergency" not in line]
+    # A desaturation hovering around the threshold, then a sudden heart-rate jump
+    for second, spo2 in zip(range(60, 70), (91, 90, 89, 90, 91, 90, 89, 92, 94, 97)):
+        readings[second].spo2 = spo2
+    for second in range(90, 95):
+        readings[second].heartRate = 112
+    for reading in readings:
+        detector.observe(reading)
+    assert sum(message.startswith("EMERGENCY: spo2") for message in alerts) == 1, alerts
+    assert any(message.startswith("Warning: heartRate") for message in alerts), alerts
+    print("desaturation hovering at 89-91 for 7 s: one EMERGENCY (hysteresis); alerts raised:")
+    for message in alerts:
+        print(f"  {message}")
+
+
+def main():
+    check()
+    rng = random.Random(7)
+    template = [telemetry.parse_reading(line, "LA10AH0001", "JW001") for _, line in wearable_lines(rng, SECONDS)]
+    for devices in FLEET_SIZES:
+        readings = []
+        for second in range(SECONDS):
+            for device in range(devices):
+                reading = telemetry.parse_reading("", f"LA10AH{device:04d}", f"JW{device:03d}")
+                source = template[(second + device * 7) % SECONDS]
+                reading.heartRate, reading.spo2 = source.heartRate, source.spo2
+                reading.bodyTemperature, reading.respiratoryRate = source.bodyTemperature, source.respiratoryRate
+                if (second + device * 13) % 150 in (100, 101, 102):
+                    reading.spo2 = 88  # A short desaturation per device every 150 s
+                readings.append(reading)
+
+        latencies = []
+        raised = [0.0]
+        detector = VitalsDetector(lambda jawaan_id, message: raised.__setitem__(0, time.perf_counter()))
+        start = time.perf_counter()
+        for reading in readings:
+            before = time.perf_counter()
+            if detector.observe(reading):
+                latencies.append(raised[0] - before)
+        elapsed = time.perf_counter() - start
+        stats = detector.stats()
+        worst = max(latencies) * 1e6 if latencies else 0
+        print(f"{devices:5d} devices  {elapsed / len(readings) * 1e6:5.2f} us/sample  "
+              f"{stats['alerts']:4d} alerts, sample-to-alert at most {worst:5.1f} us")
+
+
+if __name__ == "__main__":
+    main()
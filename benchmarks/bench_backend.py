@@ -0,0 +1,71 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend import BackendClient, Endpoint
+from stub_backend import StubBackend
+
+CALLS = 500
+BURST = 64
+
+
+def per_call_ms(run):
+    start = time.perf_counter()
+    for i in range(CALLS):
+        run(i)
+    return (time.perf_counter() - start) / CALLS * 1000
+
+
+def main():
+    stub = StubBackend().start()
+    url = stub.url + "/api/alert/watchTosw"
+    client = BackendClient(stub.url)
+
+    # What the scripts did: module-level requests.post, a new connection per call
+    fresh = per_call_ms(lambda i: requests.post(url, json={"jawaanId": "JW001", "message": str(i)}))
+    fresh_connections = stub.connections
+    stub.reset()
+    pooled = per_call_ms(lambda i: client.request("alert", json={"jawaanId": "JW001", "message": str(i)}))
+    print(f"requests.post per call:  {fresh:5.2f} ms/call, {fresh_connections} connections for {CALLS} calls")
+    print(f"BackendClient:           {pooled:5.2f} ms/call, {stub.connections} connections for {CALLS} calls")
+
+    # A blip of 503s: the pooled client retries with jittered backoff instead of losing the alert
+    stub.reset()
+    stub.fail_next = 40
+    with ThreadPoolExecutor(8) as pool:
+        delivered = sum(pool.map(lambda i: client.send_alert("JW001", str(i)), range(BURST)))
+    print(f"alerts delivered through 40 x 503: {delivered}/{BURST}, retries {client.stats()['alert']['retries']}")
+
+    # A burst on one endpoint is capped at its max_concurrent, leaving pooled connections for the rest
+    stub.reset()
+    stub.delay = 0.02
+    limited = BackendClient(stub.url, endpoints={"alert": Endpoint("POST", "/api/alert/watchTosw", 5, 2, 0)})
+    in_flight = peak = 0
+    lock = threading.Lock()
+    send = limited.session.request
+
+    def counting(*args, **kwargs):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        try:
+            return send(*args, **kwargs)
+        finally:
+            with lock:
+                in_flight -= 1
+
+    limited.session.request = counting
+    with ThreadPoolExecutor(16) as pool:
+        list(pool.map(lambda i: limited.request("alert", json={"jawaanId": "JW001", "message": str(i)}), range(32)))
+    print(f"peak alert requests in flight with max_concurrent=2: {peak}")
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import asyncio
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ble_gateway import BleGateway
+from fake_ble import FakeBleakClient
+
+FLEET_SIZES = (10, 100, 500)
+RUN_SECONDS = 3
+
+
+def mac_for(i):
+    return ":".join(f"{b:02X}" for b in (0xA8, 0x42, i >> 16 & 0xFF, i >> 8 & 0xFF, i & 0xFF, 0x01))
+
+
+async def run(devices):
+    random.seed(devices)
+    frames = [0]
+
+    def factory(mac_address):
+        # 10% of devices fail their first connect and must be retried by the supervisor
+        return FakeBleakClient(mac_address, rate=1.0, connect_time=0.02,
+                               fail_connects=1 if random.random() < 0.1 else 0)
+
+    async def handle_frame(device_id, value):
+        frames[0] += 1
+
+    gateway = BleGateway([mac_for(i) for i in range(devices)], handle_frame, client_factory=factory,
+                         max_connecting=8, stagger=0.002, backoff_initial=0.2)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        runner = asyncio.create_task(gateway.run())
+        while len(gateway.clients) < devices and time.perf_counter() - start < 60:
+            await asyncio.sleep(0.01)
+        connected_after = time.perf_counter() - start
+        frames[0] = 0
+        await asyncio.sleep(RUN_SECONDS)
+        await gateway.stop()
+        await runner
+
+    print(f"{devices:4d} devices  all connected in {connected_after:6.2f} s  "
+          f"connect failures {gateway.failures:3d}  {frames[0] / RUN_SECONDS:8.1f} frames/s  "
+          f"tasks alive at end {len(asyncio.all_tasks())}")
+
+
+async def main():
+    for devices in FLEET_SIZES:
+        await run(devices)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,51 @@
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ble_ingest import consume_frames, read_frames
+from fake_ble import FakeBleakClient
+
+DURATION = 3
+RATES = (1, 10, 50, 200)
+
+
+def seq_payload(seq):
+    return str(seq).encode("utf-8")
+
+
+async def run(mode, rate):
+    client = FakeBleakClient("A8:42:E3:4A:A3:BE", rate=rate, payload=seq_payload)
+    frames = asyncio.Queue(maxsize=1000)
+    seen = set()
+    latencies = []
+
+    async def handle(frame):
+        seq = int(frame)
+        if seq not in seen:
+            seen.add(seq)
+            latencies.append(time.perf_counter() - client.produced_at[seq])
+
+    async with client:
+        tasks = [asyncio.create_task(read_frames(client, frames, mode=mode)),
+                 asyncio.create_task(consume_frames(frames, handle))]
+        await asyncio.sleep(DURATION)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    mean_ms = statistics.mean(latencies) * 1000 if latencies else float("nan")
+    print(f"{mode:6s} {rate:4d} Hz  {len(seen) / DURATION:7.1f} samples/s  "
+          f"mean latency {mean_ms:7.2f} ms  GATT reads {client.reads}")
+
+
+async def main():
+    for rate in RATES:
+        for mode in ("notify", "poll"):
+            await run(mode, rate)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
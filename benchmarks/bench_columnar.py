@@ -0,0 +1,95 @@
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import columnar
+import telemetry
+from bench_frames import text_line
+from frames import FrameDecoder, encode_frame
+from stub_backend import StubBackend
+from uploader import BatchUploader
+
+BLOCK = 10000  # Lines in one backlog block
+UPLOAD_READINGS = 20000
+
+
+def per_line(lines):
+    return [telemetry.parse_data(line, "LA10AH0001", "JW001") for line in lines]
+
+
+def check_equivalence(lines):
+    """decode_lines must give what parse_data gives line by line, for list and bytes input and any slice."""
+    cases = [
+        lines,
+        ["HELP", "Emergency"],                      # Only alert and command lines: no numeric column
+        ["YES", "NO"],
+        ["Heart Rate: 80", ""],                     # A trailing empty line is still a row
+        ["", "Heart Rate: 80", ""],
+        [],
+        ["Heart Rate: 80"] * 50 + ["Emergency"] * 5 + ["SpO2: 97", "HELP"],
+    ]
+    for case in cases:
+        expected = per_line(case)
+        block = "".join(line + "\n" for line in case).encode()
+        for source in (case, block):
+            columns = columnar.decode_lines(source, "LA10AH0001", "JW001")
+            assert columns.to_records() == expected, case[:5]
+            # Every slice, as submit_columns cuts a block into max_batch-row blocks
+            for start in range(0, len(case), 7):
+                assert columns.slice(start, start + 7).to_records() == expected[start:start + 7], case[:5]
+
+
+def rate(run):
+    seconds = min(timeit.repeat(run, number=3, repeat=3)) / 3
+    return BLOCK / seconds
+
+
+def upload(url, lines, bulk):
+    uploader = BatchUploader(url, max_batch=200, max_queue=UPLOAD_READINGS, report_interval=0).start()
+    start = time.perf_counter()
+    if bulk:
+        uploader.submit_columns(columnar.decode_lines(lines, "LA10AH0001", "JW001"))
+    else:
+        for reading in per_line(lines):
+            uploader.submit(reading)
+    ingest = time.perf_counter() - start
+    uploader.stop()
+    return ingest, time.perf_counter() - start
+
+
+def main():
+    lines = [text_line(i) for i in range(BLOCK)]
+    block = ("\n".join(lines) + "\n").encode()
+    frames = b"".join(encode_frame(telemetry.parse_data(line), seq) for seq, line in enumerate(lines))
+    check_equivalence(lines[:200])
+
+    decoder = FrameDecoder()
+    runs = (
+        ("text, parse_data per line", lambda: per_line(lines)),
+        ("text, decode_lines", lambda: columnar.decode_lines(block, "LA10AH0001", "JW001")),
+        ("text, decode_lines + to_records", lambda: columnar.decode_lines(block, "LA10AH0001", "JW001").to_records()),
+        ("binary, FrameDecoder", lambda: decoder.decode(frames, "LA10AH0001")),
+        ("binary, decode_frames", lambda: columnar.decode_frames(frames, "LA10AH0001")),
+    )
+    for name, run in runs:
+        print(f"{name:34s} {rate(run):12,.0f} records/s")
+
+    columns = columnar.decode_lines(block)
+    print(f"offline summary of {len(columns)} readings in "
+          f"{timeit.timeit(lambda: columnar.summarize(columns), number=10) / 10 * 1000:.1f} ms")
+
+    backend = StubBackend().start()
+    url = backend.url + "/api/ble/esp"
+    upload_lines = lines * (UPLOAD_READINGS // BLOCK)
+    for name, bulk in (("per-line submit", False), ("submit_columns", True)):
+        backend.reset()
+        ingest, total = upload(url, upload_lines, bulk)
+        print(f"backlog of {len(upload_lines)} lines, {name:16s} ingest thread busy {ingest * 1000:7.1f} ms, "
+              f"{len(backend.readings)} readings delivered in {total:5.2f} s")
+    backend.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import telemetry
+from deadband import DeltaFilter
+from encoding import get_encoder
+
+DEVICES = 20
+SECONDS = 3600  # One reading per device per second, as the wearables send
+
+
+def wearable_lines(rng, seconds):
+    """A resting wearer: vitals jitter around a baseline, the environment barely moves."""
+    heart, spo2, battery, aqi = 72.0, 97.0, 95.0, 42.0
+    for second in range(seconds):
+        heart += rng.gauss(0, 0.6) + (72 - heart) * 0.05
+        spo2 = min(100.0, spo2 + rng.gauss(0, 0.2) + (97 - spo2) * 0.1)
+        battery -= 0.0015
+        aqi += rng.gauss(0, 0.5) + (42 - aqi) * 0.02
+        line = (f"Body temperature: {36 + (rng.random() < 0.02)} Respiration rate: {15 + (rng.random() < 0.3)} "
+                f"Heart Rate: {round(heart)} sPO2: {round(spo2)} Altitude: {212 + (rng.random() < 0.1)} "
+                f"AQI: {round(aqi)} VOC: {0.52 + rng.choice((0, 0, 0.01))} Ambient Pressure: 1008.25 "
+                f"Humidity: 45 Ambient temperature: 24 Battery Percentage: {int(battery)}")
+        if second % 900 == 450:
+            line += " Emergency"
+        yield second, line
+
+
+def main():
+    rng = random.Random(17)
+    readings = [(second, telemetry.parse_reading(line, f"LA10AH{device:04d}", f"JW{device:03d}"))
+                for device in range(DEVICES) for second, line in wearable_lines(rng, SECONDS)]
+    readings.sort(key=lambda item: item[0])
+
+    now = [0.0]
+    delta = DeltaFilter(clock=lambda: now[0])
+    encoder = get_encoder()
+    sent_bytes = full_bytes = 0
+    active_seconds = {}
+    forwarded = []
+    for second, reading in readings:
+        now[0] = second
+        full_bytes += len(encoder.encode(reading))
+        out = delta.filter(reading)
+        if out is not None:
+            sent_bytes += len(encoder.encode(out))
+            active_seconds.setdefault(reading.id, set()).add(second)
+            forwarded.append(out)
+
+    stats = delta.stats()
+    assert stats["alerts"] == DEVICES * (SECONDS // 900)
+    print(f"{DEVICES} devices x {SECONDS} s: {stats['readings']} readings, {stats['forwarded']} forwarded, "
+          f"{stats['suppressed']} suppressed, {stats['keyframes']} keyframes, {stats['alerts']} alerts")
+    print(f"uploaded bytes:   {full_bytes:,} -> {sent_bytes:,} ({full_bytes / sent_bytes:.1f}x fewer)")
+    # A single-device script flushes a batch per reading at 1 Hz, so a suppressed second is a POST saved
+    requests_before = SECONDS
+    requests_after = sum(len(seconds) for seconds in active_seconds.values()) / DEVICES
+    print(f"POSTs per device-hour (1 Hz, max_age 0.5 s): {requests_before} -> {requests_after:.0f} "
+          f"({requests_before / requests_after:.1f}x fewer)")
+
+    plain = [reading for _, reading in readings]
+    cost = min(timeit.repeat(lambda: [DeltaFilter(clock=lambda: 0.0).filter(r) for r in plain],
+                             number=1, repeat=3)) / len(plain) * 1e6
+    print(f"filter cost: {cost:.2f} us/reading")
+
+
+if __name__ == "__main__":
+    main()
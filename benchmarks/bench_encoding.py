@@ -0,0 +1,56 @@
+import json
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import telemetry
+from bench_frames import text_line
+from encoding import ENCODERS, get_encoder, join_encoded, orjson
+from outbox import Outbox
+
+READINGS = 10000
+BATCH = 50
+
+
+def per_reading_us(run, count):
+    return min(timeit.repeat(run, number=3, repeat=3)) / 3 / count * 1e6
+
+
+def main():
+    lines = [text_line(i) for i in range(READINGS)]
+    readings = [telemetry.parse_reading(line, "LA10AH0001", "JW001") for line in lines]
+    dicts = [telemetry.parse_data(line, "LA10AH0001", "JW001") for line in lines]
+    batches = [readings[i:i + BATCH] for i in range(0, READINGS, BATCH)]
+    dict_batches = [dicts[i:i + BATCH] for i in range(0, READINGS, BATCH)]
+
+    # What requests.post(json=...) did per reading
+    baseline = per_reading_us(lambda: [json.dumps(d).encode() for d in dicts], READINGS)
+    print(f"{'json.dumps per reading (before)':34s} {baseline:6.2f} us/reading")
+    for name in ENCODERS:
+        if name == "orjson" and orjson is None:
+            print(f"{name:34s} not installed")
+            continue
+        encoder = get_encoder(name)
+        assert all(json.loads(encoder.encode_batch(batch)) == [r.to_dict() for r in batch] for batch in batches)
+        for kind, source in (("Readings", batches), ("dicts", dict_batches)):
+            cost = per_reading_us(lambda: [encoder.encode_batch(batch) for batch in source], READINGS)
+            print(f"{name + ', batches of ' + kind:34s} {cost:6.2f} us/reading")
+
+    # The outbox stores encoded readings; draining posts them without decoding again
+    with tempfile.TemporaryDirectory() as path:
+        outbox = Outbox(path)
+        encoder = get_encoder()
+        for reading in readings:
+            outbox.append(encoder.encode(reading))
+
+        decode_reencode = per_reading_us(lambda: json.dumps(outbox.read_batch(READINGS)[0]).encode(), READINGS)
+        raw_join = per_reading_us(lambda: join_encoded(outbox.read_batch(READINGS, raw=True)[0]), READINGS)
+        outbox.close()
+    print(f"outbox drain, json.loads + json.dumps    {decode_reencode:6.2f} us/reading")
+    print(f"outbox drain, stored bytes joined        {raw_join:6.2f} us/reading")
+
+
+if __name__ == "__main__":
+    main()
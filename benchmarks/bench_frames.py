@@ -0,0 +1,66 @@
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import telemetry
+from frames import FRAME_SIZE, FrameDecoder, encode_frame
+
+READINGS = 1000
+BATCH = 8  # Frames per BLE notification (8 * 32 bytes fits a 247-byte MTU)
+BAUD_BYTES_PER_SECOND = 115200 / 10
+
+
+def text_line(i):
+    return (f"Body temperature: {36 + i % 2} Respiration rate: {14 + i % 5} Heart Rate: {70 + i % 30} "
+            f"sPO2: {95 + i % 4} Altitude: 212 AQI: {40 + i % 10} VOC: 0.52 Ambient Pressure: 1008.25 "
+            f"Humidity: 45 Ambient temperature: 24 Battery Percentage: {88 - i % 3}")
+
+
+def check(decoder, lines, frames):
+    for i, (line, frame) in enumerate(zip(lines, frames)):
+        assert decoder.decode(frame, "D1") == [telemetry.parse_data(line, "D1")], f"frame {i} differs"
+
+    # A corrupted frame in a batch costs that frame only
+    batch = bytearray(b"".join(frames[:BATCH]))
+    batch[FRAME_SIZE * 3 + 10] ^= 0xFF
+    decoded = decoder.decode(bytes(batch), "D1")
+    assert len(decoded) == BATCH - 1 and decoder.crc_errors == 1
+
+    assert decoder.decode(b"36.5.40.72.16.97", "D1")[0]["temperature"] == 36.5
+    assert decoder.decode(b"36.40.72.16.97", "D1")[0]["hr"] == 72.0
+    assert decoder.decode(b"garbage", "D1") == []
+    print("binary frames decode to the same readings as their text lines; corrupt frames are skipped")
+
+
+def main():
+    rng = random.Random(12)
+    lines = [text_line(rng.randrange(1000)) for _ in range(READINGS)]
+    frames = [encode_frame(telemetry.parse_data(line), seq) for seq, line in enumerate(lines)]
+    encoded_lines = [(line + "\n").encode() for line in lines]
+    batches = [b"".join(frames[i:i + BATCH]) for i in range(0, READINGS, BATCH)]
+    dotted = [f"36.{i % 10}.{40 + i % 20}.{70 + i % 30}.16.97".encode() for i in range(READINGS)]
+
+    check(FrameDecoder(), lines, frames)
+
+    text_bytes = sum(map(len, encoded_lines)) / READINGS
+    print(f"bytes per reading: text {text_bytes:.0f}, binary {FRAME_SIZE} "
+          f"({text_bytes / FRAME_SIZE:.1f}x less airtime; "
+          f"{BAUD_BYTES_PER_SECOND / text_bytes:.0f} vs {BAUD_BYTES_PER_SECOND / FRAME_SIZE:.0f} readings/s at 115200 baud)")
+
+    decoder = FrameDecoder()
+    runs = (
+        ("text line, parse_data", lambda: [telemetry.parse_data(line.decode(), "D1") for line in encoded_lines]),
+        ("text line, FrameDecoder", lambda: [decoder.decode(line, "D1") for line in encoded_lines]),
+        ("dot-joined, FrameDecoder", lambda: [decoder.decode(payload, "D1") for payload in dotted]),
+        ("binary, one per payload", lambda: [decoder.decode(frame, "D1") for frame in frames]),
+        (f"binary, {BATCH} per payload", lambda: [decoder.decode(batch, "D1") for batch in batches]),
+    )
+    for name, run in runs:
+        seconds = min(timeit.repeat(run, number=20, repeat=3)) / 20
+        print(f"{name:26s} {READINGS / seconds:10,.0f} readings/s")
+
+
+if __name__ == "__main__":
+    main()
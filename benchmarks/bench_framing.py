@@ -0,0 +1,80 @@
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from framing import LineFramer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FUZZ_ROUNDS = 2000
+STREAM_REPEAT = 200
+
+
+def load_stream():
+    with open(os.path.join(HERE, "recorded_lines.txt"), "rb") as f:
+        data = f.read()
+    # Mix in CRLF endings, blank lines and non-UTF-8 bytes as real ports produce them
+    return data.replace(b"\n", b"\r\n", 50) + b"\n\n\xff\xfeHeart Rate: 80.0\n"
+
+
+def expected_lines(data):
+    return [line for line in (raw.decode('utf-8', errors='replace').strip() for raw in data.split(b"\n")[:-1]) if line]
+
+
+def random_chunks(data, rng, max_chunk):
+    position = 0
+    while position < len(data):
+        size = rng.randint(1, max_chunk)
+        yield data[position:position + size]
+        position += size
+
+
+def fuzz(data):
+    rng = random.Random(9)
+    expected = expected_lines(data)
+    for round_number in range(FUZZ_ROUNDS):
+        framer = LineFramer()
+        lines = []
+        for chunk in random_chunks(data, rng, rng.choice((1, 3, 17, 64, 1024, 8192))):
+            lines.extend(framer.feed(chunk))
+        assert lines == expected, f"round {round_number}: framing differs"
+        assert framer.pending() == len(data) - data.rfind(b"\n") - 1
+    print(f"fuzz: {FUZZ_ROUNDS} random chunkings, every line recovered exactly")
+
+
+# The usual fix: append, then split the head off the buffer one line at a time
+def naive_framer():
+    buffer = b""
+
+    def feed(chunk):
+        nonlocal buffer
+        buffer += chunk
+        lines = []
+        while b"\n" in buffer:
+            raw, buffer = buffer.split(b"\n", 1)
+            line = raw.decode('utf-8', errors='replace').strip()
+            if line:
+                lines.append(line)
+        return lines
+    return feed
+
+
+def throughput(data):
+    stream = data * STREAM_REPEAT
+    for chunk_size in (64, 1024, 4096):
+        chunks = [stream[i:i + chunk_size] for i in range(0, len(stream), chunk_size)]
+        for name, feed in (("split per line", naive_framer()), ("LineFramer", LineFramer().feed)):
+            start = time.perf_counter()
+            count = 0
+            for chunk in chunks:
+                count += len(feed(chunk))
+            elapsed = time.perf_counter() - start
+            print(f"{chunk_size:5d} B reads  {name:15s} {len(stream) / elapsed / 1e6:8.1f} MB/s  "
+                  f"{count / elapsed:12,.0f} lines/s")
+
+
+if __name__ == "__main__":
+    data = load_stream()
+    fuzz(data)
+    throughput(data)
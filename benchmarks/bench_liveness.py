@@ -0,0 +1,80 @@
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from liveness import DISCONNECTED, LivenessTracker
+
+FLEET_SIZES = (100, 1000, 10000)
+SECONDS = 300
+TIMEOUT = 10.0
+RESOLUTION = 0.5
+LEGACY_INTERVAL = 5  # multithreading.py posted every device's status every 5 s
+
+
+class CountingBackend:
+    """Counts the status posts the tracker makes."""
+
+    def __init__(self):
+        self.posts = 0
+        self.statuses = []
+
+    def send_connection_status(self, device_id, status):
+        return self.send_connection_statuses([(device_id, status)])
+
+    def send_connection_statuses(self, statuses):
+        self.posts += 1
+        self.statuses.extend(statuses)
+        return True
+
+
+def run(devices):
+    rng = random.Random(devices)
+    now = [0.0]
+    backend = CountingBackend()
+    tracker = LivenessTracker(backend, timeout=TIMEOUT, resolution=RESOLUTION, clock=lambda: now[0])
+    names = [f"LA10AH{i:05d}" for i in range(devices)]
+    # 5% of the fleet goes silent for 60 s at some point
+    outages = {name: rng.uniform(30, SECONDS - 90) for name in rng.sample(names, devices // 20)}
+    went_quiet = {}
+
+    seen_time = advance_time = 0.0
+    samples = ticks = 0
+    for step in range(int(SECONDS / RESOLUTION)):
+        now[0] = step * RESOLUTION
+        if step % 2 == 0:  # Every device sends at 1 Hz
+            start = time.perf_counter()
+            for name in names:
+                outage = outages.get(name)
+                if outage is not None and outage <= now[0] < outage + 60:
+                    went_quiet.setdefault(name, now[0])
+                    continue
+                tracker.seen(name)
+                samples += 1
+            seen_time += time.perf_counter() - start
+        start = time.perf_counter()
+        edges = tracker.advance()
+        advance_time += time.perf_counter() - start
+        ticks += 1
+        for name, status in edges.items():
+            if status == DISCONNECTED and name in went_quiet:
+                went_quiet[name] = now[0] - went_quiet[name]
+
+    delays = [delay for delay in went_quiet.values() if delay < SECONDS / 2]
+    legacy_posts = devices * SECONDS // LEGACY_INTERVAL
+    print(f"{devices:6d} devices  seen {seen_time / samples * 1e6:5.2f} us/sample  "
+          f"advance {advance_time / ticks * 1e3:6.3f} ms/tick  "
+          f"posts {backend.posts:4d} vs {legacy_posts:7d} (legacy)  threads 1 vs {devices}  "
+          f"silence-to-disconnected {min(delays):.1f}-{max(delays):.1f} s")
+
+
+def main():
+    print(f"{SECONDS} s at 1 Hz, timeout {TIMEOUT:.0f} s, wheel resolution {RESOLUTION} s, "
+          f"5% of devices silent for 60 s")
+    for devices in FLEET_SIZES:
+        run(devices)
+
+
+if __name__ == "__main__":
+    main()
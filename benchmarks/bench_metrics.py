@@ -0,0 +1,64 @@
+import asyncio
+import os
+import sys
+import tempfile
+import timeit
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import telemetry
+from bench_frames import text_line
+from bench_replay import replay, synthesize
+from metrics import Histogram, Metrics, serve_metrics
+from stub_backend import StubBackend
+from uploader import BatchUploader
+
+LINES = 20000
+
+
+def hot_path(metrics):
+    # What a serial line costs from framing to the uploader queue; the uploader thread is not started
+    uploader = BatchUploader(max_queue=LINES * 10, metrics=metrics, report_interval=0)
+    lines = [text_line(i) for i in range(100)]
+
+    def run():
+        for i in range(LINES):
+            device_id = f"LA10AH{i % 64:04d}"
+            if metrics is not None:
+                metrics.read(device_id, 0.0, 0.0, 1)
+            uploader.submit(telemetry.parse_reading(lines[i % 100], device_id, "JW001"))
+    return min(timeit.repeat(run, number=1, repeat=5)) / LINES * 1e6
+
+
+def main():
+    disabled = hot_path(None)
+    enabled = hot_path(Metrics())
+    histogram = Histogram()
+    record = min(timeit.repeat(lambda: histogram.record(0.0123), number=100000, repeat=3)) / 100000 * 1e6
+    print(f"line -> parse -> submit: {disabled:.2f} us without metrics, {enabled:.2f} us with "
+          f"(+{enabled - disabled:.2f} us); Histogram.record {record:.2f} us")
+
+    # The replay harness with metrics on: where the time goes, and what Prometheus scrapes
+    metrics = Metrics()
+    server = serve_metrics(metrics, port=0)
+    stub = StubBackend().start()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "capture.bin")
+        synthesize(path)
+        asyncio.run(replay(path, 10, stub, metrics=metrics))
+    for stage, summary in metrics.stats()["stages"].items():
+        print(f"  {stage:10s} {summary}")
+    for endpoint, summary in metrics.stats()["endpoints"].items():
+        print(f"  {endpoint:10s} {summary}")
+    scrape = urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics").read().decode()
+    samples = [line for line in scrape.splitlines() if not line.startswith("#")]
+    print(f"/metrics: {len(samples)} samples, {len(scrape)} bytes, e.g.")
+    for line in samples:
+        if "end_to_end" in line and "le=\"0.5\"" in line or line.startswith("esp_gateway_readings_uploaded"):
+            print(f"  {line}")
+    server.shutdown()
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
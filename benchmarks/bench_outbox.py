@@ -0,0 +1,80 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from outbox import Outbox
+from uploader import BatchUploader
+from stub_backend import StubBackend
+
+APPENDS = 100000
+OUTAGE_READINGS = 20000
+
+
+def reading(i):
+    return {'id': 'LA10AH0001', 'uid': 'JW001', 'seq': i, 'heartRate': 70 + i % 20, 'spo2': 97}
+
+
+def bench_append(path):
+    outbox = Outbox(path, segment_bytes=1024 * 1024)
+    start = time.perf_counter()
+    for i in range(APPENDS):
+        outbox.append(reading(i))
+    elapsed = time.perf_counter() - start
+    outbox.close()
+    print(f"append               {APPENDS / elapsed:12,.0f} readings/s")
+
+
+def bench_recovery(path):
+    start = time.perf_counter()
+    outbox = Outbox(path, segment_bytes=1024 * 1024)
+    elapsed = time.perf_counter() - start
+    print(f"startup recovery     {elapsed * 1000:12.2f} ms for {outbox.pending_bytes():,} pending bytes "
+          f"in {len(outbox.segments)} segments")
+    outbox.close()
+
+
+def bench_outage(path, backend):
+    outbox = Outbox(path, segment_bytes=256 * 1024)
+    uploader = BatchUploader(backend.url + "/api/ble/esp", max_batch=500, max_age=0.05,
+                             outbox=outbox, retry_delay=0.05, report_interval=0).start()
+
+    # Backend down: readings must keep flowing into the outbox at full rate
+    backend.failing = True
+    start = time.perf_counter()
+    for i in range(OUTAGE_READINGS):
+        uploader.submit(reading(i))
+    elapsed = time.perf_counter() - start
+    print(f"append during outage {OUTAGE_READINGS / elapsed:12,.0f} readings/s, "
+          f"{outbox.pending_bytes():,} bytes pending")
+
+    backend.failing = False
+    start = time.perf_counter()
+    while outbox.pending_bytes() and time.perf_counter() - start < 60:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    uploader.stop()
+    outbox.close()
+
+    seqs = [item['seq'] for item in backend.readings]
+    in_order = seqs == sorted(seqs) and len(set(seqs)) == len(seqs)
+    print(f"drain after outage   {len(seqs) / elapsed:12,.0f} readings/s, delivered {len(seqs)}/{OUTAGE_READINGS}, "
+          f"in order: {in_order}, segments left: {len(outbox.segments)}")
+
+
+def main():
+    root = tempfile.mkdtemp(prefix="outbox-bench-")
+    backend = StubBackend().start()
+    try:
+        bench_append(os.path.join(root, "append"))
+        bench_recovery(os.path.join(root, "append"))
+        bench_outage(os.path.join(root, "outage"), backend)
+    finally:
+        backend.stop()
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import telemetry
+
+LINES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'recorded_lines.txt')
+REPEAT = 2000
+
+
+# The per-field re.search chain the scripts used before telemetry.py
+def legacy_parse_data(data, device_id, uid):
+    parsed_data = {'id': device_id, 'uid': uid}
+
+    temp_match = re.search(r'Body temperature: (\d+)', data)
+    if temp_match:
+        parsed_data['bodyTemperature'] = int(temp_match.group(1))
+
+    resp_match = re.search(r'Respiration rate: (\d+)', data)
+    if resp_match:
+        parsed_data['respiratoryRate'] = int(resp_match.group(1))
+
+    heart_rate_match = re.search(r'Heart Rate: (\d+)', data)
+    if heart_rate_match:
+        parsed_data['heartRate'] = int(heart_rate_match.group(1))
+
+    spo2_match = re.search(r'sPO2: (\d+)', data)
+    if spo2_match:
+        parsed_data['spo2'] = int(spo2_match.group(1))
+
+    altitude_match = re.search(r'Altitude: (\d+)', data)
+    if altitude_match:
+        parsed_data['altitude'] = int(altitude_match.group(1))
+
+    aqi_match = re.search(r'AQI: (\d+)', data)
+    if aqi_match:
+        if 'environment' not in parsed_data:
+            parsed_data['environment'] = {}
+        parsed_data['environment']['aqi'] = int(aqi_match.group(1))
+
+    voc_match = re.search(r'VOC: ([\d.]+)', data)
+    if voc_match:
+        if 'environment' not in parsed_data:
+            parsed_data['environment'] = {}
+        parsed_data['environment']['voc'] = float(voc_match.group(1))
+
+    amb_pressure_match = re.search(r'Ambiet Pressure: ([\d.]+)', data)
+    if amb_pressure_match:
+        if 'environment' not in parsed_data:
+            parsed_data['environment'] = {}
+        parsed_data['environment']['ambientPressure'] = float(amb_pressure_match.group(1))
+
+    humidity_match = re.search(r'Humidity: (\d+)', data)
+    if humidity_match:
+        parsed_data['relativeHumidity'] = int(humidity_match.group(1))
+
+    amb_temp_match = re.search(r'Ambient temperature: (\d+)', data)
+    if amb_temp_match:
+        if 'environment' not in parsed_data:
+            parsed_data['environment'] = {}
+        parsed_data['environment']['ambientTemperature'] = int(amb_temp_match.group(1))
+
+    battery_match = re.search(r'Battery Percentage: (\d+)', data)
+    if battery_match:
+        parsed_data['battery'] = int(battery_match.group(1))
+
+    decibel_match = re.search(r'(\d+)\s+dB', data)
+    if decibel_match:
+        decibel = int(decibel_match.group(1))
+        parsed_data['rssi'] = decibel
+
+        if 10 < decibel < 30:
+            parsed_data['textCommand'] = "Warning"
+        elif 40 < decibel < 60:
+            parsed_data['textCommand'] = "Alert"
+        elif 70 < decibel < 90:
+            parsed_data['textCommand'] = "Emergency"
+
+    if "Emergency" in data:
+        parsed_data['fallDamage'] = True
+
+    if "YES" in data or "NO" in data or "HELP" in data or "PENDING" in data or "RESOLVED" in data:
+        parsed_data['textCommand'] = data.strip()
+
+    return parsed_data
+
+
+def load_lines():
+    with open(LINES_FILE) as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def run(parse, lines):
+    for line in lines:
+        parse(line, 'LA10AH0001', 'JW001')
+
+
+def main():
+    lines = load_lines()
+
+    # Both parsers must agree before the timings mean anything
+    for line in lines:
+        expected = legacy_parse_data(line, 'LA10AH0001', 'JW001')
+        actual = telemetry.parse_data(line, 'LA10AH0001', 'JW001')
+        if expected != actual:
+            print(f"Mismatch on {line!r}:\n  legacy: {expected}\n  new:    {actual}")
+            sys.exit(1)
+
+    records = len(lines) * REPEAT
+    for name, parse in (("legacy re.search chain", legacy_parse_data), ("telemetry.parse_data", telemetry.parse_data)):
+        elapsed = min(timeit.repeat(lambda: run(parse, lines), number=REPEAT, repeat=3))
+        print(f"{name:24s} {records / elapsed:12,.0f} lines/s  {elapsed / records * 1e6:6.2f} us/line")
+
+
+if __name__ == "__main__":
+    main()
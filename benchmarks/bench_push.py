@@ -0,0 +1,78 @@
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+import websockets
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from downlink import DownlinkRouter, serve_push
+
+PORT = 8799
+DEVICES = 50
+MESSAGES_PER_DEVICE = 40
+WRITE_TIME = 0.002  # Simulated serial/BLE write time
+POLL_INTERVAL = 5  # What the polling scripts waited between fetches
+
+
+async def main():
+    router = DownlinkRouter()
+    written = {f"JW{i:03d}": [] for i in range(DEVICES)}
+
+    for jawaan_id, messages in written.items():
+        async def write(text, messages=messages):
+            await asyncio.sleep(WRITE_TIME)
+            messages.append(text)
+        router.register(jawaan_id, write)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        server = asyncio.create_task(serve_push(router, port=PORT))
+        await asyncio.sleep(0.2)
+
+        sent_at = {}
+        latencies = []
+        async with websockets.connect(f"ws://localhost:{PORT}") as websocket:
+            start = time.perf_counter()
+            for n in range(MESSAGES_PER_DEVICE):
+                for jawaan_id in written:
+                    message_id = f"{jawaan_id}-{n}"
+                    sent_at[message_id] = time.perf_counter()
+                    await websocket.send(json.dumps({"jawaanId": jawaan_id, "messageId": message_id, "message": str(n)}))
+            statuses = {}
+            for _ in range(len(sent_at)):
+                ack = json.loads(await websocket.recv())
+                statuses[ack["messageId"]] = ack["status"]
+                latencies.append(time.perf_counter() - sent_at[ack["messageId"]])
+            elapsed = time.perf_counter() - start
+
+            # One message in flight at a time, as an operator would send them
+            single = []
+            for n in range(100):
+                jawaan_id = f"JW{n % DEVICES:03d}"
+                started = time.perf_counter()
+                await websocket.send(json.dumps({"jawaanId": jawaan_id, "message": "HELP"}))
+                await websocket.recv()
+                single.append(time.perf_counter() - started)
+
+            # The reconciliation poll later finds a message that was already pushed
+            duplicate = await router.submit({"jawaanId": "JW000", "messageId": "JW000-0", "message": "0"}, "poll")
+
+        server.cancel()
+
+    in_order = all(messages[:MESSAGES_PER_DEVICE] == [str(n) for n in range(MESSAGES_PER_DEVICE)] for messages in written.values())
+    latencies.sort()
+    print(f"{len(sent_at)} messages to {DEVICES} devices in {elapsed * 1000:.1f} ms, "
+          f"delivered {list(statuses.values()).count('delivered')}, per-device order kept: {in_order}")
+    print(f"burst ack latency p50 {statistics.median(latencies) * 1000:7.2f} ms  "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:7.2f} ms")
+    print(f"single message    p50 {statistics.median(single) * 1000:7.2f} ms  max {max(single) * 1000:7.2f} ms")
+    print(f"polling latency   mean {POLL_INTERVAL / 2 * 1000:7.0f} ms (half of the {POLL_INTERVAL} s interval)")
+    print(f"re-polled pushed message: {duplicate}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,56 @@
+import json
+import os
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import telemetry
+from bench_frames import text_line
+from outbox import Outbox
+
+READINGS = 10000
+
+
+def allocated(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(kept), kept
+
+
+def main():
+    lines = [text_line(i) for i in range(READINGS)]
+    # Interned keys and small ints are shared either way; what differs is the containers
+    dict_bytes, dicts = allocated(lambda: [telemetry.parse_data(line, "LA10AH0001", "JW001") for line in lines])
+    slot_bytes, readings = allocated(lambda: [telemetry.parse_reading(line, "LA10AH0001", "JW001") for line in lines])
+    print(f"queued memory per reading: dict {dict_bytes:6.0f} B, Reading {slot_bytes:6.0f} B "
+          f"({dict_bytes / slot_bytes:.1f}x smaller)")
+
+    assert [reading.to_dict() for reading in readings] == dicts
+    assert [json.loads(reading.to_json()) for reading in readings] == dicts
+
+    with tempfile.TemporaryDirectory() as path:
+        outbox = Outbox(path)
+        for reading in readings:
+            outbox.append(reading)
+        outboxed = outbox.pending_bytes()
+        outbox.close()
+    print(f"outboxed bytes per reading: {outboxed / READINGS:.0f} B (same JSON lines as before)")
+
+    runs = (
+        ("parse_data", lambda: [telemetry.parse_data(line, "LA10AH0001", "JW001") for line in lines]),
+        ("parse_reading", lambda: [telemetry.parse_reading(line, "LA10AH0001", "JW001") for line in lines]),
+        ("json.dumps(dict)", lambda: [json.dumps(d, separators=(",", ":")) for d in dicts]),
+        ("Reading.to_json", lambda: [reading.to_json() for reading in readings]),
+    )
+    for name, run in runs:
+        seconds = min(timeit.repeat(run, number=3, repeat=3)) / 3
+        print(f"{name:18s} {READINGS / seconds:10,.0f} readings/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import asyncio
+import collections
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import timeit
+
+import serial_asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bench_serial_gateway import LINES_PER_SECOND, open_ptys, start_feeder
+from registry import DeviceRegistry
+from serial_gateway import SerialGateway
+
+PORTS = 32
+RUN_SECONDS = 6
+RELOAD_AT = 2.5
+LOOKUP_DEVICES = 5000
+
+
+def write_registry(path, rows):
+    # Written next to the file and renamed, as an editor or a deploy would
+    with open(path + ".tmp", "w", newline="") as file:
+        file.write("device_id,jawaan_id,port,mac_address\n")
+        for device_id, jawaan_id, port in rows:
+            file.write(f"{device_id},{jawaan_id},{port},\n")
+    os.replace(path + ".tmp", path)
+
+
+def hot_reload():
+    masters, paths, slaves = open_ptys(PORTS + 1)
+    rows = [(f"LA10AH{i:04d}", f"JW{i:03d}", path) for i, path in enumerate(paths)]
+    feeder = start_feeder(masters, RUN_SECONDS)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "devices.csv")
+        write_registry(path, rows[:PORTS])
+        registry = DeviceRegistry(path)
+        lines = collections.Counter()
+        opens = collections.Counter()
+
+        async def open_connection(url, baudrate):
+            opens[url] += 1
+            return await serial_asyncio.open_serial_connection(url=url, baudrate=baudrate)
+
+        async def main():
+            gateway = SerialGateway(registry.serial_devices(), lambda data, device_id, uid: lines.update((device_id,)),
+                                    open_connection=open_connection)
+
+            def on_change(added, removed):
+                for device in removed:
+                    gateway.remove(device.port)
+                for device in added:
+                    gateway.add(device.port, device.device_id, device.jawaan_id)
+
+            runner = asyncio.create_task(gateway.run())
+            watcher = asyncio.create_task(registry.watch_async(on_change, interval=0.2))
+            await asyncio.sleep(RELOAD_AT)
+            # Swap the first device out for a new one; the other ports must not notice
+            write_registry(path, rows[1:])
+            await asyncio.sleep(RUN_SECONDS - RELOAD_AT)
+            watcher.cancel()
+            await gateway.stop()
+            await runner
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(main())
+
+    os.waitpid(feeder, 0)
+    for fd in masters + slaves:
+        os.close(fd)
+
+    expected = LINES_PER_SECOND * RUN_SECONDS
+    kept = [rows[i][0] for i in range(1, PORTS)]
+    reopened = sum(opens[rows[i][2]] - 1 for i in range(1, PORTS))
+    worst = min(lines[device_id] for device_id in kept)
+    print(f"hot reload with {PORTS} live ports: removed 1, added 1; "
+          f"untouched ports reopened {reopened} times, fewest lines on an untouched port {worst}/{expected}")
+    print(f"  removed port stopped after {lines[rows[0][0]]} lines, "
+          f"added port picked up {lines[rows[PORTS][0]]} lines within the remaining {RUN_SECONDS - RELOAD_AT:.1f} s")
+
+
+def lookups():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "devices.csv")
+        write_registry(path, [(f"LA10AH{i:04d}", f"JW{i:04d}", f"/dev/ttyUSB{i}") for i in range(LOOKUP_DEVICES)])
+        registry = DeviceRegistry(path)
+        reload_ms = min(timeit.repeat(registry.reload, number=1, repeat=5)) * 1000
+        poll_us = min(timeit.repeat(registry.poll, number=1000, repeat=3)) / 1000 * 1e6
+        # What socket/rcv.py and the scripts' parallel lists would need: a scan per lookup
+        devices = list(registry)
+        scan_us = min(timeit.repeat(lambda: next(d for d in devices if d.jawaan_id == "JW4999"),
+                                    number=1000, repeat=3)) / 1000 * 1e6
+        lookup_us = min(timeit.repeat(lambda: registry.jawaan("JW4999"), number=100000, repeat=3)) / 100000 * 1e6
+    print(f"{LOOKUP_DEVICES} devices: reload {reload_ms:.1f} ms, unchanged-file poll {poll_us:.1f} us, "
+          f"jawaanId lookup {lookup_us:.2f} us (linear scan {scan_us:.0f} us)")
+
+
+def main():
+    hot_reload()
+    lookups()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import asyncio
+import collections
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import telemetry
+from backend import BackendClient
+from ble_gateway import BleGateway
+from bench_deadband import wearable_lines
+from bench_serial_gateway import open_ptys
+from capture import BLE, SERIAL, CaptureWriter, read_capture
+from fake_ble import FakeBleakClient
+from frames import FrameDecoder, encode_frame
+from serial_gateway import SerialGateway
+from stub_backend import StubBackend
+from uploader import BatchUploader
+
+SPEEDS = (1, 10, None)  # None: as fast as the pipeline takes it
+LEAD = 0.5  # Seconds for the gateway to open every port before the first record is due
+
+
+def synthesize(path, serial_devices=16, ble_devices=16, seconds=20, seed=3):
+    """A capture of wearables at 1 Hz: text lines over serial (some split across reads), binary frames over BLE."""
+    rng = random.Random(seed)
+    start = time.time()
+    records = []
+    for device in range(serial_devices):
+        offset = rng.random()
+        for second, line in wearable_lines(rng, seconds):
+            data = (line + "\n").encode("utf-8")
+            at = start + second + offset
+            if rng.random() < 0.2:
+                cut = rng.randrange(1, len(data))
+                records.append((at, SERIAL, f"COM{device + 1}", data[:cut]))
+                records.append((at + 0.002, SERIAL, f"COM{device + 1}", data[cut:]))
+            else:
+                records.append((at, SERIAL, f"COM{device + 1}", data))
+    for device in range(ble_devices):
+        offset = rng.random()
+        for second, line in wearable_lines(rng, seconds):
+            frame = encode_frame(telemetry.parse_data(line), second)
+            records.append((start + second + offset, BLE, f"A84200{device:06X}", frame))
+    records.sort()
+    with CaptureWriter(path) as capture:
+        for at, kind, source, payload in records:
+            capture.record(kind, source, payload, timestamp=at)
+
+
+class Schedule:
+    """When each captured record is due in this replay: `start` plus its capture offset divided by `speed`."""
+
+    def __init__(self, records, speed):
+        self.first = records[0].timestamp if records else 0.0
+        self.speed = speed
+        self.start = None
+
+    def due(self, record):
+        if self.speed is None:
+            return self.start
+        return self.start + (record.timestamp - self.first) / self.speed
+
+
+def start_serial_replay(records, masters, schedule):
+    """Fork a process that writes each serial record to its port's pty master when it is due."""
+    pid = os.fork()
+    if pid == 0:
+        for record in records:
+            delay = schedule.due(record) - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            os.write(masters[record.source], record.payload)
+        os._exit(0)
+    return pid
+
+
+class ReplayBleakClient(FakeBleakClient):
+    """A FakeBleakClient whose notifications are one device's captured payloads, each pushed when it is due."""
+
+    def __init__(self, address, records, schedule):
+        super().__init__(address)
+        self.records = records
+        self.schedule = schedule
+
+    async def _produce(self):
+        for record in self.records:
+            if not self.is_connected:
+                return
+            delay = self.schedule.due(record) - time.monotonic()
+            # At max speed, still let the gateway run between notifications
+            await asyncio.sleep(max(0, delay))
+            self.seq += 1
+            if self._callback is not None:
+                self._callback(self.address, bytearray(record.payload))
+
+
+def line_times(records, schedule):
+    """Per source, when each complete line (serial) or reading (BLE frame) was handed to the gateway."""
+    times = collections.defaultdict(list)
+    for record in records:
+        count = record.payload.count(b"\n") if record.kind == SERIAL else 1
+        times[record.source].extend([schedule.due(record)] * count)
+    return times
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def replay(path, speed, stub, metrics=None):
+    records = list(read_capture(path))
+    schedule = Schedule(records, speed)
+    serial_records = [record for record in records if record.kind == SERIAL]
+    ble_records = collections.defaultdict(list)
+    for record in records:
+        if record.kind == BLE:
+            ble_records[record.source].append(record)
+
+    ports = sorted({record.source for record in serial_records})
+    masters, paths, slaves = open_ptys(len(ports))
+    pty_for = dict(zip(ports, paths))
+
+    # The pipeline under test: parse_data -> BatchUploader -> backend, as multithreading2.py wires it
+    uploader = BatchUploader(stub.url + "/api/ble/esp", backend=BackendClient(stub.url, metrics=metrics),
+                             max_queue=100000, report_interval=0, metrics=metrics)
+    decoder = FrameDecoder()
+
+    def handle_line(data, device_id, uid):
+        reading = telemetry.parse_reading(data, device_id, uid)
+        if len(reading) > 2:
+            uploader.submit(reading)
+
+    async def handle_frame(device_id, value):
+        for reading in decoder.decode(value, device_id):
+            uploader.submit(reading)
+
+    serial = SerialGateway([(pty_for[port], port, port) for port in ports], handle_line, metrics=metrics)
+    ble = BleGateway(list(ble_records), handle_frame, max_connecting=64, stagger=0, metrics=metrics,
+                     client_factory=lambda address: ReplayBleakClient(address, ble_records[address], schedule))
+
+    total = sum(record.payload.count(b"\n") if record.kind == SERIAL else 1 for record in records)
+    uploader.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        runners = [asyncio.create_task(serial.run()), asyncio.create_task(ble.run())]
+        schedule.start = time.monotonic() + LEAD
+        expected = line_times(records, schedule)
+        feeder = start_serial_replay(serial_records, {port: masters[i] for i, port in enumerate(ports)}, schedule)
+        duration = 0 if speed is None else (records[-1].timestamp - schedule.first) / speed
+        deadline = schedule.start + duration + 30
+        while len(stub.readings) < total and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        await serial.stop()
+        await ble.stop()
+        await asyncio.gather(*runners, return_exceptions=True)
+    uploader.stop()
+    os.waitpid(feeder, 0)
+    for fd in masters + slaves:
+        os.close(fd)
+
+    # The k-th reading the backend got from a device is the k-th line or frame that device sent
+    latencies = []
+    seen = collections.Counter()
+    for reading, received in zip(list(stub.readings), list(stub.received_at)):
+        source = reading["id"]
+        k = seen[source]
+        seen[source] += 1
+        if k < len(expected[source]):
+            latencies.append(received - expected[source][k])
+    latencies.sort()
+    elapsed = max(stub.received_at, default=schedule.start) - schedule.start
+    label = "max" if speed is None else f"{speed}x"
+    print(f"{label:>4s}: {len(stub.readings)}/{total} readings uploaded in {elapsed:6.2f} s "
+          f"({len(stub.readings) / elapsed:7.0f}/s), parse_data -> upload latency "
+          f"p50 {percentile(latencies, 0.5) * 1000:6.1f} ms  p99 {percentile(latencies, 0.99) * 1000:6.1f} ms  "
+          f"max {latencies[-1] * 1000:6.1f} ms")
+
+
+def main():
+    # python bench_replay.py [capture.bin [speed ...]]; without a capture, a synthetic one is replayed
+    stub = StubBackend().start()
+    speeds = [None if arg == "max" else float(arg) for arg in sys.argv[2:]] or SPEEDS
+    with tempfile.TemporaryDirectory() as directory:
+        if len(sys.argv) > 1:
+            path = sys.argv[1]
+        else:
+            path = os.path.join(directory, "capture.bin")
+            synthesize(path)
+        records = list(read_capture(path))
+        print(f"{path}: {len(records)} records from {len({r.source for r in records})} devices over "
+              f"{records[-1].timestamp - records[0].timestamp:.1f} s")
+        for speed in speeds:
+            stub.reset()
+            asyncio.run(replay(path, speed, stub))
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
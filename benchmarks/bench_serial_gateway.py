@@ -0,0 +1,122 @@
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+import tty
+
+import serial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from serial_gateway import SerialGateway
+
+PORT_COUNTS = (2, 16, 64)
+LINES_PER_SECOND = 50  # Per port
+RUN_SECONDS = 3
+LINE = b"Heart Rate: 82.0 SPO2: 97.0 Body Temperature: 36.6 Ambient Temperature: 24.1\n"
+
+
+def open_ptys(count):
+    """Return (masters, slave paths); the devices write to the master side."""
+    masters, paths, slaves = [], [], []
+    for _ in range(count):
+        master, slave = os.openpty()
+        tty.setraw(slave)  # No echo, no line editing: behave like a USB serial port
+        masters.append(master)
+        slaves.append(slave)
+        paths.append(os.ttyname(slave))
+    return masters, paths, slaves
+
+
+def start_feeder(masters, seconds):
+    """Fork a process that writes LINES_PER_SECOND lines to every port."""
+    pid = os.fork()
+    if pid == 0:
+        interval = 1 / LINES_PER_SECOND
+        deadline = time.monotonic() + seconds
+        next_at = time.monotonic()
+        while time.monotonic() < deadline:
+            for master in masters:
+                os.write(master, LINE)
+            next_at += interval
+            time.sleep(max(0, next_at - time.monotonic()))
+        os._exit(0)
+    return pid
+
+
+# What adarsh.py and multithreading2.py did: a reader and a writer thread per port
+def run_threaded(paths, seconds):
+    lines = [0]
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def read_from_device(ser):
+        while not stop.is_set():
+            data = ser.readline().decode('utf-8').strip()
+            if data:
+                with lock:
+                    lines[0] += 1
+
+    def send_data_to_device(ser):
+        while not stop.is_set():
+            stop.wait(5)  # Slept between alert fetches
+
+    connections = [serial.Serial(path, baudrate=115200, timeout=1) for path in paths]
+    threads = []
+    for ser in connections:
+        threads.append(threading.Thread(target=read_from_device, args=(ser,), daemon=True))
+        threads.append(threading.Thread(target=send_data_to_device, args=(ser,), daemon=True))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds / 2)
+    peak_threads = threading.active_count()
+    time.sleep(seconds / 2)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    for ser in connections:
+        ser.close()
+    return lines[0], peak_threads
+
+
+def run_gateway(paths, seconds):
+    async def main():
+        gateway = SerialGateway([(path, f"D{i}", f"JW{i:03d}") for i, path in enumerate(paths)],
+                                lambda data, device_id, uid: None)
+        runner = asyncio.create_task(gateway.run())
+        await asyncio.sleep(seconds / 2)
+        peak_threads = threading.active_count()
+        await asyncio.sleep(seconds / 2)
+        runner.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await runner
+        return gateway.lines, peak_threads
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        return asyncio.run(main())
+
+
+def measure(name, run, ports):
+    masters, paths, slaves = open_ptys(ports)
+    feeder = start_feeder(masters, RUN_SECONDS)
+    cpu = time.process_time()
+    lines, peak_threads = run(paths, RUN_SECONDS)
+    cpu = time.process_time() - cpu
+    os.waitpid(feeder, 0)
+    for fd in masters + slaves:
+        os.close(fd)
+    expected = ports * LINES_PER_SECOND * RUN_SECONDS
+    print(f"{ports:3d} ports  {name:15s} {peak_threads:4d} threads  {cpu * 1000:8.1f} ms CPU  "
+          f"{lines:6d}/{expected} lines  {cpu / max(lines, 1) * 1e6:7.1f} us CPU per line")
+
+
+def main():
+    for ports in PORT_COUNTS:
+        measure("2 threads/port", run_threaded, ports)
+        measure("SerialGateway", run_gateway, ports)
+
+
+if __name__ == "__main__":
+    main()
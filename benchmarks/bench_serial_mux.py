@@ -0,0 +1,90 @@
+import os
+import statistics
+import sys
+import threading
+import time
+import tty
+
+import serial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from serial_reader import SerialMultiplexer
+
+BUSY_PORTS = 4
+IDLE_COUNTS = (0, 4, 16, 64)
+LINE_RATE = 20  # Lines per second on each busy port
+RUN_SECONDS = 4
+READ_TIMEOUT = 0.1  # socket/rcv.py uses 1 s; shortened so the round-robin runs finish
+
+
+def feed(masters, stop):
+    """Write a timestamped line to every busy port LINE_RATE times a second."""
+    next_at = time.monotonic()
+    while not stop.is_set():
+        for master in masters:
+            os.write(master, f"Heart Rate: 82.0 sent {time.monotonic():.6f}\n".encode())
+        next_at += 1 / LINE_RATE
+        time.sleep(max(0, next_at - time.monotonic()))
+
+
+def latency(line):
+    return time.monotonic() - float(line.rsplit(" ", 1)[1])
+
+
+# socket/rcv.py before: readline on each port in turn
+def round_robin(ser_devices, stop):
+    latencies = []
+    while not stop.is_set():
+        for com_port, ser in ser_devices.items():
+            data = ser.readline().decode('utf-8').strip()
+            if data and "sent" in data:
+                latencies.append(latency(data))
+    return latencies
+
+
+def multiplexed(ser_devices, stop):
+    latencies = []
+    multiplexer = SerialMultiplexer(ser_devices)
+    while not stop.is_set():
+        for com_port, data in multiplexer.read_lines(timeout=READ_TIMEOUT):
+            latencies.append(latency(data))
+    return latencies
+
+
+def measure(name, loop, idle):
+    pairs = [os.openpty() for _ in range(BUSY_PORTS + idle)]
+    ser_devices = {}
+    for i, (master, slave) in enumerate(pairs):
+        tty.setraw(slave)
+        ser_devices[f"port{i}"] = serial.Serial(os.ttyname(slave), baudrate=115200, timeout=READ_TIMEOUT)
+
+    stop = threading.Event()
+    feeder = threading.Thread(target=feed, args=([master for master, _ in pairs[:BUSY_PORTS]], stop), daemon=True)
+    feeder.start()
+    threading.Timer(RUN_SECONDS, stop.set).start()
+    cpu = time.process_time()
+    latencies = loop(ser_devices, stop)
+    cpu = time.process_time() - cpu
+    feeder.join()
+
+    for ser in ser_devices.values():
+        ser.close()
+    for master, slave in pairs:
+        os.close(master)
+        os.close(slave)
+    latencies.sort()
+    expected = BUSY_PORTS * LINE_RATE * RUN_SECONDS
+    print(f"{idle:3d} idle ports  {name:12s} {len(latencies):5d}/{expected} lines  "
+          f"p50 {statistics.median(latencies) * 1000:8.2f} ms  max {latencies[-1] * 1000:8.2f} ms  "
+          f"CPU {cpu * 1000:6.0f} ms")
+
+
+def main():
+    print(f"{BUSY_PORTS} busy ports at {LINE_RATE} lines/s, readline timeout {READ_TIMEOUT} s")
+    for idle in IDLE_COUNTS:
+        measure("round-robin", round_robin, idle)
+        measure("multiplexer", multiplexed, idle)
+
+
+if __name__ == "__main__":
+    main()
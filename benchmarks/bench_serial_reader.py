@@ -0,0 +1,98 @@
+import fcntl
+import os
+import sys
+import threading
+import time
+import tty
+
+import serial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from serial_reader import SerialLineReader
+
+RATES = (10, 100, 1000, 10000)  # Lines per second sent by the fake device
+RUN_SECONDS = 3
+LINE = b"Heart Rate: 82.0 SPO2: 97.0 Body Temperature: 36.6 Ambient Temperature: 24.1\n"
+
+
+class FakeDevice(threading.Thread):
+    """
+    Write LINE at a fixed rate to the master side of a pty. Like a UART with no flow
+    control, it never waits for the reader: a line that doesn't fit in the
+    receive buffer is lost and counted.
+    """
+
+    def __init__(self, master, rate, seconds):
+        super().__init__(daemon=True)
+        fcntl.fcntl(master, fcntl.F_SETFL, fcntl.fcntl(master, fcntl.F_GETFL) | os.O_NONBLOCK)
+        self.master = master
+        self.rate = rate
+        self.seconds = seconds
+        self.sent = 0
+        self.lost = 0
+
+    def run(self):
+        interval = 1 / self.rate
+        deadline = time.monotonic() + self.seconds
+        next_at = time.monotonic()
+        while time.monotonic() < deadline:
+            # Catch up on every line that was due, as a device on its own clock would
+            while next_at <= time.monotonic():
+                try:
+                    written = os.write(self.master, LINE)
+                    if written < len(LINE):
+                        self.lost += 1
+                    else:
+                        self.sent += 1
+                except BlockingIOError:
+                    self.lost += 1
+                next_at += interval
+            time.sleep(max(0, next_at - time.monotonic()))
+
+
+# socket/temp.py before: one readline, then a fixed 100 ms sleep
+def legacy_loop(ser, stop):
+    received = 0
+    while not stop.is_set():
+        data = ser.readline().decode('utf-8', errors='replace').strip()
+        if data:
+            received += 1
+        time.sleep(0.1)
+    return received, None
+
+
+def draining_loop(ser, stop):
+    reader = SerialLineReader(ser)
+    received = 0
+    while not stop.is_set():
+        received += len(reader.read_lines())
+    return received, reader.stats()
+
+
+def measure(name, loop, rate):
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    ser = serial.Serial(os.ttyname(slave), baudrate=115200, timeout=0.2)
+    device = FakeDevice(master, rate, RUN_SECONDS)
+    stop = threading.Event()
+    threading.Timer(RUN_SECONDS + 0.3, stop.set).start()
+    device.start()
+    received, stats = loop(ser, stop)
+    device.join()
+    ser.close()
+    os.close(master)
+    os.close(slave)
+    due = device.sent + device.lost
+    extra = f"  overruns seen {stats['overruns']:3d}  dropped bytes {stats['dropped_bytes']}" if stats else ""
+    print(f"{rate:6d} lines/s  {name:20s} received {received:6d}/{due:6d}  "
+          f"lost at device {device.lost:6d}  {received / RUN_SECONDS:9.1f} lines/s{extra}")
+
+
+def main():
+    for rate in RATES:
+        measure("readline + sleep 0.1", legacy_loop, rate)
+        measure("SerialLineReader", draining_loop, rate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import telemetry
+from alerts import AlertLane
+from backend import BackendClient
+from bench_frames import text_line
+from registry import DeviceRegistry
+from sharded import ShardedGateway, ShardWorker, shard_for
+from stub_backend import StubBackend
+from uploader import BatchUploader
+
+DEVICES = 256
+READINGS = 60000  # Split over the workers: the same fleet load at every worker count
+MAX_WORKERS = max(4, os.cpu_count() or 1)
+
+
+def write_registry(path):
+    with open(path, "w") as file:
+        file.write("device_id,jawaan_id,port,mac_address\n")
+        for i in range(DEVICES):
+            file.write(f"LA10AH{i:04d},JW{i:04d},/dev/ttyUSB{i},\n")
+
+
+def owned_devices(shard, shards, registry_path):
+    return [device for device in DeviceRegistry(registry_path) if shard_for(device, shards) == shard]
+
+
+def feed_ring(shard, shards, registry_path, ring_name, downlink_name, barrier):
+    # Stands in for the worker's serial ports: its share of the fleet's lines, through handle_line
+    worker = ShardWorker(shard, shards, ring_name)
+    devices = owned_devices(shard, shards, registry_path)
+    count = READINGS * len(devices) // DEVICES
+    lines = [text_line(i) for i in range(1000)]
+    barrier.wait()
+    for i in range(count):
+        device = devices[i % len(devices)]
+        while True:
+            dropped = worker.dropped
+            worker.handle_line(lines[i % 1000], device.device_id, device.jawaan_id)
+            if worker.dropped == dropped:
+                break
+            # Ring full: the benchmark wants every reading, so wait for the coordinator
+            worker.dropped = dropped
+            time.sleep(0.0005)
+    worker.close()
+
+
+def feed_queue(shard, shards, registry_path, queue, barrier):
+    # The obvious alternative: parse in the worker, pickle the reading dicts through a multiprocessing.Queue
+    devices = owned_devices(shard, shards, registry_path)
+    count = READINGS * len(devices) // DEVICES
+    lines = [text_line(i) for i in range(1000)]
+    barrier.wait()
+    for i in range(count):
+        device = devices[i % len(devices)]
+        queue.put(telemetry.parse_data(lines[i % 1000], device.device_id, device.jawaan_id))
+    queue.put(None)
+
+
+def expected(workers, registry_path):
+    return sum(READINGS * len(owned_devices(shard, workers, registry_path)) // DEVICES for shard in range(workers))
+
+
+def wait_uploaded(stub, uploader, total, timeout=120):
+    deadline = time.monotonic() + timeout
+    while len(stub.readings) < total and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return len(stub.readings)
+
+
+def run_rings(workers, registry_path, stub):
+    backend = BackendClient(stub.url)
+    uploader = BatchUploader(stub.url + "/api/ble/esp", max_batch=500, max_queue=READINGS, backend=backend,
+                             report_interval=0)
+    alert_lane = AlertLane(backend)
+    gateway = ShardedGateway(registry_path, uploader, alert_lane, workers=workers, target=feed_ring)
+    barrier = gateway.context.Barrier(workers + 1)
+    gateway.args = (barrier,)
+    total = expected(workers, registry_path)
+    uploader.start()
+    alert_lane.start()
+    gateway.start()
+    barrier.wait()
+    start = time.perf_counter()
+    drain_time = 0.0
+    while gateway.readings < total:
+        t = time.perf_counter()
+        moved = gateway.drain()
+        drain_time += time.perf_counter() - t
+        if not moved:
+            time.sleep(0.0005)
+    uploaded = wait_uploaded(stub, uploader, total)
+    elapsed = time.perf_counter() - start
+    gateway.stop()
+    uploader.stop()
+    alert_lane.stop()
+    return total, uploaded, elapsed, drain_time / total
+
+
+def run_queue(workers, registry_path, stub):
+    backend = BackendClient(stub.url)
+    uploader = BatchUploader(stub.url + "/api/ble/esp", max_batch=500, max_queue=READINGS, backend=backend,
+                             report_interval=0)
+    gateway = ShardedGateway(registry_path, uploader, None, workers=workers)
+    context = gateway.context
+    queue = context.Queue()
+    barrier = context.Barrier(workers + 1)
+    processes = [context.Process(target=feed_queue, args=(shard, workers, registry_path, queue, barrier), daemon=True)
+                 for shard in range(workers)]
+    total = expected(workers, registry_path)
+    uploader.start()
+    for process in processes:
+        process.start()
+    barrier.wait()
+    start = time.perf_counter()
+    drain_time = 0.0
+    finished = received_count = 0
+    while finished < workers:
+        t = time.perf_counter()
+        reading = queue.get()
+        if reading is None:
+            finished += 1
+        else:
+            uploader.submit(reading)
+            received_count += 1
+        drain_time += time.perf_counter() - t
+    uploaded = wait_uploaded(stub, uploader, total)
+    elapsed = time.perf_counter() - start
+    for process in processes:
+        process.join()
+    uploader.stop()
+    return total, uploaded, elapsed, drain_time / max(received_count, 1)
+
+
+def run_single(stub):
+    # What multithreading2.py does today: parse, encode and upload in one process
+    backend = BackendClient(stub.url)
+    uploader = BatchUploader(stub.url + "/api/ble/esp", max_batch=500, max_queue=READINGS, backend=backend,
+                             report_interval=0)
+    lines = [text_line(i) for i in range(1000)]
+    uploader.start()
+    start = time.perf_counter()
+    for i in range(READINGS):
+        reading = telemetry.parse_reading(lines[i % 1000], f"LA10AH{i % DEVICES:04d}", f"JW{i % DEVICES:04d}")
+        uploader.submit(reading)
+    uploaded = wait_uploaded(stub, uploader, READINGS)
+    elapsed = time.perf_counter() - start
+    uploader.stop()
+    return READINGS, uploaded, elapsed
+
+
+def main():
+    print(f"{DEVICES} devices, {READINGS} readings, {os.cpu_count()} CPU(s) visible")
+    stub = StubBackend().start()
+    with tempfile.TemporaryDirectory() as directory:
+        registry_path = os.path.join(directory, "devices.csv")
+        write_registry(registry_path)
+
+        total, uploaded, elapsed = run_single(stub)
+        print(f"single process        {total / elapsed:8.0f} readings/s end to end ({uploaded}/{total} uploaded)")
+
+        workers = 1
+        while workers <= MAX_WORKERS:
+            for name, run in (("shared-memory rings", run_rings), ("pickled dict queue", run_queue)):
+                stub.reset()
+                total, uploaded, elapsed, per_record = run(workers, registry_path, stub)
+                print(f"{workers} worker(s), {name:19s} {total / elapsed:8.0f} readings/s end to end "
+                      f"({uploaded}/{total} uploaded), coordinator {per_record * 1e6:5.2f} us/reading to receive")
+            workers *= 2
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from uploader import BatchUploader
+from stub_backend import StubBackend
+
+READINGS = 2000
+BACKEND_DELAY = 0.005  # Simulated backend processing time per request
+
+
+def reading(i):
+    return {'id': 'LA10AH0001', 'uid': 'JW001', 'heartRate': 70 + i % 20, 'spo2': 97}
+
+
+def bench_per_reading(url):
+    start = time.perf_counter()
+    for i in range(READINGS):
+        requests.post(url, json=reading(i))
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+def bench_batched(url):
+    uploader = BatchUploader(url, report_interval=0).start()
+    start = time.perf_counter()
+    for i in range(READINGS):
+        uploader.submit(reading(i))
+    submit_time = time.perf_counter() - start
+    uploader.stop()
+    total = time.perf_counter() - start
+    print(f"  uploader stats: {uploader.stats()}")
+    return submit_time, total
+
+
+def main():
+    backend = StubBackend(delay=BACKEND_DELAY).start()
+    url = backend.url + "/api/ble/esp"
+
+    for name, bench in (("requests.post per reading", bench_per_reading), ("BatchUploader", bench_batched)):
+        backend.reset()
+        blocked, total = bench(url)
+        print(f"{name:26s} caller blocked {blocked * 1000:8.1f} ms, delivered {len(backend.readings)} readings "
+              f"in {backend.requests} requests, {READINGS / total:10,.0f} readings/s")
+
+    backend.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+
+def health_payload(seq):
+    # Dot-separated frame as parsed by parse_health_data: temperature.hrv.hr.rr.spo2
+    return f"36.{40 + seq % 20}.{70 + seq % 30}.16.97".encode("utf-8")
+
+
+class FakeBleakClient:
+    """
+    Stand-in for bleak.BleakClient that produces a new characteristic value `rate`
+    times per second.
+
+    With notifications the value is pushed to the start_notify callback as soon as it
+    is produced; read_gatt_char returns the latest value after `gatt_latency` seconds,
+    like a real GATT read round-trip. `produced_at[seq]` records when each value was
+    produced so callers can measure end-to-end latency. `connect_time` and
+    `fail_connects` simulate slow or unreachable devices.
+    """
+
+    def __init__(self, address, rate=1.0, payload=health_payload, supports_notify=True,
+                 gatt_latency=0.03, connect_time=0.0, fail_connects=0, disconnect_after=None):
+        self.address = address
+        self.rate = rate
+        self.payload = payload
+        self.supports_notify = supports_notify
+        self.gatt_latency = gatt_latency
+        self.connect_time = connect_time
+        self.fail_connects = fail_connects
+        self.disconnect_after = disconnect_after
+        self.is_connected = False
+        self.seq = -1
+        self.produced_at = {}
+        self.writes = []
+        self.reads = 0
+        self._callback = None
+        self._producer = None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.disconnect()
+
+    async def connect(self):
+        await asyncio.sleep(self.connect_time)
+        if self.fail_connects:
+            self.fail_connects -= 1
+            raise OSError(f"Device {self.address} not found")
+        self.is_connected = True
+        self._producer = asyncio.create_task(self._produce())
+        return True
+
+    async def disconnect(self):
+        self.is_connected = False
+        if self._producer is not None:
+            self._producer.cancel()
+            self._producer = None
+        return True
+
+    async def _produce(self):
+        interval = 1 / self.rate
+        started = time.perf_counter()
+        next_at = started
+        while self.is_connected:
+            self.seq += 1
+            self.produced_at[self.seq] = time.perf_counter()
+            if self._callback is not None:
+                self._callback(self.address, bytearray(self.payload(self.seq)))
+            if self.disconnect_after is not None and time.perf_counter() - started >= self.disconnect_after:
+                self.is_connected = False
+                return
+            next_at += interval
+            await asyncio.sleep(max(0, next_at - time.perf_counter()))
+
+    async def start_notify(self, char_uuid, callback):
+        if not self.supports_notify:
+            raise RuntimeError("Characteristic does not support notify")
+        self._callback = callback
+
+    async def stop_notify(self, char_uuid):
+        self._callback = None
+
+    async def read_gatt_char(self, char_uuid):
+        if not self.is_connected:
+            raise OSError("Not connected")
+        await asyncio.sleep(self.gatt_latency)
+        self.reads += 1
+        return bytearray(self.payload(max(self.seq, 0)))
+
+    async def write_gatt_char(self, char_uuid, data, response=False):
+        if not self.is_connected:
+            raise OSError("Not connected")
+        self.writes.append(bytes(data))
@@ -0,0 +1,127 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubBackend:
+    """
+    Local stand-in for cms-backend-five.vercel.app, for benchmarks.
+
+    Records every JSON body it receives per path. Set `delay` to simulate backend
+    processing time (with `max_concurrent`, only that many requests are processed
+    at once, as on a single small instance or a thin uplink) and `failing` to answer 503 as during an outage (or `fail_next`
+for only the next N requests, a blip). GET on
+    /api/alert/readAlertReply serves `alerts` with an ETag and honours If-None-Match.
+    """
+
+    def __init__(self, delay=0.0, max_concurrent=None):
+        self.delay = delay
+        self.slots = threading.Semaphore(max_concurrent) if max_concurrent else None
+        self.failing = False
+        self.fail_next = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.readings = []
+        self.received_at = []  # time.monotonic() each reading arrived, parallel to `readings`
+        self.bodies = {}
+        self.alerts = []
+        self.alerts_version = 0
+        self.bytes_sent = 0
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with stub.lock:
+                    stub.connections += 1
+
+            def _reply(self, status, body=b"{}", headers=()):
+                self.send_response(status)
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _read_body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length)) if length else None
+
+            def do_POST(self):
+                body = self._read_body()
+                if stub.slots is not None:
+                    with stub.slots:
+                        time.sleep(stub.delay)
+                elif stub.delay:
+                    time.sleep(stub.delay)
+                if stub.failing or stub.take_failure():
+                    self._reply(503)
+                    return
+                stub.record(self.path, body)
+                self._reply(200)
+
+            do_PUT = do_POST
+
+            def do_GET(self):
+                with stub.lock:
+                    stub.requests += 1
+                    etag = f'"{stub.alerts_version}"'
+                    alerts = list(stub.alerts)
+                if self.headers.get("If-None-Match") == etag:
+                    self._reply(304, b"", [("ETag", etag)])
+                    return
+                body = json.dumps({"success": True, "mssg": alerts}).encode("utf-8")
+                with stub.lock:
+                    stub.bytes_sent += len(body)
+                self._reply(200, body, [("ETag", etag), ("Content-Type", "application/json")])
+
+            def log_message(self, format, *args):
+                pass
+
+        self.handler = Handler
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def record(self, path, body):
+        with self.lock:
+            self.requests += 1
+            self.bodies.setdefault(path, []).append(body)
+            if path == "/api/ble/esp":
+                readings = body if isinstance(body, list) else [body]
+                self.readings.extend(readings)
+                self.received_at.extend([time.monotonic()] * len(readings))
+
+    def take_failure(self):
+        with self.lock:
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                return True
+            return False
+
+    def set_alerts(self, alerts):
+        with self.lock:
+            self.alerts = list(alerts)
+            self.alerts_version += 1
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.readings = []
+            self.received_at = []
+            self.bodies = {}
+            self.bytes_sent = 0
+            self.connections = 0
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
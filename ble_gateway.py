@@ -0,0 +1,141 @@
+import asyncio
+import random
+import time
+
+from bleak import BleakClient
+
+from ble_ingest import READ_CHARACTERISTIC_UUID, ingest
+
+WRITE_CHARACTERISTIC_UUID = "beb5483e-36e1-4688-b7f5-ea07361b26a9"
+
+
+def device_id_for(mac_address):
+    return mac_address.replace(":", "")
+
+
+class BleGateway:
+    """
+    Supervise one BLE connection per MAC address.
+
+    At most `max_connecting` connects run at once and connect attempts start at least
+    `stagger` seconds apart, so hundreds of wearables don't hit the adapter together.
+    Each device reconnects on its own with exponential backoff; one failing device
+    never affects the others. `clients` is the single registry of live connections,
+    keyed by device id, shared by the readers and by write(). The device id is the
+    MAC without colons (device_id_for) unless add() is given the registry's own,
+    and frames are handed to `handle_frame` under that same id.
+
+    With `metrics` (metrics.Metrics), the time each notification or poll delivered a
+    frame is recorded as the device's read time, so the frame stage and end_to_end
+    include the wait in ble_ingest's queue.
+    """
+
+    def __init__(self, mac_addresses, handle_frame, client_factory=BleakClient, max_connecting=4,
+                 stagger=0.1, backoff_initial=1.0, backoff_max=60.0, mode="notify",
+                 char_uuid=READ_CHARACTERISTIC_UUID, metrics=None):
+        self.mac_addresses = list(mac_addresses)
+        self.handle_frame = handle_frame
+        self.client_factory = client_factory
+        self.stagger = stagger
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.mode = mode
+        self.char_uuid = char_uuid
+        self.metrics = metrics
+        self.connect_slots = asyncio.Semaphore(max_connecting)
+        self.clients = {}
+        self.connects = 0
+        self.failures = 0
+        self._next_connect_at = 0.0
+        self._tasks = {}
+        self._stopped = None
+
+    async def _wait_for_turn(self):
+        # Reserve the next connect start time, spaced `stagger` apart
+        now = time.monotonic()
+        start_at = max(now, self._next_connect_at)
+        self._next_connect_at = start_at + self.stagger
+        await asyncio.sleep(start_at - now)
+
+    async def _connect(self, mac_address):
+        client = self.client_factory(mac_address)
+        async with self.connect_slots:
+            await self._wait_for_turn()
+            await client.connect()
+        return client
+
+    async def supervise(self, mac_address, device_id=None):
+        device_id = device_id or device_id_for(mac_address)
+        backoff = self.backoff_initial
+
+        async def handle(frame, received_at):
+            if self.metrics is not None:
+                self.metrics.read(device_id, received_at, time.perf_counter(), 1)
+            await self.handle_frame(device_id, frame)
+
+        while True:
+            client = None
+            try:
+                client = await self._connect(mac_address)
+                self.connects += 1
+                self.clients[device_id] = client
+                backoff = self.backoff_initial
+                print(f"Connected to {device_id}")
+                await ingest(client, handle, mode=self.mode, char_uuid=self.char_uuid, timed=True)
+                print(f"Device {device_id} disconnected")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failures += 1
+                print(f"Error on BLE device {device_id}: {e}")
+            finally:
+                self.clients.pop(device_id, None)
+                if client is not None and client.is_connected:
+                    try:
+                        await client.disconnect()
+                    except Exception as e:
+                        print(f"Error disconnecting {device_id}: {e}")
+
+            # Full jitter keeps devices that dropped together from reconnecting together
+            await asyncio.sleep(random.uniform(0, backoff))
+            backoff = min(backoff * 2, self.backoff_max)
+
+    def add(self, mac_address, device_id=None):
+        if mac_address not in self._tasks:
+            self._tasks[mac_address] = asyncio.create_task(self.supervise(mac_address, device_id))
+
+    def remove(self, mac_address):
+        task = self._tasks.pop(mac_address, None)
+        if task is not None:
+            task.cancel()
+
+    async def run(self):
+        self._stopped = asyncio.Event()
+        for mac_address in self.mac_addresses:
+            self.add(mac_address)
+        # Devices come and go with add/remove (e.g. a registry reload); run until stop() or cancelled
+        try:
+            await self._stopped.wait()
+        finally:
+            for mac_address in list(self._tasks):
+                self.remove(mac_address)
+
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        for mac_address in list(self._tasks):
+            self.remove(mac_address)
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._stopped is not None:
+            self._stopped.set()
+
+    async def write(self, device_id, message):
+        client = self.clients.get(device_id)
+        if client is None:
+            print(f"Device {device_id} not connected")
+            return False
+        try:
+            await client.write_gatt_char(WRITE_CHARACTERISTIC_UUID, message.encode("utf-8"))
+            return True
+        except Exception as e:
+            print(f"Error writing to BLE device {device_id}: {e}")
+            return False
@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+READ_CHARACTERISTIC_UUID = "beb5483e-36e1-4688-b7f5-ea07361b26a8"
+
+
+def put_latest(frames, frame):
+    """
+    Queue a frame with the time it was received, dropping the oldest one if the
+    consumer has fallen behind.
+    """
+    if frames.full():
+        frames.get_nowait()
+        frames.task_done()
+    frames.put_nowait((time.perf_counter(), frame))
+
+
+async def notify_frames(client, frames, char_uuid=READ_CHARACTERISTIC_UUID):
+    """
+    Subscribe to the characteristic and queue every notification until the client
+    disconnects. Raises if the characteristic does not support notifications.
+    """
+    await client.start_notify(char_uuid, lambda sender, data: put_latest(frames, bytes(data)))
+    try:
+        while client.is_connected:
+            await asyncio.sleep(1)
+    finally:
+        if client.is_connected:
+            try:
+                await client.stop_notify(char_uuid)
+            except Exception as e:
+                print(f"Error stopping notifications: {e}")
+
+
+async def poll_frames(client, frames, char_uuid=READ_CHARACTERISTIC_UUID, interval=1):
+    """Fallback: read the characteristic every `interval` seconds."""
+    while client.is_connected:
+        try:
+            value = await client.read_gatt_char(char_uuid)
+            put_latest(frames, bytes(value))
+        except Exception as e:
+            print(f"Error reading BLE device: {e}")
+        await asyncio.sleep(interval)
+
+
+async def read_frames(client, frames, mode="notify", char_uuid=READ_CHARACTERISTIC_UUID, poll_interval=1):
+    """
+    Feed raw characteristic values from `client` into the `frames` asyncio.Queue.
+    mode="notify" subscribes with start_notify and falls back to polling when the
+    device does not support it; mode="poll" always polls.
+    """
+    if mode == "notify":
+        try:
+            await notify_frames(client, frames, char_uuid)
+            return
+        except Exception as e:
+            if not client.is_connected:
+                raise
+            print(f"Notifications unavailable ({e}), falling back to polling")
+    await poll_frames(client, frames, char_uuid, poll_interval)
+
+
+async def consume_frames(frames, handle, timed=False):
+    """
+    Pass each queued frame to the coroutine `handle`, logging its errors. With
+    `timed`, `handle(frame, received_at)` also gets the time.perf_counter() at
+    which the notification or poll delivered it, before it waited in the queue.
+    """
+    while True:
+        received_at, frame = await frames.get()
+        try:
+            await (handle(frame, received_at) if timed else handle(frame))
+        except Exception as e:
+            print(f"Error handling BLE frame {frame!r}: {e}")
+        finally:
+            frames.task_done()
+
+
+async def ingest(client, handle, mode="notify", char_uuid=READ_CHARACTERISTIC_UUID, poll_interval=1, maxsize=1000,
+                 timed=False):
+    """
+    Read frames from `client` and pass them to `handle` until the client disconnects.
+    Frames are queued between the two, so a slow handler never delays a notification.
+    `timed` is passed on to consume_frames.
+    """
+    frames = asyncio.Queue(maxsize=maxsize)
+    consumer = asyncio.create_task(consume_frames(frames, handle, timed))
+    try:
+        await read_frames(client, frames, mode, char_uuid, poll_interval)
+        await frames.join()
+    finally:
+        consumer.cancel()
@@ -0,0 +1,168 @@
+import struct
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+import serial_asyncio
+
+MAGIC = b"ESPCAP1\n"
+# Capture time (time.time()), kind, source length, payload length; then the source and the payload
+RECORD = struct.Struct("<dBHI")
+
+SERIAL = 0  # Raw bytes as read from a serial port; source is the port
+BLE = 1     # One BLE notification (or GATT read) value; source is the device id
+
+KINDS = {SERIAL: "serial", BLE: "ble"}
+
+
+@dataclass(slots=True, frozen=True)
+class Record:
+    """One captured read: when, from which port or BLE device, and the raw bytes."""
+    timestamp: float
+    kind: int
+    source: str
+    payload: bytes
+
+
+class CaptureWriter:
+    """
+    Append raw serial reads and BLE notifications to a capture file.
+
+    The file is MAGIC followed by records, each a RECORD header and then the
+    source name and payload exactly as they were read, so a capture replays
+    byte for byte (benchmarks/bench_replay.py): line splits, partial lines and
+    binary frames included. record() is safe to call from several threads;
+    the file is flushed at least every `flush_interval` seconds, and a record
+    cut short by a crash is ignored on reading.
+    """
+
+    def __init__(self, path, flush_interval=1.0, clock=time.time):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.lock = threading.Lock()
+        self.records = 0
+        self.bytes = 0
+        self._last_flush = clock()
+
+    def record(self, kind, source, payload, timestamp=None):
+        now = self.clock()
+        source = source.encode("utf-8")
+        payload = bytes(payload)
+        header = RECORD.pack(now if timestamp is None else timestamp, kind, len(source), len(payload))
+        with self.lock:
+            self.file.write(header + source + payload)
+            self.records += 1
+            self.bytes += len(payload)
+            if now - self._last_flush >= self.flush_interval:
+                self.file.flush()
+                self._last_flush = now
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def read_capture(path):
+    """Yield the Records of a capture file in the order they were written."""
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a capture file")
+        while True:
+            header = file.read(RECORD.size)
+            if len(header) < RECORD.size:
+                return
+            timestamp, kind, source_length, payload_length = RECORD.unpack(header)
+            source = file.read(source_length)
+            payload = file.read(payload_length)
+            if len(payload) < payload_length:
+                return
+            yield Record(timestamp, kind, source.decode("utf-8"), payload)
+
+
+class _RecordingReader:
+    def __init__(self, reader, capture, port):
+        self.reader = reader
+        self.capture = capture
+        self.port = port
+
+    async def read(self, n=-1):
+        chunk = await self.reader.read(n)
+        if chunk:
+            self.capture.record(SERIAL, self.port, chunk)
+        return chunk
+
+
+def recording_connection(capture, open_connection=serial_asyncio.open_serial_connection):
+    """An open_connection for SerialGateway that records every chunk read from each port."""
+    async def open_recorded(url, baudrate):
+        reader, writer = await open_connection(url=url, baudrate=baudrate)
+        return _RecordingReader(reader, capture, url), writer
+    return open_recorded
+
+
+def recording_handler(capture, handle_frame):
+    """Wrap a BleGateway handle_frame so every notification is recorded before it is handled."""
+    async def handle(device_id, frame):
+        capture.record(BLE, device_id, frame)
+        await handle_frame(device_id, frame)
+    return handle
+
+
+async def record_devices(registry_path, path):
+    """Record the registry's serial ports and BLE devices to `path` without parsing or uploading anything."""
+    import asyncio
+
+    from registry import DeviceRegistry
+    from serial_gateway import SerialGateway
+
+    registry = DeviceRegistry(registry_path)
+    with CaptureWriter(path) as capture:
+        serial = SerialGateway(registry.serial_devices(), lambda data, device_id, uid: None,
+                               open_connection=recording_connection(capture))
+        tasks = [serial.run()]
+        macs = [device.mac_address for device in registry if device.mac_address and not device.port]
+        if macs:
+            from ble_gateway import BleGateway
+
+            async def ignore(device_id, frame):
+                pass
+
+            tasks.append(BleGateway(macs, recording_handler(capture, ignore)).run())
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            print(f"Recorded {capture.records} reads, {capture.bytes} bytes to {path}")
+
+
+if __name__ == "__main__":
+    # python capture.py capture.bin [devices.csv]: record until Ctrl-C
+    # python capture.py --summary capture.bin: what a capture holds
+    import asyncio
+
+    if sys.argv[1] == "--summary":
+        counts = {}
+        first = last = None
+        for record in read_capture(sys.argv[2]):
+            key = (KINDS[record.kind], record.source)
+            reads, size = counts.get(key, (0, 0))
+            counts[key] = (reads + 1, size + len(record.payload))
+            first = record.timestamp if first is None else first
+            last = record.timestamp
+        print(f"{sum(reads for reads, _ in counts.values())} reads over {(last or 0) - (first or 0):.1f} s")
+        for (kind, source), (reads, size) in sorted(counts.items()):
+            print(f"  {kind:6s} {source}: {reads} reads, {size} bytes")
+    else:
+        try:
+            asyncio.run(record_devices(sys.argv[2] if len(sys.argv) > 2 else "devices.csv", sys.argv[1]))
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,286 @@
+import re
+import sys
+from binascii import crc_hqx
+
+import numpy as np
+
+import frames
+import telemetry
+
+# Every field either format can carry, in backend schema order; name -> nested under 'environment'
+COLUMNS = {}
+for _field, _nested, _converter in telemetry.FIELDS.values():
+    COLUMNS.setdefault(_field, _nested)
+for _field, _nested, _code, _divisor in frames.BINARY_FIELDS:
+    COLUMNS.setdefault(_field, _nested)
+
+# Fields parse_data reports as int; emitted as int whenever the value is whole
+INT_COLUMNS = {field for field, nested, converter in telemetry.FIELDS.values() if converter is int}
+INT_COLUMNS.update(('hrv', 'rssi'))
+
+LINE_SCAN_PATTERN = re.compile(telemetry.FIELD_PATTERN.pattern.encode() + rb'|\n')
+# Field -> (its labels, int converter); both pressure spellings feed one column
+FIELD_LABELS = {}
+for _label, (_field, _nested, _converter) in telemetry.FIELDS.items():
+    FIELD_LABELS.setdefault(_field, ([], _converter is int))[0].append(_label.encode())
+# Lines that need the full parser: alerts, commands and sound levels
+ALERT_PATTERN = re.compile('|'.join(('Emergency', 'dB') + telemetry.COMMAND_WORDS).encode())
+ALERT_KEYS = ('rssi', 'textCommand', 'fallDamage')
+
+FRAME_DTYPE = np.dtype(
+    [('magic', 'u1'), ('version', 'u1'), ('flags', 'u1'), ('seq', '<u2'), ('present', '<u2')]
+    + [(field, '<' + code) for field, nested, code, divisor in frames.BINARY_FIELDS]
+    + [('crc', '<u2')]
+)
+assert FRAME_DTYPE.itemsize == frames.FRAME_SIZE
+
+
+class Columns:
+    """
+    A block of readings stored column by column.
+
+    `fields` maps each field name to a float64 array with NaN where the reading
+    didn't carry the field; `device` holds an index into `device_ids` per row.
+    Alert keys (rssi, textCommand, fallDamage) are rare, so they are kept per row in
+    `extras` instead of as columns. No per-reading dicts exist until to_records().
+    """
+
+    def __init__(self, fields, device, device_ids, uids=None, extras=None):
+        self.fields = fields
+        self.device = device
+        self.device_ids = device_ids
+        self.uids = uids or [None] * len(device_ids)
+        self.extras = extras or {}
+
+    def __len__(self):
+        return len(self.device)
+
+    @classmethod
+    def concat(cls, blocks):
+        blocks = [block for block in blocks if len(block)]
+        if not blocks:
+            return empty()
+        device_ids, uids, devices, extras = [], [], [], {}
+        offset = 0
+        for block in blocks:
+            devices.append(block.device + len(device_ids))
+            device_ids.extend(block.device_ids)
+            uids.extend(block.uids)
+            extras.update((row + offset, values) for row, values in block.extras.items())
+            offset += len(block)
+        fields = {name: np.concatenate([block.fields[name] for block in blocks]) for name in COLUMNS}
+        return cls(fields, np.concatenate(devices), device_ids, uids, extras)
+
+    def slice(self, start, stop):
+        extras = {row - start: values for row, values in self.extras.items() if start <= row < stop}
+        return Columns({name: column[start:stop] for name, column in self.fields.items()},
+                       self.device[start:stop], self.device_ids, self.uids, extras)
+
+    def take(self, rows):
+        """A block of only the given rows (ascending row numbers), in order."""
+        index = {row: i for i, row in enumerate(rows)}
+        extras = {index[row]: values for row, values in self.extras.items() if row in index}
+        return Columns({name: column[rows] for name, column in self.fields.items()},
+                       self.device[rows], self.device_ids, self.uids, extras)
+
+    def to_records(self, skip_empty=False):
+        """
+        Readings in the parse_data schema, for the uploader or anything else expecting
+        dicts. With `skip_empty`, rows that carried no field at all are left out.
+        """
+        names = [name for name, column in self.fields.items() if not np.isnan(column).all()]
+        columns = [self.fields[name].tolist() for name in names]
+        layout = [(name, COLUMNS[name], name in INT_COLUMNS) for name in names]
+        identities = [_identity(device_id, uid) for device_id, uid in zip(self.device_ids, self.uids)]
+        extras = self.extras
+        records = []
+        # By row number, not zip(*columns): a block may have no numeric column at all
+        # (only alert or command lines) and its rows still count
+        for row, device in enumerate(self.device.tolist()):
+            reading = dict(identities[device])
+            environment = None
+            for (name, nested, as_int), column in zip(layout, columns):
+                value = column[row]
+                if value != value:  # NaN: not in this reading
+                    continue
+                if as_int and value.is_integer():
+                    value = int(value)
+                if nested:
+                    if environment is None:
+                        environment = reading['environment'] = {}
+                    environment[name] = value
+                else:
+                    reading[name] = value
+            if row in extras:
+                reading.update(extras[row])
+            elif skip_empty and len(reading) == len(identities[device]):
+                continue
+            records.append(reading)
+        return records
+
+
+def _identity(device_id, uid):
+    identity = {}
+    if device_id is not None:
+        identity['id'] = device_id
+    if uid is not None:
+        identity['uid'] = uid
+    return identity
+
+
+def _empty_fields(rows):
+    return {name: np.full(rows, np.nan) for name in COLUMNS}
+
+
+def empty():
+    return Columns(_empty_fields(0), np.zeros(0, dtype=np.int32), [])
+
+
+def _to_float(values, truncate):
+    try:
+        array = values.astype(np.float64)
+    except ValueError:
+        # A malformed value such as "1.2.3"; convert one by one like parse_data
+        converter = int if truncate else float
+        array = np.array([np.nan if v is None else v for v in
+                          (telemetry._convert(converter, value.decode()) for value in values)], dtype=np.float64)
+    return np.trunc(array) if truncate else array
+
+
+def decode_lines(lines, device_id=None, uid=None):
+    """
+    Decode a block of "Key: value" lines (a list of str, or newline-separated bytes)
+    into Columns, with the same values parse_data would give line by line: one row
+    per line, empty lines included, and none for an empty block.
+
+    The whole block is tokenized by one regex findall, with no match objects or
+    per-line dicts; each field's values are then placed in their rows and converted
+    in one NumPy cast.
+    """
+    if isinstance(lines, (bytes, bytearray)):
+        block = bytes(lines)
+        lines = None
+    else:
+        # Each line newline-terminated, so a trailing empty line is still a row
+        block = "".join(line + "\n" for line in lines).encode('utf-8', errors='replace')
+    newlines = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == 10)
+    rows = len(newlines) + (bool(block) and not block.endswith(b"\n"))
+    fields = _empty_fields(rows)
+
+    # findall returns (label, value) per field and ('', '') per newline, so a field's
+    # row is the number of newlines before it
+    tokens = LINE_SCAN_PATTERN.findall(block)
+    if tokens:
+        labels, values = zip(*tokens)
+        labels = np.array(labels)
+        values = np.array(values)
+        is_newline = labels == b''
+        match_rows = np.cumsum(is_newline)
+        for field, (field_labels, truncate) in FIELD_LABELS.items():
+            selected = np.flatnonzero(np.isin(labels, field_labels))
+            if not len(selected):
+                continue
+            converted = _to_float(values[selected], truncate)
+            keep = ~np.isnan(converted)
+            # Reversed, so the first occurrence in a line wins as it does in parse_data
+            target = fields[field]
+            target[match_rows[selected][keep][::-1]] = converted[keep][::-1]
+
+    extras = {}
+    for match in ALERT_PATTERN.finditer(block):
+        row = int(np.searchsorted(newlines, match.start()))
+        if row in extras:
+            continue
+        if lines is None:
+            start = newlines[row - 1] + 1 if row else 0
+            end = newlines[row] if row < len(newlines) else len(block)
+            line = block[start:end].decode('utf-8', errors='replace')
+        else:
+            line = lines[row]
+        parsed_data = telemetry.parse_data(line)
+        extras[row] = {key: parsed_data[key] for key in ALERT_KEYS if key in parsed_data}
+    extras = {row: values for row, values in extras.items() if values}
+
+    return Columns(fields, np.zeros(rows, dtype=np.int32), [device_id], [uid], extras)
+
+
+def decode_frames(buffer, device_id=None, uid=None, decoder=None):
+    """
+    Decode back-to-back binary frames into Columns with one np.frombuffer view;
+    only the CRC check runs per frame. Buffers with corrupt or misaligned frames go
+    through FrameDecoder's resynchronising scan first.
+    """
+    decoder = decoder or frames.FrameDecoder()
+    view = memoryview(buffer)
+    size = frames.FRAME_SIZE
+    if len(view) % size == 0:
+        records = np.frombuffer(view, dtype=FRAME_DTYPE)
+        crc = np.fromiter((crc_hqx(view[offset:offset + frames.CRC_OFFSET], 0xFFFF)
+                           for offset in range(0, len(view), size)), dtype=np.uint16, count=len(records))
+        valid = (records['magic'] == frames.MAGIC) & (records['version'] == frames.VERSION) & (records['crc'] == crc)
+        if not valid.all():
+            decoder.crc_errors += int((~valid).sum())
+            records = records[valid]
+    else:
+        records = np.array(decoder._scan(view), dtype=FRAME_DTYPE)
+    decoder.frames += len(records)
+
+    fields = _empty_fields(len(records))
+    present = records['present']
+    for bit, (field, nested, code, divisor) in enumerate(frames.BINARY_FIELDS):
+        column = records[field].astype(np.float64)
+        if divisor != 1:
+            column /= divisor
+        elif code == 'f':
+            column = np.round(column, 3)
+        column[(present & (1 << bit)) == 0] = np.nan
+        fields[field] = column
+
+    extras = {}
+    for row in np.flatnonzero(records['flags'] & frames.FLAG_FALL).tolist():
+        extras[row] = {'fallDamage': True}
+    rssi = fields['rssi']
+    for row in np.flatnonzero(~np.isnan(rssi)).tolist():
+        command = telemetry.decibel_command(rssi[row])
+        if command:
+            extras.setdefault(row, {})['textCommand'] = command
+
+    return Columns(fields, np.zeros(len(records), dtype=np.int32), [device_id], [uid], extras)
+
+
+def summarize(columns):
+    """Per device and field: (count, min, mean, max) over the block, for offline analysis."""
+    summary = {}
+    for code, device_id in enumerate(columns.device_ids):
+        rows = columns.device == code
+        device_summary = summary.setdefault(device_id, {})
+        for name, column in columns.fields.items():
+            values = column[rows]
+            values = values[~np.isnan(values)]
+            if len(values):
+                stats = (len(values), float(values.min()), float(values.mean()), float(values.max()))
+                if name in device_summary:
+                    # The same device in several blocks: merge the running totals
+                    count, low, mean, high = device_summary[name]
+                    total = count + stats[0]
+                    stats = (total, min(low, stats[1]), (mean * count + stats[2] * stats[0]) / total,
+                             max(high, stats[3]))
+                device_summary[name] = stats
+    return summary
+
+
+def main(paths):
+    """Summarize recorded serial logs: python columnar.py device1.txt [device2.txt ...]"""
+    blocks = []
+    for path in paths:
+        with open(path, 'rb') as file:
+            blocks.append(decode_lines(file.read(), device_id=path))
+    columns = Columns.concat(blocks)
+    for device_id, fields in summarize(columns).items():
+        print(device_id)
+        for name, (count, low, mean, high) in fields.items():
+            print(f"  {name:20s} n={count:<8d} min={low:<10g} mean={mean:<10.3f} max={high:g}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
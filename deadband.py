@@ -0,0 +1,277 @@
+import threading
+import time
+
+from reading import ENVIRONMENT_FIELDS, READING_FIELDS, Environment, Reading
+
+# Field -> deadband: a value is forwarded once it moved more than this from the
+# value last sent for the device. 0 forwards every change.
+DEADBANDS = {
+    'bodyTemperature': 0,
+    'respiratoryRate': 1,
+    'heartRate': 2,
+    'spo2': 0,
+    'altitude': 2,
+    'relativeHumidity': 2,
+    'battery': 1,
+    'rssi': 3,
+}
+ENVIRONMENT_DEADBANDS = {
+    'aqi': 5,
+    'voc': 0.5,
+    'ambientPressure': 1.0,
+    'ambientTemperature': 1,
+}
+
+_READING_FIELD_SET = frozenset(READING_FIELDS)
+_ENVIRONMENT_FIELD_SET = frozenset(ENVIRONMENT_FIELDS)
+_ALERT_KEYS = ('fallDamage', 'textCommand')
+NAN = float('nan')
+
+
+class DeltaFilter:
+    """
+    Per-device change detection between parsing and upload.
+
+    Wearables repeat near-identical values every second. filter() compares each
+    reading with the values last forwarded for the same device (id, uid) and returns
+    a Reading carrying only the id, uid and the fields that moved beyond their
+    deadband, or None when nothing did. Comparing against the last *forwarded*
+    value means a slow drift is still sent once it adds up to the deadband.
+
+    Every `keyframe_interval` seconds a device's next reading is forwarded whole,
+    so the backend's view can't stay stale. Readings carrying an alert (fallDamage,
+    or a textCommand from a command or a decibel band) are always forwarded whole
+    and at once. Anything that isn't a reading (e.g. a status dict) passes through.
+
+    filter_columns() does the same for a columnar.Columns block without building a
+    reading per row: it walks each column in row order and blanks the values that
+    stayed within their deadband.
+    """
+
+    def __init__(self, deadbands=None, environment_deadbands=None, keyframe_interval=60.0,
+                 clock=time.monotonic):
+        self.deadbands = dict(DEADBANDS)
+        self.deadbands.update(deadbands or {})
+        self.environment_deadbands = dict(ENVIRONMENT_DEADBANDS)
+        self.environment_deadbands.update(environment_deadbands or {})
+        self.keyframe_interval = keyframe_interval
+        self.clock = clock
+
+        # Fields without a deadband (id/uid aside) are forwarded on any change
+        self._fields = tuple((name, self.deadbands.get(name, 0)) for name in READING_FIELDS
+                             if name not in ('id', 'uid', 'textCommand', 'fallDamage', 'environment'))
+        self._environment_fields = tuple((name, self.environment_deadbands.get(name, 0))
+                                         for name in ENVIRONMENT_FIELDS)
+
+        self.lock = threading.Lock()
+        # (id, uid) -> [time of last keyframe, {field: last forwarded value}, {env field: value}]
+        self.devices = {}
+        self.readings = 0
+        self.forwarded = 0
+        self.suppressed = 0
+        self.keyframes = 0
+        self.alerts = 0
+        self.fields_in = 0
+        self.fields_out = 0
+
+    def filter(self, reading):
+        """Return what to upload for `reading`: itself, a Reading of the changed fields, or None."""
+        if type(reading) is not Reading:
+            if not isinstance(reading, dict) or not reading.keys() <= _READING_FIELD_SET:
+                return reading
+            reading = Reading.from_dict(reading)
+
+        now = self.clock()
+        with self.lock:
+            self.readings += 1
+            size = len(reading)
+            self.fields_in += size
+            state = self.devices.get((reading.id, reading.uid))
+
+            if reading.fallDamage or reading.textCommand is not None:
+                self.alerts += 1
+                self._remember(reading, state, now, keyframe=False)
+                return self._forward(reading, size)
+            if state is None or now - state[0] >= self.keyframe_interval:
+                self.keyframes += 1
+                self._remember(reading, state, now, keyframe=True)
+                return self._forward(reading, size)
+
+            delta = None
+            last = state[1]
+            for name, band in self._fields:
+                value = getattr(reading, name)
+                if value is None:
+                    continue
+                previous = last.get(name)
+                if previous is None or abs(value - previous) > band:
+                    if delta is None:
+                        delta = Reading(reading.id, reading.uid)
+                    setattr(delta, name, value)
+                    last[name] = value
+
+            environment = reading.environment
+            if environment is not None:
+                changed = None
+                last = state[2]
+                for name, band in self._environment_fields:
+                    value = getattr(environment, name)
+                    if value is None:
+                        continue
+                    previous = last.get(name)
+                    if previous is None or abs(value - previous) > band:
+                        if changed is None:
+                            changed = Environment()
+                        setattr(changed, name, value)
+                        last[name] = value
+                if changed is not None:
+                    if delta is None:
+                        delta = Reading(reading.id, reading.uid)
+                    delta.environment = changed
+
+            if delta is None:
+                self.suppressed += 1
+                return None
+            return self._forward(delta, len(delta))
+
+    def filter_columns(self, columns):
+        """
+        filter() for a columnar.Columns block: the rows that still carry something
+        to upload, each reduced to the fields that moved beyond their deadband.
+        """
+        now = self.clock()
+        rows = len(columns)
+        fields = {name: column.copy() for name, column in columns.fields.items()}
+        values = {name: column.tolist() for name, column in fields.items()}
+        present = [name for name, column in values.items() if any(value == value for value in column)]
+        extras = dict(columns.extras)
+        # Fields set per row (top level, environment), then those still set after filtering
+        counts = [0] * rows
+        environment_counts = [0] * rows
+        passed = [False] * rows  # Rows with a field a Reading can't hold go through as is, like filter()
+        for name in present:
+            known = name in _READING_FIELD_SET or name in _ENVIRONMENT_FIELD_SET
+            row_counts = environment_counts if name in _ENVIRONMENT_FIELD_SET else counts
+            for row, value in enumerate(values[name]):
+                if value == value:
+                    row_counts[row] += 1
+                    if not known:
+                        passed[row] = True
+        present = [name for name in present if name in _READING_FIELD_SET or name in _ENVIRONMENT_FIELD_SET]
+
+        identities = list(zip(columns.device_ids, columns.uids))
+        states = [None] * rows
+        whole = [False] * rows
+        keep = []
+        with self.lock:
+            # Row by row: which rows go out whole (alerts, keyframes), as in filter()
+            for row, device in enumerate(columns.device.tolist()):
+                extra = extras.get(row)
+                if passed[row] or (not counts[row] and not environment_counts[row] and extra is None):
+                    continue
+                self.readings += 1
+                self.fields_in += self._row_size(row, counts, environment_counts, extra)
+                key = identities[device]
+                state = states[row] = self.devices.get(key)
+                if state is None:
+                    state = states[row] = self.devices[key] = [now, {}, {}]
+                    keyframe = True
+                else:
+                    keyframe = now - state[0] >= self.keyframe_interval
+                if extra is not None and any(name in extra for name in _ALERT_KEYS):
+                    self.alerts += 1
+                    whole[row] = True
+                elif keyframe:
+                    self.keyframes += 1
+                    state[0] = now
+                    whole[row] = True
+                if extra is not None and 'rssi' in extra:
+                    if whole[row]:
+                        state[1]['rssi'] = extra['rssi']
+                    elif not self._moved(state[1], 'rssi', extra['rssi'], self.deadbands.get('rssi', 0)):
+                        # Without an alert key, rssi is all a row's extras hold
+                        del extras[row]
+
+            # Column by column: each value against the last one forwarded for its device
+            for name in present:
+                nested = name in _ENVIRONMENT_FIELD_SET
+                band = (self.environment_deadbands if nested else self.deadbands).get(name, 0)
+                row_counts = environment_counts if nested else counts
+                column = fields[name]
+                for row, value in enumerate(values[name]):
+                    state = states[row]
+                    if state is None or value != value:
+                        continue
+                    last = state[2 if nested else 1]
+                    if whole[row]:
+                        last[name] = value
+                    elif not self._moved(last, name, value, band):
+                        column[row] = NAN
+                        row_counts[row] -= 1
+
+            for row in range(rows):
+                if passed[row]:
+                    keep.append(row)
+                elif states[row] is None:
+                    continue
+                elif whole[row] or counts[row] or environment_counts[row] or row in extras:
+                    self._forward(None, self._row_size(row, counts, environment_counts, extras.get(row)))
+                    keep.append(row)
+                else:
+                    self.suppressed += 1
+
+        filtered = type(columns)(fields, columns.device, columns.device_ids, columns.uids, extras)
+        return filtered if len(keep) == rows else filtered.take(keep)
+
+    @staticmethod
+    def _row_size(row, counts, environment_counts, extra):
+        # As len(Reading): id, uid, each top-level field, and the environment as one
+        return 2 + counts[row] + (1 if environment_counts[row] else 0) + (len(extra) if extra else 0)
+
+    @staticmethod
+    def _moved(last, name, value, band):
+        previous = last.get(name)
+        if previous is None or abs(value - previous) > band:
+            last[name] = value
+            return True
+        return False
+
+    def _remember(self, reading, state, now, keyframe):
+        if state is None:
+            state = self.devices[(reading.id, reading.uid)] = [now, {}, {}]
+        elif keyframe:
+            state[0] = now
+        last = state[1]
+        for name, _ in self._fields:
+            value = getattr(reading, name)
+            if value is not None:
+                last[name] = value
+        environment = reading.environment
+        if environment is not None:
+            last = state[2]
+            for name, _ in self._environment_fields:
+                value = getattr(environment, name)
+                if value is not None:
+                    last[name] = value
+
+    def _forward(self, reading, size):
+        self.forwarded += 1
+        self.fields_out += size
+        return reading
+
+    def forget(self, device_id, uid=None):
+        """Drop a device's state, e.g. after a reconnect, so its next reading is a keyframe."""
+        with self.lock:
+            self.devices.pop((device_id, uid), None)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "readings": self.readings,
+                "forwarded": self.forwarded,
+                "suppressed": self.suppressed,
+                "keyframes": self.keyframes,
+                "alerts": self.alerts,
+                "fields_in": self.fields_in,
+                "fields_out": self.fields_out,
+            }
@@ -0,0 +1,328 @@
+import asyncio
+import concurrent.futures
+import functools
+import itertools
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+
+import websockets
+
+from backend import BackendClient
+
+ALERT_API_URL = "https://cms-backend-five.vercel.app/api/alert/readAlertReply"
+
+
+class AlertFetcher:
+    """
+    One poller per gateway for operator replies on /api/alert/readAlertReply.
+
+    The message list is downloaded once per interval, indexed by jawaanId, and every
+    unresolved message that hasn't been dispatched yet is handed to the registered
+    device. Requests carry If-None-Match / If-Modified-Since, so an unchanged list
+    costs a 304 and no parsing.
+
+    If `put` returns a future (DownlinkRouter.submit_threadsafe does), a message
+    whose delivery ends in anything but "delivered" or "duplicate" is forgotten
+    again, so the next poll hands it over once more while it stays unresolved.
+    A poll that fails in any way (including a malformed body) is logged and the
+    next one runs on schedule.
+    """
+
+    def __init__(self, url=ALERT_API_URL, interval=5, backend=None):
+        self.url = url
+        self.interval = interval
+        self.backend = backend or BackendClient()
+        self.handlers = {}
+        self.dispatched = {}
+        self.etag = None
+        self.last_modified = None
+        self.fetches = 0
+        self.not_modified = 0
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def register(self, jawaan_id, put=None):
+        """
+        Deliver messages for `jawaan_id` to `put(message)`. Without `put`, a new
+        queue.Queue is created and returned; each item is the message dict.
+        """
+        messages = None
+        if put is None:
+            messages = queue.Queue()
+            put = messages.put
+        with self.lock:
+            self.handlers[jawaan_id] = put
+            self.dispatched.setdefault(jawaan_id, set())
+            # A new device needs the full list once, even if it hasn't changed
+            self.etag = self.last_modified = None
+        return messages
+
+    def unregister(self, jawaan_id):
+        with self.lock:
+            self.handlers.pop(jawaan_id, None)
+            self.dispatched.pop(jawaan_id, None)
+
+    def fetch(self):
+        """Return the message list, or None if it is unchanged or the request failed."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        try:
+            response = self.backend.request("alert_replies", url=self.url, headers=headers)
+        except Exception as e:
+            print(f"Error fetching data: {e}")
+            return None
+        self.fetches += 1
+        if response.status_code == 304:
+            self.not_modified += 1
+            return None
+        if response.status_code != 200:
+            print(f"Failed to fetch data. Status code: {response.status_code}")
+            return None
+        data = response.json()
+        if not data.get("success"):
+            return None
+        messages = data["mssg"]
+        # Only a body that parsed is cached, so a malformed one is fetched again in full
+        self.etag = response.headers.get("ETag")
+        self.last_modified = response.headers.get("Last-Modified")
+        return messages
+
+    def dispatch(self, messages):
+        # Index unresolved messages by jawaanId in one pass over the list
+        unresolved = {}
+        for message in messages:
+            if not message["resolved"]:
+                unresolved.setdefault(message["jawaanId"], []).append(message)
+
+        with self.lock:
+            targets = [(jawaan_id, put, self.dispatched[jawaan_id]) for jawaan_id, put in self.handlers.items()]
+        for jawaan_id, put, dispatched in targets:
+            pending = unresolved.get(jawaan_id, ())
+            for message in pending:
+                message_id = message["messageId"]
+                if message_id not in dispatched:
+                    dispatched.add(message_id)
+                    result = put(message)
+                    if isinstance(result, concurrent.futures.Future):
+                        result.add_done_callback(functools.partial(self._settle, dispatched, message_id))
+            # Forget ids the backend no longer lists, so the set stays small
+            dispatched.intersection_update(message["messageId"] for message in pending)
+
+    def _settle(self, dispatched, message_id, result):
+        status = None if result.cancelled() or result.exception() else result.result()
+        if status not in ("delivered", "duplicate"):
+            with self.lock:
+                dispatched.discard(message_id)
+
+    def poll_once(self):
+        messages = self.fetch()
+        if messages is not None:
+            self.dispatch(messages)
+
+    def run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.poll_once()
+            except Exception as e:
+                # A malformed reply (HTML, a missing key) must not end the fallback poll
+                print(f"Error fetching data: {e}")
+            self._stop.wait(max(0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="alert-fetcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+READ_ACK_URL = "https://cms-backend-five.vercel.app/api/alert/readedSwToW/{}"
+
+
+class DownlinkRouter:
+    """
+    Deliver operator replies to devices in order, as soon as they arrive.
+
+    Each jawaanId has its own lane (an asyncio.Queue drained by one task), so
+    messages to a device are written in the order received while a slow device
+    never holds up the others. Message ids already delivered are remembered, so a
+    reply that arrives by push and again from the reconciliation poll is written
+    once. Pushed messages are acknowledged to the pusher; only messages found by
+    the poll are marked read on the backend with readedSwToW.
+
+    `send(text)` is registered per device and may be a coroutine function or a plain
+    function (run in the default executor); returning False or raising marks the
+    delivery failed.
+    """
+
+    def __init__(self, ack_url=READ_ACK_URL, backend=None, retries=2, retry_delay=0.2, remember=10000):
+        self.ack_url = ack_url
+        self.backend = backend or BackendClient()
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.remember = remember
+        self.loop = None
+        self.senders = {}
+        self.lanes = {}
+        self.workers = {}
+        self.delivered_ids = OrderedDict()
+        self.delivered = 0
+        self.failed = 0
+        self.latencies = deque(maxlen=1000)
+        self._push_ids = itertools.count(1)
+
+    def start(self):
+        """Bind to the running event loop and start a lane task per registered device."""
+        self.loop = asyncio.get_running_loop()
+        for jawaan_id in self.senders:
+            self._start_lane(jawaan_id)
+
+    def _start_lane(self, jawaan_id):
+        if jawaan_id not in self.workers:
+            self.lanes[jawaan_id] = asyncio.Queue()
+            self.workers[jawaan_id] = asyncio.create_task(self._deliver(jawaan_id))
+
+    def register(self, jawaan_id, send):
+        self.senders[jawaan_id] = send
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._start_lane, jawaan_id)
+
+    def unregister(self, jawaan_id):
+        self.senders.pop(jawaan_id, None)
+        worker = self.workers.pop(jawaan_id, None)
+        self.lanes.pop(jawaan_id, None)
+        if worker is not None:
+            self.loop.call_soon_threadsafe(worker.cancel)
+
+    async def submit(self, message, source="push"):
+        """
+        Queue `message` ({"jawaanId", "message", optional "messageId"}) for its device
+        and wait for the result: "delivered", "failed", "duplicate" or "unknown_device".
+        """
+        message_id = message.get("messageId")
+        if message_id is None:
+            message_id = message["messageId"] = f"push-{next(self._push_ids)}"
+        if message_id in self.delivered_ids:
+            return "duplicate"
+        lane = self.lanes.get(message.get("jawaanId"))
+        if lane is None:
+            return "unknown_device"
+        self.delivered_ids[message_id] = "queued"
+        result = self.loop.create_future()
+        lane.put_nowait((message, source, result, time.perf_counter()))
+        return await result
+
+    def submit_threadsafe(self, message):
+        """Queue a message from another thread (e.g. AlertFetcher); returns a concurrent future of its status."""
+        return asyncio.run_coroutine_threadsafe(self.submit(message, "poll"), self.loop)
+
+    async def _send(self, send, text):
+        if asyncio.iscoroutinefunction(send):
+            return await send(text)
+        # Blocking writers (pyserial) run off the event loop
+        return await self.loop.run_in_executor(None, send, text)
+
+    async def _deliver(self, jawaan_id):
+        lane = self.lanes[jawaan_id]
+        while True:
+            message, source, result, submitted_at = await lane.get()
+            status = "failed"
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    await asyncio.sleep(self.retry_delay)
+                try:
+                    if await self._send(self.senders[jawaan_id], message["message"]) is not False:
+                        status = "delivered"
+                        break
+                except Exception as e:
+                    print(f"Error sending data to {jawaan_id}: {e}")
+
+            message_id = message["messageId"]
+            if status == "delivered":
+                self.delivered += 1
+                self.latencies.append(time.perf_counter() - submitted_at)
+                self.delivered_ids[message_id] = status
+                while len(self.delivered_ids) > self.remember:
+                    self.delivered_ids.popitem(last=False)
+                if source == "poll":
+                    self.loop.run_in_executor(None, self.acknowledge, message_id)
+            else:
+                # Forget it so the next push or poll can try again
+                self.failed += 1
+                self.delivered_ids.pop(message_id, None)
+            if not result.done():
+                result.set_result(status)
+
+    def acknowledge(self, message_id):
+        return self.backend.mark_read(message_id, url=self.ack_url.format(message_id))
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        return {
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+            "max_ms": round(latencies[-1] * 1000, 2) if latencies else None,
+        }
+
+
+async def serve_push(router, host="localhost", port=8765, default_jawaan_id=None):
+    """
+    Run the local push endpoint: a websocket server taking JSON messages like
+    {"jawaanId": "JW001", "messageId": "...", "message": "HELP"} ("device_id" is
+    accepted in place of "jawaanId"). Every message gets a JSON reply with its
+    messageId and delivery status. With `default_jawaan_id`, plain-text messages
+    are sent to that device.
+    """
+    router.start()
+
+    async def reply(websocket, message):
+        status = await router.submit(message)
+        await websocket.send(json.dumps({"messageId": message["messageId"], "status": status}))
+
+    async def handler(websocket, path=None):
+        async for raw in websocket:
+            print(f"Received message from websocket: {raw}")
+            try:
+                message = json.loads(raw)
+            except ValueError:
+                message = raw
+            if not isinstance(message, dict):
+                message = {"jawaanId": default_jawaan_id, "message": raw}
+            message.setdefault("jawaanId", message.pop("device_id", default_jawaan_id))
+            # Acks are sent as deliveries complete; ordering is kept per device by the lanes
+            asyncio.create_task(reply(websocket, message))
+
+    async with websockets.serve(handler, host, port):
+        await asyncio.Future()  # run forever
+
+
+def start_push_thread(router, host="localhost", port=8765, default_jawaan_id=None):
+    """Run serve_push on its own event loop thread, for the threaded serial scripts."""
+    ready = threading.Event()
+
+    def run():
+        async def main():
+            server = asyncio.create_task(serve_push(router, host, port, default_jawaan_id))
+            await asyncio.sleep(0)
+            ready.set()
+            await server
+        asyncio.run(main())
+
+    thread = threading.Thread(target=run, name="push-server", daemon=True)
+    thread.start()
+    ready.wait()
+    return thread
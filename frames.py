@@ -0,0 +1,217 @@
+import struct
+from binascii import crc_hqx
+
+import telemetry
+
+# Binary telemetry frame, version 1. Little-endian, 32 bytes, no padding:
+#
+#   uint8   magic             0xA5 (never the first byte of a text line)
+#   uint8   version           1
+#   uint8   flags             bit 0: fall detected
+#   uint16  seq               increments per frame, wraps at 65536
+#   uint16  present           bit n set when BINARY_FIELDS[n] carries a value
+#   ...     BINARY_FIELDS     in order, absent fields sent as 0
+#   uint16  crc               CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF) of the
+#                             preceding 30 bytes
+#
+# The ESP32 sends one frame per reading, or several back to back in one BLE
+# notification.
+MAGIC = 0xA5
+VERSION = 1
+FLAG_FALL = 0x01
+
+# Output field -> (nested under 'environment', struct code, divisor)
+BINARY_FIELDS = (
+    ('bodyTemperature', False, 'h', 100),  # centi-degrees C
+    ('hrv', False, 'H', 1),
+    ('heartRate', False, 'B', 1),
+    ('respiratoryRate', False, 'B', 1),
+    ('spo2', False, 'B', 1),
+    ('battery', False, 'B', 1),
+    ('altitude', False, 'h', 1),
+    ('aqi', True, 'H', 1),
+    ('voc', True, 'f', 1),
+    ('ambientPressure', True, 'f', 1),
+    ('relativeHumidity', False, 'B', 1),
+    ('ambientTemperature', True, 'b', 1),
+    ('rssi', False, 'B', 1),  # Sound level in dB, as parse_data reports it
+)
+
+HEADER_FORMAT = '<BBBHH'
+FRAME = struct.Struct(HEADER_FORMAT + ''.join(code for _, _, code, _ in BINARY_FIELDS) + 'H')
+FRAME_SIZE = FRAME.size
+CRC_OFFSET = FRAME_SIZE - 2
+HEADER_FIELDS = len(HEADER_FORMAT) - 1
+
+
+def encode_frame(reading, seq):
+    """
+    Pack a reading in the parse_data schema into a version 1 frame. This is the
+    reference the firmware encoder is checked against.
+    """
+    environment = reading.get('environment', {})
+    present = 0
+    values = []
+    for bit, (field, nested, code, divisor) in enumerate(BINARY_FIELDS):
+        value = (environment if nested else reading).get(field)
+        if value is None:
+            values.append(0)
+            continue
+        present |= 1 << bit
+        values.append(value if code == 'f' else round(value * divisor))
+    flags = FLAG_FALL if reading.get('fallDamage') else 0
+    body = FRAME.pack(MAGIC, VERSION, flags, seq & 0xFFFF, present, *values, 0)[:CRC_OFFSET]
+    return body + struct.pack('<H', crc_hqx(body, 0xFFFF))
+
+
+def parse_health_data(data, device_id=None):
+    """
+    Parse the legacy dot-joined "temperature.hrv.hr.rr.spo2" payload.
+
+    '.' is also the decimal point, so "36.5.40.72.16.97" has six parts; only the
+    temperature is sent with a fraction, so an extra part is read as its decimals.
+    Returns None for anything else rather than guessing.
+    """
+    parts = data.strip().split('.')
+    if len(parts) == 6:
+        parts[0:2] = [parts[0] + '.' + parts[1]]
+    if len(parts) != 5:
+        return None
+    try:
+        temperature, hrv, hr, rr, spo2 = (float(part) for part in parts)
+    except ValueError:
+        return None
+    return {
+        "id": device_id,
+        "temperature": temperature,
+        "hr": hr,
+        "hrv": hrv,
+        "rr": rr,
+        "spo2": spo2
+    }
+
+
+def _plan(present):
+    # Which fields a `present` mask carries, split so decoding is a few flat loops
+    top, nested, scaled, floats = [], [], [], []
+    for bit, (field, in_environment, code, divisor) in enumerate(BINARY_FIELDS):
+        if present & (1 << bit):
+            (nested if in_environment else top).append((field, HEADER_FIELDS + bit))
+            if divisor != 1:
+                scaled.append((in_environment, field, divisor))
+            elif code == 'f':
+                floats.append((in_environment, field))
+    return top, nested, scaled, floats
+
+
+class FrameDecoder:
+    """
+    Decode telemetry payloads in whichever format the device sent.
+
+    A payload starting with MAGIC holds one or more binary frames; anything else is
+    text: a "Key: value" line for telemetry.parse_data, or the legacy dot-joined
+    format. Aligned batches of binary frames are unpacked with struct.iter_unpack;
+    if any frame in a batch fails its magic/version/CRC check, the batch is
+    rescanned frame by frame so the good frames around a corrupt one survive.
+
+    Sequence numbers are tracked per device, so `lost` counts frames that never
+    arrived; `crc_errors` and `unparsed` count payloads that were dropped.
+    """
+
+    def __init__(self):
+        self.frames = 0
+        self.crc_errors = 0
+        self.lost = 0
+        self.unparsed = 0
+        self.last_seq = {}
+        self.plans = {}
+
+    def decode(self, payload, device_id=None):
+        """Return the list of readings in `payload` (bytes or str)."""
+        if isinstance(payload, (bytes, bytearray, memoryview)):
+            if payload[:1] == bytes((MAGIC,)):
+                return self.decode_frames(payload, device_id)
+            payload = bytes(payload).decode('utf-8', errors='replace')
+
+        if ':' in payload:
+            reading = telemetry.parse_data(payload, device_id)
+            ok = len(reading) > (device_id is not None)
+        else:
+            reading = parse_health_data(payload, device_id)
+            ok = reading is not None
+        if not ok:
+            self.unparsed += 1
+            return []
+        return [reading]
+
+    def decode_frames(self, buffer, device_id=None):
+        """Decode back-to-back binary frames into readings in the parse_data schema."""
+        view = memoryview(buffer)
+        if len(view) % FRAME_SIZE == 0:
+            rows = []
+            offset = 0
+            for values in FRAME.iter_unpack(view):
+                if (values[0] != MAGIC or values[1] != VERSION
+                        or crc_hqx(view[offset:offset + CRC_OFFSET], 0xFFFF) != values[-1]):
+                    break
+                rows.append(values)
+                offset += FRAME_SIZE
+            else:
+                return [self._reading(values, device_id) for values in rows]
+        return [self._reading(values, device_id) for values in self._scan(view)]
+
+    def _scan(self, view):
+        # Slow path: resynchronise on the next magic byte after anything invalid
+        data = bytes(view)
+        position = 0
+        rows = []
+        while position + FRAME_SIZE <= len(data):
+            values = FRAME.unpack_from(data, position)
+            if (values[0] == MAGIC and values[1] == VERSION
+                    and crc_hqx(data[position:position + CRC_OFFSET], 0xFFFF) == values[-1]):
+                rows.append(values)
+                position += FRAME_SIZE
+                continue
+            self.crc_errors += 1
+            position = data.find(bytes((MAGIC,)), position + 1)
+            if position == -1:
+                break
+        return rows
+
+    def _reading(self, values, device_id):
+        self.frames += 1
+        flags, seq, present = values[2:HEADER_FIELDS]
+        last = self.last_seq.get(device_id)
+        if last is not None:
+            gap = (seq - last - 1) & 0xFFFF
+            if gap < 0x8000:  # A jump backwards is a device restart, not loss
+                self.lost += gap
+        self.last_seq[device_id] = seq
+
+        plan = self.plans.get(present)
+        if plan is None:
+            plan = self.plans[present] = _plan(present)
+        top, nested, scaled, floats = plan
+
+        reading = {}
+        if device_id is not None:
+            reading['id'] = device_id
+        for field, index in top:
+            reading[field] = values[index]
+        if nested:
+            reading['environment'] = {field: values[index] for field, index in nested}
+        for target, field, divisor in scaled:
+            target = reading['environment'] if target else reading
+            target[field] /= divisor
+        for target, field in floats:
+            target = reading['environment'] if target else reading
+            # float32 on the wire; drop the binary noise
+            target[field] = round(target[field], 3)
+
+        if 'rssi' in reading:
+            command = telemetry.decibel_command(reading['rssi'])
+            if command:
+                reading['textCommand'] = command
+        if flags & FLAG_FALL:
+            reading['fallDamage'] = True
+        return reading
@@ -0,0 +1,59 @@
+class LineFramer:
+    """
+    Split a byte stream into newline-terminated records.
+
+    Chunks from `reader.read(n)` or `ser.read(n)` are appended to one bytearray;
+    `feed` returns every complete line decoded straight out of that buffer through
+    a memoryview (no intermediate bytes copies) and keeps a trailing partial line
+    for the next chunk. Consumed bytes are dropped from the front once per feed, so
+    the buffer never holds more than one partial line. A partial line longer than
+    `max_line` (a device streaming without newlines) is discarded and counted in
+    `overflows` and `dropped_bytes` rather than growing the buffer without bound.
+    """
+
+    def __init__(self, max_line=4096, encoding='utf-8', errors='replace'):
+        self.buffer = bytearray()
+        self.max_line = max_line
+        self.encoding = encoding
+        self.errors = errors
+        self.lines = 0
+        self.overflows = 0
+        self.dropped_bytes = 0
+
+    def feed(self, chunk):
+        """Append `chunk` and return the complete lines in it, stripped, empty lines skipped."""
+        buffer = self.buffer
+        buffer += chunk
+        end = buffer.find(b"\n")
+        if end == -1:
+            if len(buffer) > self.max_line:
+                self._overflow()
+            return []
+
+        lines = []
+        start = 0
+        with memoryview(buffer) as view:
+            while end != -1:
+                line = str(view[start:end], self.encoding, self.errors).strip()
+                if line:
+                    lines.append(line)
+                start = end + 1
+                end = buffer.find(b"\n", start)
+        del buffer[:start]
+        if len(buffer) > self.max_line:
+            self._overflow()
+        self.lines += len(lines)
+        return lines
+
+    def _overflow(self):
+        self.overflows += 1
+        self.dropped_bytes += len(self.buffer)
+        self.buffer.clear()
+
+    def pending(self):
+        """Number of buffered bytes still waiting for their newline."""
+        return len(self.buffer)
+
+    def reset(self):
+        """Drop any partial line, e.g. after the port was reopened."""
+        self.buffer.clear()
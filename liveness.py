@@ -0,0 +1,163 @@
+import threading
+import time
+
+CONNECTED = "connected"
+DISCONNECTED = "disconnected"
+
+
+class LivenessTracker:
+    """
+    Connected/disconnected state for every device of a gateway, on one timer wheel.
+
+    seen(device_id) is O(1): it stamps the device and moves it to the wheel slot
+    of its new deadline, `timeout` seconds (rounded up to `resolution`) from now.
+    One background thread advances the wheel every `resolution` seconds and only
+    looks at the devices whose deadline falls in the slots it passes, so the cost
+    doesn't grow with the number of quiet or healthy devices.
+
+    Status goes to /api/device/connectionStatus on edges only: a device's first
+    sample after silence is "connected", a timeout is "disconnected". Edges found
+    in the same tick go out in one post, and every `heartbeat_interval` seconds
+    the status of all connected devices is re-sent in one batched post, so the
+    backend recovers from a missed edge. Edges whose post failed are merged back
+    into the pending ones (unless a newer edge for the device has replaced them)
+    and retried on the next tick.
+    """
+
+    def __init__(self, backend, timeout=10.0, resolution=0.5, heartbeat_interval=60.0, clock=time.monotonic):
+        self.backend = backend
+        self.timeout = timeout
+        self.resolution = resolution
+        self.heartbeat_interval = heartbeat_interval
+        self.clock = clock
+
+        self.slots = [set() for _ in range(int(timeout / resolution) + 2)]
+        self.deadlines = {}  # device_id -> wheel tick it times out at
+        self.connected = set()
+        self.pending = {}    # device_id -> status not posted yet
+        self.lock = threading.Lock()
+        self.cursor = self._tick(clock())
+        self.last_heartbeat = clock()
+
+        self.samples = 0
+        self.edges = 0
+        self.posts = 0
+        self.failed_posts = 0
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _tick(self, now):
+        return int(now / self.resolution)
+
+    def _schedule(self, device_id, now):
+        # Rounded up, so a device never times out before `timeout` has passed
+        deadline = self._tick(now + self.timeout) + 1
+        old = self.deadlines.get(device_id)
+        if old != deadline:
+            if old is not None:
+                self.slots[old % len(self.slots)].discard(device_id)
+            self.slots[deadline % len(self.slots)].add(device_id)
+            self.deadlines[device_id] = deadline
+
+    def watch(self, device_id):
+        """Expect `device_id`: it is reported disconnected if nothing arrives within `timeout`."""
+        with self.lock:
+            if device_id not in self.deadlines:
+                self._schedule(device_id, self.clock())
+
+    def seen(self, device_id):
+        """Record a sample from `device_id`."""
+        now = self.clock()
+        with self.lock:
+            self.samples += 1
+            self._schedule(device_id, now)
+            if device_id not in self.connected:
+                self.connected.add(device_id)
+                self._edge(device_id, CONNECTED)
+
+    def _edge(self, device_id, status):
+        self.edges += 1
+        if self.pending.get(device_id, status) != status:
+            # Connected and gone again before it was posted: nothing changed for the backend
+            del self.pending[device_id]
+        else:
+            self.pending[device_id] = status
+
+    def is_connected(self, device_id):
+        with self.lock:
+            return device_id in self.connected
+
+    def advance(self, now=None):
+        """Expire overdue devices and post pending edges (and a heartbeat when due); the thread calls this."""
+        now = self.clock() if now is None else now
+        current = self._tick(now)
+        with self.lock:
+            if current - self.cursor >= len(self.slots):
+                # Fell a whole turn behind: visit each slot once
+                ticks = range(current - len(self.slots) + 1, current + 1)
+            else:
+                ticks = range(self.cursor + 1, current + 1)
+            for tick in ticks:
+                slot = self.slots[tick % len(self.slots)]
+                expired = [device_id for device_id in slot if self.deadlines[device_id] <= current]
+                for device_id in expired:
+                    slot.discard(device_id)
+                    del self.deadlines[device_id]
+                    self.connected.discard(device_id)
+                    self._edge(device_id, DISCONNECTED)
+            self.cursor = current
+            edges, self.pending = self.pending, {}
+            heartbeat = None
+            if self.heartbeat_interval and now - self.last_heartbeat >= self.heartbeat_interval:
+                self.last_heartbeat = now
+                heartbeat = [device_id for device_id in self.connected if device_id not in edges]
+
+        if edges and not self._post(list(edges.items())):
+            with self.lock:
+                for device_id, status in edges.items():
+                    self.pending.setdefault(device_id, status)
+        if heartbeat:
+            self._post([(device_id, CONNECTED) for device_id in heartbeat])
+        return edges
+
+    def _post(self, statuses):
+        if len(statuses) == 1:
+            ok = self.backend.send_connection_status(*statuses[0])
+        else:
+            ok = self.backend.send_connection_statuses(statuses)
+        with self.lock:
+            self.posts += 1
+            if not ok:
+                self.failed_posts += 1
+        return ok
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="liveness", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.resolution):
+            try:
+                self.advance()
+            except Exception as e:
+                print(f"Error checking device liveness: {e}")
+
+    def stats(self):
+        with self.lock:
+            return {
+                "devices": len(self.deadlines),
+                "connected": len(self.connected),
+                "samples": self.samples,
+                "edges": self.edges,
+                "posts": self.posts,
+                "failed_posts": self.failed_posts,
+            }
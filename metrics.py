@@ -0,0 +1,281 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histograms count integer microseconds in log-linear buckets, as HdrHistogram does:
+# 2**SUB_BUCKET_BITS buckets per power of two, so any value is within 1/HALF (~3%) of its bucket
+SUB_BUCKET_BITS = 6
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+HALF = SUB_BUCKETS >> 1
+MAX_MICROS = (1 << 36) - 1  # About 19 hours; longer values are counted as this
+BUCKETS = HALF * (MAX_MICROS.bit_length() - SUB_BUCKET_BITS + 2)
+
+# The `le` bounds exported to Prometheus, in seconds; quantiles come from the full-resolution counts
+EXPORT_BOUNDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGES = ("frame", "parse", "queue", "serialize", "http", "end_to_end")
+
+
+def _index(micros):
+    if micros < SUB_BUCKETS:
+        return micros
+    shift = micros.bit_length() - SUB_BUCKET_BITS
+    return HALF * shift + (micros >> shift)
+
+
+def _upper(index):
+    """The largest value counted in bucket `index`, in microseconds."""
+    if index < SUB_BUCKETS:
+        return index
+    shift = index // HALF - 1
+    return ((index - HALF * shift + 1) << shift) - 1
+
+
+class Histogram:
+    """
+    Latency histogram with HDR-style log-linear buckets over 1 us to ~19 h.
+
+    record() is one index computation and one increment, whatever the value;
+    quantiles are exact to the bucket width (~3% of the value).
+    """
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        micros = int(seconds * 1e6)
+        index = _index(min(max(micros, 0), MAX_MICROS))
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def quantile(self, q):
+        """The value (in seconds) at or below which a fraction `q` of the recorded values lie."""
+        with self.lock:
+            counts = list(self.counts)
+            total = self.count
+        if not total:
+            return None
+        target = max(1, int(q * total + 0.5))
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= target:
+                return min(_upper(index) / 1e6, self.max)
+        return self.max
+
+    def cumulative(self, bounds=EXPORT_BOUNDS):
+        """Counts of values <= each bound (seconds), as Prometheus `le` buckets."""
+        with self.lock:
+            counts = list(self.counts)
+        result = []
+        seen = 0
+        index = 0
+        for bound in bounds:
+            limit = bound * 1e6
+            while index < BUCKETS and _upper(index) <= limit:
+                seen += counts[index]
+                index += 1
+            result.append(seen)
+        return result
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "p50_ms": _ms(self.quantile(0.5)),
+            "p99_ms": _ms(self.quantile(0.99)),
+            "p999_ms": _ms(self.quantile(0.999)),
+            "max_ms": _ms(self.max if self.count else None),
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    """
+    Per-stage latency histograms and per-device / per-endpoint counters for the
+    gateway, rendered in the Prometheus text format (serve_metrics).
+
+    Components take an optional `metrics` (SerialGateway, BleGateway,
+    BatchUploader, BackendClient); with the default None they skip every call
+    here behind one `is not None` check, so a gateway without metrics pays
+    nothing else. With it, each reading carries the time its bytes were read,
+    framed into a line, handed to the uploader, picked up in a batch and
+    acknowledged by the backend:
+
+        frame       bytes read -> lines split (serial)
+        parse       line framed -> reading submitted to the uploader
+        queue       submitted -> its batch is picked up (queue or outbox)
+        serialize   JSON encoding, per call
+        http        backend request, per batch or call
+        end_to_end  bytes read -> backend acknowledged
+
+    Stage histograms are fleet-wide; per device there are counters (lines,
+    readings, uploaded) and the sum of end-to-end latency, so a device's mean
+    latency is rate(sum) / rate(uploaded). Per endpoint there is a request
+    latency histogram and request counts by status.
+    """
+
+    def __init__(self, namespace="esp_gateway", clock=time.perf_counter):
+        self.namespace = namespace
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.stages = {stage: Histogram() for stage in STAGES}
+        self.endpoints = {}
+        self.counters = {}
+        self.gauges = {}
+        self.last_read = {}
+
+    def _add(self, name, labels, value=1):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, stage, seconds):
+        self.stages[stage].record(seconds)
+
+    def gauge(self, name, read):
+        """Export `read()` as gauge `name` on every scrape (e.g. a queue depth)."""
+        self.gauges[name] = read
+
+    def read(self, device_id, read_at, framed_at, lines):
+        """`lines` lines were framed from bytes read at `read_at`."""
+        self.last_read[device_id] = (read_at, framed_at)
+        self.stages["frame"].record(framed_at - read_at)
+        self._add("device_lines_total", (("device", device_id),), lines)
+
+    def submitted(self, reading):
+        """A reading reached the uploader; returns its trace for delivered()."""
+        now = self.clock()
+        device_id = None if type(reading) is bytes else reading.get("id")
+        read_at, framed_at = self.last_read.get(device_id, (None, None))
+        if framed_at is not None:
+            self.stages["parse"].record(now - framed_at)
+        if device_id is not None:
+            self._add("device_readings_total", (("device", device_id),))
+        return device_id, read_at, now
+
+    def delivered(self, traces, picked_up_at, ok):
+        """The batch holding `traces` was picked up at `picked_up_at` and has now been accepted (or failed)."""
+        now = self.clock()
+        queue = self.stages["queue"]
+        end_to_end = self.stages["end_to_end"]
+        uploaded = {}
+        for device_id, read_at, submitted_at in traces:
+            queue.record(picked_up_at - submitted_at)
+            if not ok:
+                continue
+            if read_at is not None:
+                end_to_end.record(now - read_at)
+            if device_id is not None:
+                count, total = uploaded.get(device_id, (0, 0.0))
+                uploaded[device_id] = (count + 1, total + (now - read_at if read_at is not None else 0.0))
+        if not ok:
+            self._add("readings_failed_total", (), len(traces))
+            return
+        with self.lock:
+            counters = self.counters
+            for device_id, (count, total) in uploaded.items():
+                labels = (("device", device_id),)
+                key = ("device_uploaded_total", labels)
+                counters[key] = counters.get(key, 0) + count
+                key = ("device_latency_seconds_sum", labels)
+                counters[key] = counters.get(key, 0.0) + total
+            key = ("readings_uploaded_total", ())
+            counters[key] = counters.get(key, 0) + len(traces)
+
+    def request(self, endpoint, seconds, status):
+        """One backend request (one attempt) to `endpoint` finished with `status` (an HTTP code or "error")."""
+        histogram = self.endpoints.get(endpoint)
+        if histogram is None:
+            histogram = self.endpoints.setdefault(endpoint, Histogram())
+        histogram.record(seconds)
+        self._add("endpoint_requests_total", (("endpoint", endpoint), ("status", status)))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        prefix = self.namespace + "_"
+        lines = []
+
+        def histogram(name, help_text, histograms, label):
+            lines.append(f"# HELP {prefix}{name} {help_text}")
+            lines.append(f"# TYPE {prefix}{name} histogram")
+            for value, hist in histograms.items():
+                if not hist.count:
+                    continue
+                for bound, count in zip(EXPORT_BOUNDS, hist.cumulative()):
+                    lines.append(f"{prefix}{name}_bucket{_labels(((label, value), ('le', bound)))} {count}")
+                lines.append(f"{prefix}{name}_bucket{_labels(((label, value), ('le', '+Inf')))} {hist.count}")
+                lines.append(f"{prefix}{name}_sum{_labels(((label, value),))} {hist.sum}")
+                lines.append(f"{prefix}{name}_count{_labels(((label, value),))} {hist.count}")
+
+        histogram("stage_latency_seconds", "Time spent in each pipeline stage.", self.stages, "stage")
+        histogram("endpoint_latency_seconds", "Backend request latency per endpoint.", dict(self.endpoints),
+                  "endpoint")
+
+        with self.lock:
+            counters = sorted(self.counters.items())
+        current = None
+        for (name, labels), value in counters:
+            if name != current:
+                current = name
+                lines.append(f"# TYPE {prefix}{name} counter")
+            lines.append(f"{prefix}{name}{_labels(labels)} {value}")
+
+        for name, read in sorted(self.gauges.items()):
+            try:
+                value = read()
+            except Exception as e:
+                print(f"Error reading metric {name}: {e}")
+                continue
+            lines.append(f"# TYPE {prefix}{name} gauge")
+            lines.append(f"{prefix}{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def stats(self):
+        """p50/p99/p99.9/max per stage and per endpoint, for the periodic stats print."""
+        stages = {stage: hist.summary() for stage, hist in self.stages.items() if hist.count}
+        endpoints = {endpoint: hist.summary() for endpoint, hist in dict(self.endpoints).items()}
+        return {"stages": stages, "endpoints": endpoints}
+
+
+def serve_metrics(metrics, port=9108, host="127.0.0.1"):
+    """Serve `metrics` at http://host:port/metrics from a daemon thread; returns the server."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    print(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
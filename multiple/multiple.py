@@ -1,97 +1,89 @@
 import asyncio
-import csv
-import json
-import requests
-import websockets
-from bleak import BleakClient
+import functools
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ble_gateway import BleGateway
+from downlink import DownlinkRouter, serve_push
+from frames import FrameDecoder
+from metrics import Metrics, serve_metrics
+from backend import BackendClient
+from deadband import DeltaFilter
+from outbox import Outbox, script_outbox
+from registry import DeviceRegistry
+from uploader import BatchUploader
 
 # Define the UUIDs for the characteristics
 READ_CHARACTERISTIC_UUID = "beb5483e-36e1-4688-b7f5-ea07361b26a8"
-WRITE_CHARACTERISTIC_UUID = "beb5483e-36e1-4688-b7f5-ea07361b26a9"
 
-async def read_ble_device(client, device_id):
-    while True:
-        try:
-            # Read the value of the characteristic
-            value = await client.read_gatt_char(READ_CHARACTERISTIC_UUID)
-            data = value.decode("utf-8")
-            parsed_data = parse_health_data(data, device_id)
-            print(parsed_data)
-            await send_data_to_nodejs(parsed_data)
-        except Exception as e:
-            print(f"Error reading BLE device {device_id}: {e}")
-        await asyncio.sleep(1)
+# Set to a port (e.g. 9108) to serve latency histograms and counters at http://localhost:<port>/metrics
+METRICS_PORT = None
+metrics = Metrics() if METRICS_PORT else None
+
+backend = BackendClient(metrics=metrics)
+uploader = BatchUploader(outbox=Outbox(script_outbox(__file__)), backend=backend, delta=DeltaFilter(), metrics=metrics)
 
-async def write_ble_device(client, message):
-    try:
-        await client.write_gatt_char(WRITE_CHARACTERISTIC_UUID, message.encode("utf-8"))
-    except Exception as e:
-        print(f"Error writing to BLE device: {e}")
+decoder = FrameDecoder()
+# device_id -> jawaan_id from mac_addresses.csv, for the readings' uid
+jawaan_ids = {}
 
-def parse_health_data(data, device_id):
-    split_data = data.split('.')
-    temperature = float(split_data[0])
-    hrv = float(split_data[1])
-    hr = float(split_data[2])
-    rr = float(split_data[3])
-    spo2 = float(split_data[4])
-    return {
-        "id": device_id,
-        "temperature": temperature,
-        "hr": hr,
-        "hrv": hrv,
-        "rr": rr,
-        "spo2": spo2
-    }
+async def handle_frame(device_id, value):
+    uid = jawaan_ids.get(device_id)
+    for parsed_data in decoder.decode(value, device_id):
+        if uid is not None:
+            parsed_data['uid'] = uid
+        await send_data_to_nodejs(parsed_data)
 
 async def send_data_to_nodejs(data):
-    url = "https://cms-backend-five.vercel.app/api/ble/esp"
-    try:
-        response = requests.post(url, json=data)
-        print(response.text)
-    except Exception as e:
-        print(f"Error sending data to Node.js: {e}")
+    uploader.submit(data)
+
+async def main():
+    if metrics is not None:
+        serve_metrics(metrics, METRICS_PORT)
+    uploader.start()
+    # mac_addresses.csv may also carry device_id/jawaan_id columns (a row without a device_id
+    # uses the MAC without colons); edits are applied while running
+    registry = DeviceRegistry('mac_addresses.csv')
 
-async def websocket_handler(websocket, path, clients):
-    async for message in websocket:
-        print(f"Received message from websocket: {message}")
-        # Assuming message format: {"device_id": "A842E34AA3BE", "message": "HELP"}
-        message_data = json.loads(message)
-        device_id = message_data["device_id"]
-        ble_message = message_data["message"]
-        if device_id in clients:
-            await write_ble_device(clients[device_id], ble_message)
-        else:
-            print(f"Device {device_id} not connected")
+    # The gateway connects each device with bounded concurrency and reconnects on failure
+    gateway = BleGateway([], handle_frame, char_uuid=READ_CHARACTERISTIC_UUID, metrics=metrics)
 
-async def start_websocket_server(clients):
-    async with websockets.serve(lambda ws, path: websocket_handler(ws, path, clients), "localhost", 8765):
-        await asyncio.Future()  # run forever
+    # Websocket messages like {"device_id": "A842E34AA3BE", "message": "HELP"} (or with the
+    # row's "jawaanId") are written in order to the live client for that device and
+    # acknowledged with their status
+    router = DownlinkRouter(backend=backend)
 
-def read_mac_addresses_from_csv(file_path):
-    mac_addresses = []
-    with open(file_path, mode='r') as file:
-        csv_reader = csv.DictReader(file)
-        for row in csv_reader:
-            mac_addresses.append(row["mac_address"])
-    return mac_addresses
+    def attach(device):
+        gateway.add(device.mac_address, device.device_id)
+        jawaan_ids[device.device_id] = device.jawaan_id
+        for key in {device.device_id, device.jawaan_id} - {None}:
+            router.register(key, functools.partial(gateway.write, device.device_id))
 
-async def handle_device(mac_address):
-    async with BleakClient(mac_address) as client:
-        device_id = mac_address.replace(":", "")
-        await asyncio.gather(
-            read_ble_device(client, device_id)
-        )
+    def detach(device):
+        gateway.remove(device.mac_address)
+        jawaan_ids.pop(device.device_id, None)
+        for key in {device.device_id, device.jawaan_id} - {None}:
+            router.unregister(key)
 
-async def main():
-    mac_addresses = read_mac_addresses_from_csv('mac_addresses.csv')
-    clients = {mac.replace(":", ""): BleakClient(mac) for mac in mac_addresses}
-    
-    # Connect all clients and start their tasks
-    tasks = [handle_device(mac) for mac in mac_addresses]
+    # Only the devices whose rows changed are connected or dropped; the others stay connected
+    def on_change(added, removed):
+        for device in removed:
+            if device.mac_address:
+                detach(device)
+                print(f"Detached {device.mac_address}")
+        for device in added:
+            if device.mac_address:
+                attach(device)
+                print(f"Attached {device.mac_address}")
+
+    for device in registry:
+        if device.mac_address:
+            attach(device)
     await asyncio.gather(
-        start_websocket_server(clients),
-        *tasks
+        serve_push(router),
+        gateway.run(),
+        registry.watch_async(on_change)
     )
 
-asyncio.run(main())
+asyncio.run(main())
\ No newline at end of file
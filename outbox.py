@@ -0,0 +1,213 @@
+import json
+import os
+import sys
+import threading
+
+from reading import dumps
+
+SEGMENT_SUFFIX = ".log"
+CHECKPOINT_FILE = "checkpoint"
+LOCK_FILE = "lock"
+
+
+def script_outbox(script):
+    """The outbox directory for a script: outbox/<script name> next to it, so two gateways never share one."""
+    directory = os.path.dirname(os.path.abspath(script))
+    return os.path.join(directory, "outbox", os.path.splitext(os.path.basename(script))[0])
+
+
+def _lock(file):
+    if sys.platform == "win32":
+        import msvcrt
+        msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+class Outbox:
+    """
+    Durable append-only outbox of readings, stored as numbered JSON-lines segments.
+
+    append() only writes to the end of the newest segment, so it keeps up with the
+    serial line rate while the backend is down. The uploader reads batches from the
+    acknowledged position and calls ack() once the backend has accepted them; fully
+    acknowledged segments are deleted. Startup only reads the checkpoint and the tail
+    of the newest segment, never the whole log.
+
+    One process owns a directory at a time: __init__ takes an exclusive lock on
+    its lock file and raises RuntimeError if another outbox holds it, rather than
+    letting two writers interleave segments and checkpoints.
+    """
+
+    def __init__(self, path, segment_bytes=4 * 1024 * 1024, max_bytes=256 * 1024 * 1024, fsync=False):
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self.lock = threading.Lock()
+        self.dropped_segments = 0
+
+        os.makedirs(path, exist_ok=True)
+        self.lock_file = open(os.path.join(path, LOCK_FILE), "a+b")
+        try:
+            _lock(self.lock_file)
+        except OSError:
+            self.lock_file.close()
+            raise RuntimeError(f"outbox {path} is in use by another process")
+        self.segments = sorted(
+            int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(path) if name.endswith(SEGMENT_SUFFIX)
+        )
+        self.ack_position = self._read_checkpoint()
+
+        # Anything older than the checkpoint was acknowledged before a crash
+        for seq in [seq for seq in self.segments if seq < self.ack_position[0]]:
+            self._remove_segment(seq)
+
+        if not self.segments:
+            self.segments.append(max(self.ack_position[0], 1))
+        if self.ack_position[0] < self.segments[0]:
+            self.ack_position = (self.segments[0], 0)
+
+        self._truncate_torn_tail(self.segments[-1])
+        self.writer = open(self._segment_path(self.segments[-1]), "ab")
+        self.write_size = self.writer.tell()
+
+    def _segment_path(self, seq):
+        return os.path.join(self.path, f"{seq:010d}{SEGMENT_SUFFIX}")
+
+    def _read_checkpoint(self):
+        try:
+            with open(os.path.join(self.path, CHECKPOINT_FILE)) as file:
+                seq, offset = file.read().split()
+                return int(seq), int(offset)
+        except (OSError, ValueError):
+            return (self.segments[0], 0) if self.segments else (1, 0)
+
+    def _write_checkpoint(self, position):
+        tmp_path = os.path.join(self.path, CHECKPOINT_FILE + ".tmp")
+        with open(tmp_path, "w") as file:
+            file.write(f"{position[0]} {position[1]}\n")
+            if self.fsync:
+                file.flush()
+                os.fsync(file.fileno())
+        os.replace(tmp_path, os.path.join(self.path, CHECKPOINT_FILE))
+
+    def _truncate_torn_tail(self, seq):
+        # A crash mid-append can leave a partial last line; cut back to the last newline
+        segment_path = self._segment_path(seq)
+        if not os.path.exists(segment_path):
+            return
+        with open(segment_path, "rb+") as file:
+            size = file.seek(0, os.SEEK_END)
+            end = size
+            while end > 0:
+                start = max(0, end - 65536)
+                file.seek(start)
+                chunk = file.read(end - start)
+                newline = chunk.rfind(b"\n")
+                if newline != -1:
+                    end = start + newline + 1
+                    break
+                end = start
+            if end != size:
+                file.truncate(end)
+
+    def _remove_segment(self, seq):
+        try:
+            os.remove(self._segment_path(seq))
+        except FileNotFoundError:
+            pass
+        self.segments.remove(seq)
+
+    def _rotate(self):
+        self.writer.close()
+        self.segments.append(self.segments[-1] + 1)
+        self.writer = open(self._segment_path(self.segments[-1]), "ab")
+        self.write_size = 0
+
+        # Bound disk usage by giving up the oldest readings, even if they were never sent
+        while len(self.segments) > 1 and self.segment_bytes * (len(self.segments) - 1) + self.write_size > self.max_bytes:
+            oldest = self.segments[0]
+            self._remove_segment(oldest)
+            self.dropped_segments += 1
+            print(f"Outbox full, dropped unsent segment {oldest}")
+            if self.ack_position[0] <= oldest:
+                self.ack_position = (self.segments[0], 0)
+                self._write_checkpoint(self.ack_position)
+
+    def append(self, reading):
+        """Append a reading, or one already encoded to JSON bytes; returns the position just after it."""
+        if isinstance(reading, bytes):
+            line = reading + b"\n"
+        else:
+            line = dumps(reading).encode("utf-8") + b"\n"
+        with self.lock:
+            if self.write_size and self.write_size + len(line) > self.segment_bytes:
+                self._rotate()
+            self.writer.write(line)
+            self.writer.flush()
+            if self.fsync:
+                os.fsync(self.writer.fileno())
+            self.write_size += len(line)
+            return self.segments[-1], self.write_size
+
+    def read_batch(self, max_records, raw=False):
+        """
+        Return (readings, position) starting at the acknowledged position.
+        Pass position to ack() once the readings have been delivered. With `raw`,
+        each reading is returned as its stored JSON bytes, ready to be posted
+        without decoding and re-encoding it.
+        """
+        readings = []
+        with self.lock:
+            seq, offset = self.ack_position
+            while len(readings) < max_records:
+                with open(self._segment_path(seq), "rb") as file:
+                    file.seek(offset)
+                    for line in file:
+                        if not line.endswith(b"\n"):
+                            break
+                        offset += len(line)
+                        if raw:
+                            if not (line.startswith(b"{") and line.endswith(b"}\n")):
+                                continue
+                            readings.append(line[:-1])
+                        else:
+                            try:
+                                readings.append(json.loads(line))
+                            except ValueError:
+                                continue
+                        if len(readings) >= max_records:
+                            break
+                if len(readings) >= max_records or seq == self.segments[-1]:
+                    break
+                # Finished an older segment; continue with the next one
+                seq, offset = self.segments[self.segments.index(seq) + 1], 0
+        return readings, (seq, offset)
+
+    def ack(self, position):
+        with self.lock:
+            if position <= self.ack_position:
+                return
+            self.ack_position = position
+            self._write_checkpoint(position)
+            # Compaction: segments entirely before the acknowledged position are no longer needed
+            for seq in [seq for seq in self.segments if seq < position[0]]:
+                self._remove_segment(seq)
+
+    def pending_bytes(self):
+        with self.lock:
+            seq, offset = self.ack_position
+            total = -offset
+            for segment in self.segments:
+                if segment == self.segments[-1]:
+                    total += self.write_size
+                elif segment >= seq:
+                    total += os.path.getsize(self._segment_path(segment))
+            return max(total, 0)
+
+    def close(self):
+        with self.lock:
+            self.writer.close()
+            self.lock_file.close()
@@ -0,0 +1,120 @@
+import json
+from dataclasses import dataclass
+from json.encoder import encode_basestring_ascii
+from operator import attrgetter
+
+
+@dataclass(slots=True)
+class Environment:
+    """Ambient sensor values, sent nested under 'environment'."""
+    aqi: int = None
+    voc: float = None
+    ambientPressure: float = None
+    ambientTemperature: int = None
+
+
+@dataclass(slots=True)
+class Reading:
+    """
+    One parsed reading, with attribute names matching the /api/ble/esp schema.
+
+    Slots instead of a dict per reading (and a second one for 'environment') keeps
+    queued readings at a fraction of the memory. Unset fields stay None and are
+    left out of the payload. The few dict operations the scripts use (`get`,
+    `len`, `in`, item assignment) work as they did on the parse_data dicts, where
+    `len` counts the fields that are set.
+    """
+    id: str = None
+    uid: str = None
+    bodyTemperature: int = None
+    respiratoryRate: int = None
+    heartRate: int = None
+    spo2: int = None
+    altitude: int = None
+    relativeHumidity: int = None
+    battery: int = None
+    rssi: int = None
+    textCommand: str = None
+    fallDamage: bool = None
+    environment: Environment = None
+
+    def __len__(self):
+        count = 0
+        for name in READING_FIELDS:
+            if getattr(self, name) is not None:
+                count += 1
+        return count
+
+    def __contains__(self, key):
+        return key in READING_FIELDS and getattr(self, key) is not None
+
+    def __getitem__(self, key):
+        value = getattr(self, key) if key in READING_FIELDS else None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        value = getattr(self, key) if key in READING_FIELDS else None
+        return default if value is None else value
+
+    def to_dict(self):
+        """The backend JSON object, as parse_data would have built it."""
+        data = {}
+        for name in READING_FIELDS:
+            value = getattr(self, name)
+            if value is None:
+                continue
+            if name == 'environment':
+                value = {key: getattr(value, key) for key in ENVIRONMENT_FIELDS if getattr(value, key) is not None}
+            data[name] = value
+        return data
+
+    def to_json(self):
+        """Encode straight to compact JSON from precomputed key fragments; same output as json.dumps(to_dict())."""
+        parts = [key + _encode(value) for key, value in zip(READING_KEYS, _reading_values(self))
+                 if value is not None and key is not ENVIRONMENT_KEY]
+        environment = self.environment
+        if environment is not None:
+            inner = [key + _encode(value) for key, value in zip(ENVIRONMENT_KEYS, _environment_values(environment))
+                     if value is not None]
+            parts.append(ENVIRONMENT_KEY + '{' + ','.join(inner) + '}')
+        return '{' + ','.join(parts) + '}'
+
+    @classmethod
+    def from_dict(cls, data):
+        reading = cls(**{key: value for key, value in data.items() if key in READING_FIELDS and key != 'environment'})
+        environment = data.get('environment')
+        if environment:
+            reading.environment = Environment(**environment)
+        return reading
+
+
+READING_FIELDS = Reading.__slots__
+ENVIRONMENT_FIELDS = Environment.__slots__
+READING_KEYS = tuple(f'"{name}":' for name in READING_FIELDS)
+ENVIRONMENT_KEYS = tuple(f'"{name}":' for name in ENVIRONMENT_FIELDS)
+ENVIRONMENT_KEY = READING_KEYS[READING_FIELDS.index('environment')]
+_reading_values = attrgetter(*READING_FIELDS)
+_environment_values = attrgetter(*ENVIRONMENT_FIELDS)
+
+
+def dumps(reading):
+    """Compact JSON for a Reading or a plain dict reading."""
+    if type(reading) is Reading:
+        return reading.to_json()
+    return json.dumps(reading, separators=(',', ':'))
+
+
+def _encode(value):
+    kind = type(value)
+    if kind is bool:
+        return 'true' if value else 'false'
+    if kind is int:
+        return int.__repr__(value)
+    if kind is float:
+        return float.__repr__(value)
+    return encode_basestring_ascii(value)
@@ -1,108 +1,25 @@
 import serial
-import re
-import requests
 import json
+import telemetry
+from backend import BackendClient
+from deadband import DeltaFilter
+from outbox import Outbox, script_outbox
+from uploader import BatchUploader
 
 # Configure the serial port and Bluetooth connection
 ser = serial.Serial('COM7', baudrate=115200, timeout=1)  # Update the port as necessary
 
 API_URL = "https://cms-backend-five.vercel.app/api/ble/esp"
+backend = BackendClient()
+uploader = BatchUploader(API_URL, outbox=Outbox(script_outbox(__file__)), backend=backend, delta=DeltaFilter())
 DEVICE_ID = "LA10AH0001"  # Static device ID
 def parse_data(data):
-    parsed_data = {}
-
-    # Add device ID to the data
-    parsed_data['id'] = DEVICE_ID
-    # temp_match = re.search(r'Device_id: (\w+)', data)
-    # if temp_match:
-    #     parsed_data['Device_id'] = temp_match.group(1)
-    # Extract values using regular expressions
-    temp_match = re.search(r'Body temperature: (\d+)', data)
-    if temp_match:
-        parsed_data['bodyTemperature'] = int(temp_match.group(1))
-
-    resp_match = re.search(r'Respiration rate: (\d+)', data)
-    if resp_match:
-        parsed_data['respiratoryRate'] = int(resp_match.group(1))
-
-    heart_rate_match = re.search(r'Heart Rate: (\d+)', data)
-    if heart_rate_match:
-        parsed_data['heartRate'] = int(heart_rate_match.group(1))
-
-    spo2_match = re.search(r'sPO2: (\d+)', data)
-    if spo2_match:
-        parsed_data['spo2'] = int(spo2_match.group(1))
-
-    altitude_match = re.search(r'Altitude: (\d+)', data)
-    if altitude_match:
-        parsed_data['altitude'] = int(altitude_match.group(1))
-
-    aqi_match = re.search(r'AQI: (\d+)', data)
-    if aqi_match:
-        if 'environment' not in parsed_data:
-            parsed_data['environment'] = {}
-        parsed_data['environment']['aqi'] = int(aqi_match.group(1))
-
-    voc_match = re.search(r'VOC: ([\d.]+)', data)
-    if voc_match:
-        if 'environment' not in parsed_data:
-            parsed_data['environment'] = {}
-        parsed_data['environment']['voc'] = float(voc_match.group(1))
-
-    amb_pressure_match = re.search(r'Ambiet Pressure: ([\d.]+)', data)
-    if amb_pressure_match:
-        if 'environment' not in parsed_data:
-            parsed_data['environment'] = {}
-        parsed_data['environment']['ambientPressure'] = float(amb_pressure_match.group(1))
-
-    humidity_match = re.search(r'Humidity: (\d+)', data)
-    if humidity_match:
-        parsed_data['relativeHumidity'] = int(humidity_match.group(1))
-
-    amb_temp_match = re.search(r'Ambient temperature: (\d+)', data)
-    if amb_temp_match:
-        if 'environment' not in parsed_data:
-            parsed_data['environment'] = {}
-        parsed_data['environment']['ambientTemperature'] = int(amb_temp_match.group(1))
-
-    battery_match = re.search(r'Battery Percentage: (\d+)', data)
-    if battery_match:
-        parsed_data['battery'] = int(battery_match.group(1))
-
-    # Decibel warnings
-    decibel_match = re.search(r'(\d+)\s+dB', data)
-    if decibel_match:
-        decibel = int(decibel_match.group(1))
-        parsed_data['rssi'] = decibel  # Assuming RSSI is decibel level
-
-        if 10 < decibel < 30:
-            parsed_data['textCommand'] = "Warning"
-        elif 40 < decibel < 60:
-            parsed_data['textCommand'] = "Alert"
-        elif 70 < decibel < 90:
-            parsed_data['textCommand'] = "Emergency"
-
-    # Fall detection
-    if "Emergency" in data:
-        parsed_data['fallDamage'] = True
-
-    # Command responses from the ESP32
-    if "YES" in data or "NO" in data or "HELP" in data or "PENDING" in data or "RESOLVED" in data:
-        parsed_data['textCommand'] = data.strip()
-
-    # Return the parsed data
-    return parsed_data
+    # Add device ID to the data; field extraction is shared in telemetry.py
+    return telemetry.parse_reading(data, DEVICE_ID)
 
 def send_data_to_nodejs(parsed_data):
-    # Ensure 'Device_id' is always present in the data sent to the API
-    try:
-        if len(parsed_data)>1 : 
-            response = requests.post(API_URL, json=parsed_data)
-            print(f"Data sent to API: {parsed_data}")
-            print(f"Response: {response.text}")
-    except Exception as e:
-        print(f"Data sent to API: {parsed_data}")
-        print(f"Error sending data to Node.js: {e}")
+    if len(parsed_data) > 1:
+        uploader.submit(parsed_data)
         
 
 def main():
@@ -119,4 +36,5 @@ def main():
                 send_data_to_nodejs(parsed_data)
 
 if __name__ == "__main__":
+    uploader.start()
     main()
@@ -0,0 +1,136 @@
+import asyncio
+import csv
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+COLUMNS = ("device_id", "jawaan_id", "port", "mac_address")
+
+
+@dataclass(slots=True, frozen=True)
+class Device:
+    """One wearable: its device id, the jawaanId wearing it, and how it is reached (serial port or BLE MAC)."""
+    device_id: str = None
+    jawaan_id: str = None
+    port: str = None
+    mac_address: str = None
+
+
+def _device(row):
+    values = {column: (row.get(column) or "").strip() or None for column in COLUMNS}
+    if values["mac_address"]:
+        values["mac_address"] = values["mac_address"].upper()
+        if values["device_id"] is None:
+            # The BLE gateway's id for a device is its MAC without colons
+            values["device_id"] = values["mac_address"].replace(":", "")
+    if not any(values.values()):
+        return None
+    return Device(**values)
+
+
+class DeviceRegistry:
+    """
+    The gateway's devices, loaded from a CSV file and indexed for lookup.
+
+    The file has a header with any of the columns device_id, jawaan_id, port and
+    mac_address (e.g. multiple/mac_addresses.csv, with a mac_address column
+    only); blank cells and blank rows are ignored. Lookups by port, MAC, device
+    id or jawaanId are dict lookups.
+
+    reload() re-reads the file and returns (added, removed): a row whose values
+    changed counts as removed plus added, and untouched rows are in neither, so
+    the caller attaches or detaches only the devices that changed. poll() does
+    so only when the file's mtime moved; watch() and watch_async() call it
+    periodically and hand the changes to a callback.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.devices = ()
+        self.mtime = None
+        self.lock = threading.Lock()
+        self.by_port = {}
+        self.by_mac = {}
+        self.by_device_id = {}
+        self.by_jawaan_id = {}
+        self.reloads = 0
+        self.reload()
+
+    def __iter__(self):
+        return iter(self.devices)
+
+    def __len__(self):
+        return len(self.devices)
+
+    def _read(self):
+        with open(self.path, newline="") as file:
+            # Duplicate rows collapse into one device, first occurrence first
+            return list(dict.fromkeys(device for device in map(_device, csv.DictReader(file)) if device is not None))
+
+    def reload(self):
+        """Re-read the file; returns (added, removed) lists of Device."""
+        mtime = os.stat(self.path).st_mtime_ns
+        devices = self._read()
+        with self.lock:
+            old = set(self.devices)
+            new = set(devices)
+            added = [device for device in devices if device not in old]
+            removed = [device for device in self.devices if device not in new]
+            self.devices = tuple(devices)
+            self.mtime = mtime
+            self.by_port = {d.port: d for d in devices if d.port}
+            self.by_mac = {d.mac_address: d for d in devices if d.mac_address}
+            self.by_device_id = {d.device_id: d for d in devices if d.device_id}
+            self.by_jawaan_id = {d.jawaan_id: d for d in devices if d.jawaan_id}
+            self.reloads += 1
+        return added, removed
+
+    def poll(self):
+        """Reload if the file changed since the last load; returns (added, removed)."""
+        try:
+            if os.stat(self.path).st_mtime_ns == self.mtime:
+                return [], []
+            return self.reload()
+        except (OSError, csv.Error) as e:
+            # A file caught mid-write or briefly missing is read again on the next poll
+            print(f"Error reloading device registry {self.path}: {e}")
+            return [], []
+
+    def port(self, port):
+        return self.by_port.get(port)
+
+    def mac(self, mac_address):
+        return self.by_mac.get(mac_address.upper())
+
+    def device(self, device_id):
+        return self.by_device_id.get(device_id)
+
+    def jawaan(self, jawaan_id):
+        return self.by_jawaan_id.get(jawaan_id)
+
+    def serial_devices(self):
+        """(port, device_id, jawaan_id) for every device on a serial port, as SerialGateway takes them."""
+        return [(d.port, d.device_id, d.jawaan_id) for d in self.devices if d.port]
+
+    def watch(self, on_change, interval=2.0):
+        """Poll the file from a daemon thread; on_change(added, removed) runs there on every change."""
+        def run():
+            while True:
+                time.sleep(interval)
+                added, removed = self.poll()
+                if added or removed:
+                    on_change(added, removed)
+        thread = threading.Thread(target=run, name="registry", daemon=True)
+        thread.start()
+        return thread
+
+    async def watch_async(self, on_change, interval=2.0):
+        """Poll the file on the event loop; on_change(added, removed) runs on the loop on every change."""
+        while True:
+            await asyncio.sleep(interval)
+            added, removed = self.poll()
+            if added or removed:
+                result = on_change(added, removed)
+                if asyncio.iscoroutine(result):
+                    await result
@@ -0,0 +1,87 @@
+import struct
+from multiprocessing import shared_memory
+
+# write position, read position, capacity; positions are running byte counts
+HEADER = struct.Struct("<QQQ")
+LENGTH = struct.Struct("<I")
+WRAP = 0xFFFFFFFF  # Rest of the buffer is unused; the next record starts at offset 0
+
+
+class SharedRing:
+    """
+    Single-producer, single-consumer ring of byte records in shared memory.
+
+    One process put()s records (e.g. encoded readings) and another get()s them,
+    with no pickling and no pipe: a record is copied into the shared buffer once,
+    behind a 4-byte length, and the write position is published after the data,
+    so the reader never sees a partial record. A record that doesn't fit before
+    the end of the buffer starts over at offset 0. put() returns False when the
+    ring is full instead of blocking the producer.
+
+    The creator passes `capacity` and later unlink()s the segment; the other side
+    attaches by `name`.
+    """
+
+    def __init__(self, name=None, capacity=4 * 1024 * 1024):
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=HEADER.size + capacity)
+            HEADER.pack_into(self.shm.buf, 0, 0, 0, capacity)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.buf = self.shm.buf
+        self.capacity = HEADER.unpack_from(self.buf, 0)[2]
+        self.data = self.buf[HEADER.size:HEADER.size + self.capacity]
+        self.full = 0
+
+    def put(self, record):
+        """Append one record; returns False (and counts it in `full`) if there is no room."""
+        write, read, capacity = HEADER.unpack_from(self.buf, 0)
+        offset = write % capacity
+        need = LENGTH.size + len(record)
+        skip = 0
+        if offset + need > capacity:
+            skip = capacity - offset
+            offset = 0
+        if write + skip + need - read > capacity:
+            self.full += 1
+            return False
+        if skip >= LENGTH.size:
+            LENGTH.pack_into(self.data, capacity - skip, WRAP)
+        LENGTH.pack_into(self.data, offset, len(record))
+        self.data[offset + LENGTH.size:offset + need] = record
+        # Publish only once the record is in place
+        struct.pack_into("<Q", self.buf, 0, write + skip + need)
+        return True
+
+    def get(self, max_records=None):
+        """Take every complete record (up to `max_records`); returns a list of bytes."""
+        write, read, capacity = HEADER.unpack_from(self.buf, 0)
+        records = []
+        data = self.data
+        while read < write and (max_records is None or len(records) < max_records):
+            offset = read % capacity
+            if capacity - offset < LENGTH.size:
+                read += capacity - offset
+                continue
+            length = LENGTH.unpack_from(data, offset)[0]
+            if length == WRAP:
+                read += capacity - offset
+                continue
+            start = offset + LENGTH.size
+            records.append(bytes(data[start:start + length]))
+            read += LENGTH.size + length
+        struct.pack_into("<Q", self.buf, 8, read)
+        return records
+
+    def pending_bytes(self):
+        write, read, _ = HEADER.unpack_from(self.buf, 0)
+        return write - read
+
+    def close(self):
+        self.data.release()
+        self.buf = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
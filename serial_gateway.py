@@ -0,0 +1,130 @@
+import asyncio
+import time
+
+import serial_asyncio
+
+from framing import LineFramer
+
+
+class SerialGateway:
+    """
+    Serve every serial port from one event loop.
+
+    Each port is opened once with serial_asyncio and gets a single reader task and a
+    single writer, so reads and downlink writes share one handle without racing and
+    the gateway runs the same handful of threads however many ports it serves.
+    Whatever bytes are available are read in one go and split into lines by a
+    LineFramer, so a burst of lines costs one wakeup and a line split across reads
+    is joined. `handle_line(line, device_id, uid)` is called for every line; a port
+    that fails is reopened after `reconnect_delay` seconds without touching the
+    others. With `handle_block(lines, device_id, uid)`, a read that returns
+    `block_lines` or more lines (a backlog after a stall) is handed over in one call
+    so it can be decoded in bulk.
+
+    Ports can be attached and detached while the gateway runs (add/remove, e.g. on
+    a registry reload) without touching the other ports' sessions.
+
+    With `metrics` (metrics.Metrics), the time each read returned and its lines
+    were framed is recorded per device, for the per-stage latencies.
+    """
+
+    def __init__(self, devices, handle_line, baudrate=115200, reconnect_delay=2, read_size=4096,
+                 handle_block=None, block_lines=32, open_connection=serial_asyncio.open_serial_connection,
+                 metrics=None):
+        self.devices = list(devices)
+        self.handle_line = handle_line
+        self.baudrate = baudrate
+        self.reconnect_delay = reconnect_delay
+        self.read_size = read_size
+        self.handle_block = handle_block
+        self.block_lines = block_lines
+        self.open_connection = open_connection
+        self.metrics = metrics
+        self.writers = {}
+        self.lines = 0
+        self._tasks = {}
+        self._stopped = None
+
+    async def run_port(self, port, device_id, uid):
+        while True:
+            writer = None
+            try:
+                reader, writer = await self.open_connection(url=port, baudrate=self.baudrate)
+                self.writers[uid] = writer
+                print(f"Initialized serial connection for {device_id} on port {port}")
+                framer = LineFramer()
+                metrics = self.metrics
+                while True:
+                    chunk = await reader.read(self.read_size)
+                    if not chunk:
+                        raise ConnectionError(f"{port} closed")
+                    if metrics is not None:
+                        read_at = time.perf_counter()
+                    lines = framer.feed(chunk)
+                    if metrics is not None and lines:
+                        metrics.read(device_id, read_at, time.perf_counter(), len(lines))
+                    if self.handle_block is not None and len(lines) >= self.block_lines:
+                        self.lines += len(lines)
+                        try:
+                            self.handle_block(lines, device_id, uid)
+                        except Exception as e:
+                            print(f"Error handling data from {device_id}: {e}")
+                        continue
+                    for data in lines:
+                        self.lines += 1
+                        try:
+                            self.handle_line(data, device_id, uid)
+                        except Exception as e:
+                            print(f"Error handling data from {device_id}: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error reading data from {device_id}: {e}")
+            finally:
+                # A port re-added for the same uid may already have its new writer in place
+                if writer is not None and self.writers.get(uid) is writer:
+                    del self.writers[uid]
+                if writer is not None:
+                    writer.close()
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def write(self, uid, message):
+        """Write a downlink message to the device's port; returns False if it is not open."""
+        writer = self.writers.get(uid)
+        if writer is None:
+            print(f"Device {uid} not connected")
+            return False
+        writer.write(message.encode('utf-8'))
+        await writer.drain()
+        print(f"Data sent to {uid}: {message}")
+        return True
+
+    def add(self, port, device_id, uid):
+        """Start serving `port`; a port already served is left alone."""
+        if port not in self._tasks:
+            self._tasks[port] = asyncio.create_task(self.run_port(port, device_id, uid))
+
+    def remove(self, port):
+        """Stop serving `port` and close it."""
+        task = self._tasks.pop(port, None)
+        if task is not None:
+            task.cancel()
+
+    async def run(self):
+        self._stopped = asyncio.Event()
+        for port, device_id, uid in self.devices:
+            self.add(port, device_id, uid)
+        # Ports come and go with add/remove; run until stop() or cancelled
+        try:
+            await self._stopped.wait()
+        finally:
+            for port in list(self._tasks):
+                self.remove(port)
+
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        for port in list(self._tasks):
+            self.remove(port)
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._stopped is not None:
+            self._stopped.set()
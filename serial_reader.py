@@ -0,0 +1,175 @@
+import selectors
+import struct
+import sys
+import time
+
+from framing import LineFramer
+
+# Linux TIOCGICOUNT: serial_icounter_struct is cts, dsr, rng, dcd, rx, tx, frame,
+# overrun, parity, brk, buf_overrun, then 9 reserved ints
+TIOCGICOUNT = 0x545D
+ICOUNT_FORMAT = "20i"
+ICOUNT_OVERRUN = 7
+ICOUNT_BUF_OVERRUN = 10
+
+
+def driver_overruns(ser):
+    """Hardware plus driver-buffer overruns reported by the UART driver, or None if unsupported."""
+    if not sys.platform.startswith("linux"):
+        return None
+    import fcntl
+    try:
+        counts = struct.unpack(ICOUNT_FORMAT, fcntl.ioctl(ser.fileno(), TIOCGICOUNT, bytes(struct.calcsize(ICOUNT_FORMAT))))
+    except (OSError, AttributeError, ValueError):
+        return None
+    return counts[ICOUNT_OVERRUN] + counts[ICOUNT_BUF_OVERRUN]
+
+
+class SerialLineReader:
+    """
+    Read whole lines from a pyserial port as fast as they arrive.
+
+    `read_lines` blocks for up to the port's timeout until a byte arrives, then
+    drains everything already waiting with one `read(in_waiting)`, so a backlog is
+    cleared in a single call rather than one readline per loop. Lines come out of a
+    LineFramer.
+
+    Lost input is counted rather than silent: `overruns` is how often the OS receive
+    buffer was found full (`buffer_size`: `rx_buffer_size`, 4 KiB for the Linux tty
+    layer, or the 16 times larger buffer requested from the Windows driver), which
+    means the device may have been dropping bytes; `driver_overruns` is the UART
+    driver's own count where the platform reports it; `dropped_bytes` is what the
+    framer discarded from over-long lines.
+    """
+
+    def __init__(self, ser, rx_buffer_size=4096, max_line=4096):
+        self.ser = ser
+        self.rx_buffer_size = rx_buffer_size
+        self.buffer_size = rx_buffer_size  # What the OS actually buffers, for the overrun check
+        self.framer = LineFramer(max_line)
+        self.reads = 0
+        self.bytes_read = 0
+        self.overruns = 0
+        self._driver_overruns_at_start = driver_overruns(ser)
+        if hasattr(ser, "set_buffer_size"):
+            # Windows only: give the driver more room than its 4 KiB default
+            ser.set_buffer_size(rx_size=rx_buffer_size * 16)
+            self.buffer_size = rx_buffer_size * 16
+
+    def read_lines(self):
+        """Return the complete lines available now, waiting up to the port timeout for the first byte."""
+        ser = self.ser
+        waiting = ser.in_waiting
+        if waiting:
+            return self._feed(waiting, ser.read(waiting))
+        chunk = ser.read(1)
+        if not chunk:
+            return []
+        # The first byte has arrived; take whatever came with it
+        waiting = ser.in_waiting
+        if waiting:
+            chunk += ser.read(waiting)
+        return self._feed(waiting, chunk)
+
+    def read_available(self):
+        """Return the complete lines in what is already buffered, without waiting."""
+        waiting = self.ser.in_waiting
+        if not waiting:
+            return []
+        return self._feed(waiting, self.ser.read(waiting))
+
+    def _feed(self, waiting, chunk):
+        if waiting >= self.buffer_size:
+            self.overruns += 1
+        self.reads += 1
+        self.bytes_read += len(chunk)
+        return self.framer.feed(chunk)
+
+    def stats(self):
+        overruns = driver_overruns(self.ser)
+        if overruns is not None and self._driver_overruns_at_start is not None:
+            overruns -= self._driver_overruns_at_start
+        return {
+            "lines": self.framer.lines,
+            "bytes": self.bytes_read,
+            "reads": self.reads,
+            "overruns": self.overruns,
+            "driver_overruns": overruns,
+            "dropped_bytes": self.framer.dropped_bytes,
+            "pending_bytes": self.framer.pending(),
+        }
+
+
+class SerialMultiplexer:
+    """
+    Read lines from many serial ports in one thread without visiting idle ones.
+
+    On POSIX every port's file descriptor is registered with a selector (epoll on
+    Linux) and `read_lines` only reads the ports that have data, so a silent port
+    costs nothing and never delays the others. Windows COM ports can't be
+    selected; there the ports' `in_waiting` counts are polled every
+    `poll_interval` seconds instead, which keeps latency bounded by the interval
+    rather than by the number of ports times the read timeout.
+
+    A port that reports readable with nothing to read has hung up; it is dropped
+    and its name added to `closed`.
+    """
+
+    def __init__(self, ports, poll_interval=0.005):
+        self.readers = {name: SerialLineReader(ser) for name, ser in ports.items()}
+        self.poll_interval = poll_interval
+        self.closed = []
+        self.selector = None
+        if sys.platform != "win32":
+            self.selector = selectors.DefaultSelector()
+            for name, ser in ports.items():
+                self.selector.register(ser.fileno(), selectors.EVENT_READ, name)
+
+    def read_lines(self, timeout=1):
+        """
+        Wait up to `timeout` seconds for any port to have data and return a list of
+        (port name, line) for every complete line that arrived.
+        """
+        if self.selector is None:
+            return self._poll(timeout)
+        lines = []
+        for key, _ in self.selector.select(timeout):
+            name = key.data
+            reader = self.readers[name]
+            try:
+                if not reader.ser.in_waiting:
+                    raise OSError("readable but no data")
+                lines.extend((name, line) for line in reader.read_available())
+            except OSError as e:
+                print(f"Serial port {name} closed: {e}")
+                self.remove(name)
+        return lines
+
+    def _poll(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            lines = []
+            for name, reader in self.readers.items():
+                lines.extend((name, line) for line in reader.read_available())
+            if lines or time.monotonic() >= deadline:
+                return lines
+            time.sleep(self.poll_interval)
+
+    def add(self, name, ser):
+        """Start reading `ser` as `name`; a name already read is left alone."""
+        if name in self.readers:
+            return
+        self.readers[name] = SerialLineReader(ser)
+        if self.selector is not None:
+            self.selector.register(ser.fileno(), selectors.EVENT_READ, name)
+
+    def remove(self, name):
+        reader = self.readers.pop(name, None)
+        if reader is None:
+            return
+        if self.selector is not None:
+            self.selector.unregister(reader.ser.fileno())
+        self.closed.append(name)
+
+    def stats(self):
+        return {name: reader.stats() for name, reader in self.readers.items()}
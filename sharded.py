@@ -0,0 +1,381 @@
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+import zlib
+
+import telemetry
+from alerts import AlertLane
+from anomaly import VitalsDetector
+from backend import BackendClient
+from deadband import DeltaFilter
+from downlink import AlertFetcher, DownlinkRouter, start_push_thread
+from encoding import get_encoder
+from outbox import Outbox, script_outbox
+from registry import DeviceRegistry
+from ring import SharedRing
+from uploader import BatchUploader
+
+# First byte of every ring record
+READING = b"R"  # Worker -> coordinator: an encoded reading
+ALERT = b"A"    # Worker -> coordinator: {"jawaanId", "message"}
+WRITE = b"W"    # Coordinator -> worker: {"id", "jawaanId", "message"} to write to a device;
+                # worker -> coordinator: {"id", "ok"}, the result
+
+
+def shard_for(device, shards):
+    """The worker that owns `device`: a stable hash of its device id (or port/MAC), not Python's hash()."""
+    key = device.device_id or device.port or device.mac_address
+    return zlib.crc32(key.encode()) % shards
+
+
+class ShardWorker:
+    """
+    One worker process's share of the fleet.
+
+    Parses every line or BLE frame of its devices, runs the vitals detector,
+    applies the `delta` filter (its devices' change state lives only here) and
+    encodes readings, then puts them on its SharedRing for the coordinator:
+    readings as encoded JSON, alerts as {"jawaanId", "message"} JSON. Nothing
+    talks to the backend here. A full ring drops the record (counted in
+    `dropped`) rather than stall the ports.
+
+    Downlink messages come the other way on the `downlink` ring; each is
+    written to the device's port or BLE client and its result sent back.
+    """
+
+    def __init__(self, shard, shards, ring_name, downlink_name=None, encoder=None, delta=None):
+        self.shard = shard
+        self.shards = shards
+        self.ring = SharedRing(ring_name)
+        self.downlink = SharedRing(downlink_name) if downlink_name else None
+        self.encoder = get_encoder(encoder)
+        self.detector = VitalsDetector(self.alert)
+        self.delta = delta
+        self.decoder = None
+        self.readings = 0
+        self.dropped = 0
+
+    def owns(self, device):
+        return shard_for(device, self.shards) == self.shard
+
+    def _put(self, record):
+        if not self.ring.put(record):
+            self.dropped += 1
+
+    def alert(self, jawaan_id, message):
+        self._put(ALERT + json.dumps({"jawaanId": jawaan_id, "message": message}).encode())
+
+    def submit(self, reading):
+        self.readings += 1
+        if self.delta is not None:
+            reading = self.delta.filter(reading)
+            if reading is None:
+                return
+        self._put(READING + self.encoder.encode(reading))
+
+    def handle_line(self, data, device_id, uid):
+        reading = telemetry.parse_reading(data, device_id, uid)
+        self.detector.observe(reading)
+        if reading.fallDamage:
+            self.alert(uid, "Emergency detected")
+        if telemetry.is_command(data):
+            self.alert(uid, data.strip())
+        if len(reading) > 2:
+            self.submit(reading)
+
+    async def handle_frame(self, device_id, value, uid=None):
+        for reading in self.decoder.decode(value, device_id):
+            if uid is not None:
+                reading['uid'] = uid
+            self.detector.observe(reading)
+            if reading.get('fallDamage'):
+                self.alert(uid, "Emergency detected")
+            self.submit(reading)
+
+    async def serve_downlink(self, write, interval=0.02):
+        """Write every message from the coordinator with `write(jawaan_id, message)` and report the result."""
+        while True:
+            records = self.downlink.get()
+            if not records:
+                await asyncio.sleep(interval)
+                continue
+            for record in records:
+                message = json.loads(record[1:])
+                try:
+                    ok = await write(message["jawaanId"], message["message"])
+                except Exception as e:
+                    print(f"Error writing to {message['jawaanId']}: {e}")
+                    ok = False
+                self._put(WRITE + json.dumps({"id": message["id"], "ok": ok is not False}).encode())
+
+    def close(self):
+        self.ring.close()
+        if self.downlink is not None:
+            self.downlink.close()
+
+    async def serve(self, registry_path, reload_interval=2.0):
+        """Serve this shard's serial ports and BLE devices from the registry, following its reloads."""
+        from frames import FrameDecoder
+        from serial_gateway import SerialGateway
+
+        registry = DeviceRegistry(registry_path)
+        devices = [device for device in registry if self.owns(device)]
+        self.decoder = FrameDecoder()
+        serial = SerialGateway([(d.port, d.device_id, d.jawaan_id) for d in devices if d.port], self.handle_line)
+        jawaan_ids = {d.device_id: d.jawaan_id for d in devices}
+        ble_ids = {}  # jawaanId -> BLE device id, for downlink writes
+        ble = None
+        ble_task = None
+
+        async def handle_frame(device_id, value):
+            await self.handle_frame(device_id, value, jawaan_ids.get(device_id))
+
+        def add_ble(device):
+            # The BLE gateway (and bleak) only start once the shard has a BLE device, at startup or on reload
+            nonlocal ble, ble_task
+            if ble is None:
+                from ble_gateway import BleGateway
+                ble = BleGateway([], handle_frame)
+                ble_task = asyncio.ensure_future(ble.run())
+            # Under the registry's device_id, the key of jawaan_ids and ble_ids, not the MAC-derived one
+            ble.add(device.mac_address, device.device_id)
+            ble_ids[device.jawaan_id] = device.device_id
+
+        async def write(jawaan_id, message):
+            if jawaan_id in ble_ids:
+                return await ble.write(ble_ids[jawaan_id], message)
+            return await serial.write(jawaan_id, message)
+
+        def on_change(added, removed):
+            for device in removed:
+                if not self.owns(device):
+                    continue
+                if device.port:
+                    serial.remove(device.port)
+                elif device.mac_address and ble is not None:
+                    ble.remove(device.mac_address)
+                    ble_ids.pop(device.jawaan_id, None)
+            for device in added:
+                if not self.owns(device):
+                    continue
+                jawaan_ids[device.device_id] = device.jawaan_id
+                if device.port:
+                    serial.add(device.port, device.device_id, device.jawaan_id)
+                elif device.mac_address:
+                    add_ble(device)
+
+        for device in devices:
+            if device.mac_address and not device.port:
+                add_ble(device)
+        tasks = [serial.run(), registry.watch_async(on_change, reload_interval)]
+        if self.downlink is not None:
+            tasks.append(self.serve_downlink(write))
+        print(f"Shard {self.shard}/{self.shards}: {len(devices)} devices")
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            if ble_task is not None:
+                ble_task.cancel()
+
+
+def run_worker(shard, shards, registry_path, ring_name, downlink_name):
+    """Worker process entry point."""
+    worker = ShardWorker(shard, shards, ring_name, downlink_name, delta=DeltaFilter())
+    try:
+        asyncio.run(worker.serve(registry_path))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        worker.close()
+
+
+class ShardedGateway:
+    """
+    Spread a large fleet over worker processes, so parsing isn't bound to one GIL.
+
+    Devices from the registry are hashed over `workers` processes (shard_for);
+    each worker owns its serial ports and BLE clients and does the parsing,
+    detection and JSON encoding (ShardWorker). This coordinator process owns
+    everything that talks to the backend: the pooled client, the batch uploader
+    and the alert lane. Each worker has its own SharedRing to the coordinator,
+    which drains them and hands the already-encoded readings to the uploader as
+    they are. A worker that dies is restarted on the same shard and rings.
+
+    Downlink runs the other way: write(jawaan_id, message) puts the message on
+    the owning worker's downlink ring and returns a future of whether the
+    device took it. With a DownlinkRouter (and an AlertFetcher feeding it),
+    every registry device is registered with them, following reloads, so
+    operator replies reach the workers' ports as in the single-process scripts.
+    """
+
+    def __init__(self, registry_path, uploader, alert_lane, workers=None, ring_bytes=8 * 1024 * 1024,
+                 target=run_worker, args=(), router=None, fetcher=None, write_timeout=5.0):
+        self.registry_path = registry_path
+        self.uploader = uploader
+        self.alert_lane = alert_lane
+        self.workers = workers or os.cpu_count() or 1
+        self.ring_bytes = ring_bytes
+        self.target = target
+        self.args = args
+        self.router = router
+        self.fetcher = fetcher
+        self.write_timeout = write_timeout
+        self.context = multiprocessing.get_context("spawn")
+        self.registry = None
+        self.rings = []
+        self.downlinks = []
+        self.writes = {}
+        self._write_ids = itertools.count(1)
+        self.processes = []
+        self.readings = 0
+        self.alerts = 0
+        self.restarts = 0
+        self._stop = False
+
+    def _spawn(self, shard):
+        process = self.context.Process(target=self.target, name=f"shard-{shard}", daemon=True,
+                                       args=(shard, self.workers, self.registry_path, self.rings[shard].name,
+                                             self.downlinks[shard].name) + tuple(self.args))
+        process.start()
+        return process
+
+    def start(self):
+        self.registry = DeviceRegistry(self.registry_path)
+        self.rings = [SharedRing(capacity=self.ring_bytes) for _ in range(self.workers)]
+        self.downlinks = [SharedRing(capacity=256 * 1024) for _ in range(self.workers)]
+        self._attach(self.registry, [])
+        self.processes = [self._spawn(shard) for shard in range(self.workers)]
+        return self
+
+    def write(self, jawaan_id, message):
+        """Queue a downlink message for the worker that owns `jawaan_id`; returns a concurrent future of the result."""
+        future = concurrent.futures.Future()
+        device = self.registry.jawaan(jawaan_id)
+        if device is None:
+            future.set_result(False)
+            return future
+        write_id = next(self._write_ids)
+        record = WRITE + json.dumps({"id": write_id, "jawaanId": jawaan_id, "message": message}).encode()
+        self.writes[write_id] = future
+        future.add_done_callback(lambda _: self.writes.pop(write_id, None))
+        if not self.downlinks[shard_for(device, self.workers)].put(record):
+            future.set_result(False)
+        return future
+
+    def _sender(self, jawaan_id):
+        async def send(message):
+            # A worker that died with the message is a failed delivery, retried by the router
+            return await asyncio.wait_for(asyncio.wrap_future(self.write(jawaan_id, message)), self.write_timeout)
+        return send
+
+    def _attach(self, added, removed):
+        for device in removed:
+            if device.jawaan_id and self.router is not None:
+                self.router.unregister(device.jawaan_id)
+                if self.fetcher is not None:
+                    self.fetcher.unregister(device.jawaan_id)
+        for device in added:
+            if device.jawaan_id and self.router is not None:
+                self.router.register(device.jawaan_id, self._sender(device.jawaan_id))
+                if self.fetcher is not None:
+                    self.fetcher.register(device.jawaan_id, self.router.submit_threadsafe)
+
+    def drain(self):
+        """Move every record waiting on the rings to the uploader or the alert lane; returns how many."""
+        moved = 0
+        for ring in self.rings:
+            for record in ring.get():
+                kind = record[:1]
+                if kind == READING:
+                    self.uploader.submit(record[1:])
+                    self.readings += 1
+                elif kind == ALERT:
+                    alert = json.loads(record[1:])
+                    self.alert_lane.submit(alert["jawaanId"], alert["message"])
+                    self.alerts += 1
+                elif kind == WRITE:
+                    result = json.loads(record[1:])
+                    future = self.writes.get(result["id"])
+                    if future is not None and not future.done():
+                        future.set_result(result["ok"])
+                moved += 1
+        return moved
+
+    def supervise(self):
+        added, removed = self.registry.poll()
+        if added or removed:
+            self._attach(added, removed)
+        for shard, process in enumerate(self.processes):
+            if not process.is_alive() and not self._stop:
+                print(f"Shard {shard} exited with {process.exitcode}; restarting")
+                self.restarts += 1
+                self.processes[shard] = self._spawn(shard)
+
+    def run(self, report_interval=60):
+        idle = 0.001
+        last_check = last_report = time.monotonic()
+        while not self._stop:
+            if self.drain():
+                idle = 0.001
+            else:
+                # Back off while the rings are empty, up to 20 ms of added latency
+                time.sleep(idle)
+                idle = min(idle * 2, 0.02)
+            now = time.monotonic()
+            if now - last_check >= 1:
+                last_check = now
+                self.supervise()
+            if report_interval and now - last_report >= report_interval:
+                last_report = now
+                print(f"Sharded gateway stats: {self.stats()}")
+
+    def stop(self, timeout=5):
+        self._stop = True
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join(timeout)
+        self.drain()
+        for ring in self.rings + self.downlinks:
+            ring.close()
+            ring.unlink()
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "alive": sum(process.is_alive() for process in self.processes),
+            "readings": self.readings,
+            "alerts": self.alerts,
+            "restarts": self.restarts,
+            "ring_pending_bytes": [ring.pending_bytes() for ring in self.rings],
+        }
+
+
+if __name__ == "__main__":
+    # python sharded.py [workers]; devices come from devices.csv
+    backend = BackendClient()
+    uploader = BatchUploader(outbox=Outbox(script_outbox(__file__)), backend=backend, max_batch=500)
+    alert_lane = AlertLane(backend)
+    router = DownlinkRouter(backend=backend)
+    fetcher = AlertFetcher(interval=30, backend=backend)
+    gateway = ShardedGateway("devices.csv", uploader, alert_lane,
+                             workers=int(sys.argv[1]) if len(sys.argv) > 1 else None, router=router, fetcher=fetcher)
+    uploader.start()
+    alert_lane.start()
+    gateway.start()
+    start_push_thread(router)
+    fetcher.start()
+    try:
+        gateway.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fetcher.stop()
+        gateway.stop()
+        uploader.stop()
+        alert_lane.stop()
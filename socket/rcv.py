@@ -1,86 +1,80 @@
 import serial
-import re
-import requests
 import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import telemetry
+from backend import BackendClient
+from outbox import Outbox, script_outbox
+from registry import DeviceRegistry
+from serial_reader import SerialMultiplexer
+from uploader import BatchUploader
 
 # API endpoint to send data to
 API_URL = "https://cms-backend-five.vercel.app/api/ble/esp"
+backend = BackendClient()
+uploader = BatchUploader(API_URL, outbox=Outbox(script_outbox(__file__)), backend=backend)
+
+# COM ports and their jawaan_ids come from socket/devices.csv (port, jawaan_id); edits are applied while running
+registry = DeviceRegistry(os.path.join(os.path.dirname(os.path.abspath(__file__)), "devices.csv"))
+RELOAD_INTERVAL = 2  # Seconds between checks of devices.csv
 
-# Map of COM ports to corresponding jawaan_ids
-com_port_jawaan_map = {
-    'COM8': '12345',  # Device connected to COM8 has jawaan_id 12345
-    'COM9': '67890',  # Device connected to COM9 has jawaan_id 67890
-    # Add more COM ports as necessary
-}
 
-# Set up serial connections for each COM port
-ser_devices = {
-    'COM8': serial.Serial('COM8', baudrate=115200, timeout=1),
-    'COM9': serial.Serial('COM9', baudrate=115200, timeout=1),
-    # Add more COM ports if needed
-}
+def open_port(port):
+    return serial.Serial(port, baudrate=115200, timeout=1)
 
 # Function to parse incoming data from the device
 def parse_data(data):
-    parsed_data = {}
-
-    # Extract sensor values using regular expressions
-    temp_match = re.search(r'Body temperature: (\d+)', data)
-    if temp_match:
-        parsed_data['Body temperature'] = int(temp_match.group(1))
-
-    resp_match = re.search(r'Respiration rate: (\d+)', data)
-    if resp_match:
-        parsed_data['Respiration rate'] = int(resp_match.group(1))
-
-    heart_rate_match = re.search(r'Heart Rate: (\d+)', data)
-    if heart_rate_match:
-        parsed_data['Heart Rate'] = int(heart_rate_match.group(1))
-
-    spo2_match = re.search(r'sPO2: (\d+)', data)
-    if spo2_match:
-        parsed_data['sPO2'] = int(spo2_match.group(1))
-
-    altitude_match = re.search(r'Altitude: (\d+)', data)
-    if altitude_match:
-        parsed_data['Altitude'] = int(altitude_match.group(1))
-
-    aqi_match = re.search(r'AQI: (\d+)', data)
-    if aqi_match:
-        parsed_data['AQI'] = int(aqi_match.group(1))
-
-    # Continue parsing other sensor data as needed...
-
-    return parsed_data
+    return telemetry.parse_labels(data)
 
 # Function to send the parsed data to the API
 def send_data_to_nodejs(parsed_data, jawaan_id):
-    try:
-        # Add jawaan_id to the data being sent
-        parsed_data['jawaan_id'] = jawaan_id
-        response = requests.post(API_URL, json=parsed_data)
-        print(f"Data sent to API: {parsed_data}")
-        print(f"Response: {response.text}")
-    except Exception as e:
-        print(f"Error sending data to Node.js: {e}")
+    # Add jawaan_id to the data being sent and queue it for the batch uploader
+    parsed_data['jawaan_id'] = jawaan_id
+    uploader.submit(parsed_data)
+
+# Attach and detach only the ports whose rows changed; the other ports keep reading
+def apply_changes(multiplexer, added, removed):
+    for device in removed:
+        reader = multiplexer.readers.get(device.port)
+        if reader is not None:
+            multiplexer.remove(device.port)
+            reader.ser.close()
+            print(f"Detached {device.port}")
+    for device in added:
+        if device.port:
+            try:
+                multiplexer.add(device.port, open_port(device.port))
+                print(f"Attached {device.port} for jawaan_id {device.jawaan_id}")
+            except serial.SerialException as e:
+                print(f"Error opening {device.port}: {e}")
 
 # Main function to read data from multiple COM ports and process them
 def main():
+    # Waits on all ports at once and reads only the ones with data,
+    # so a silent port no longer delays the others
+    multiplexer = SerialMultiplexer({})
+    apply_changes(multiplexer, list(registry), [])
+    next_reload = time.monotonic() + RELOAD_INTERVAL
     while True:
-        # Iterate over all the devices connected to COM ports
-        for com_port, ser in ser_devices.items():
-            data = ser.readline().decode('utf-8').strip()
-            
-            if data:
-                # Get the corresponding jawaan_id for the current COM port
-                jawaan_id = com_port_jawaan_map.get(com_port)
-                
-                # Parse the sensor data from the device
-                parsed_data = parse_data(data)
-                
-                # If we have valid parsed data, send it to the API
-                if parsed_data and jawaan_id:
-                    send_data_to_nodejs(parsed_data, jawaan_id)
+        for com_port, data in multiplexer.read_lines():
+            # Get the corresponding jawaan_id for the current COM port
+            device = registry.port(com_port)
+            jawaan_id = device.jawaan_id if device else None
+
+            # Parse the sensor data from the device
+            parsed_data = parse_data(data)
+
+            # If we have valid parsed data, send it to the API
+            if parsed_data and jawaan_id:
+                send_data_to_nodejs(parsed_data, jawaan_id)
+
+        if time.monotonic() >= next_reload:
+            next_reload = time.monotonic() + RELOAD_INTERVAL
+            apply_changes(multiplexer, *registry.poll())
 
 if __name__ == "__main__":
+    uploader.start()
     main()
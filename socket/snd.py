@@ -1,15 +1,17 @@
 import serial
-import requests
-import time
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend import BackendClient
+from downlink import AlertFetcher, DownlinkRouter, start_push_thread
 
 # Configure the serial port and Bluetooth connection
 ser = serial.Serial('COM7', baudrate=115200, timeout=1)  # Update the port as necessary
 
-# URL of the API
-api_url = "https://cms-backend-five.vercel.app/api/alert/readAlertReply"
-
-# Keep track of the last sent message ID to detect new messages
-last_message_id = None
+backend = BackendClient()
+router = DownlinkRouter(backend=backend)
+fetcher = AlertFetcher(interval=30, backend=backend)
 
 def send_data_to_device(data):
     try:
@@ -23,44 +25,17 @@ def send_data_to_device(data):
             print(f"Response from device: {response}")
         else:
             print("No response from device.")
+        return True
     except Exception as e:
         print(f"Error sending data: {e}")
-
-def fetch_latest_message():
-    global last_message_id
-
-    try:
-        # Perform a GET request to fetch the data from the API
-        response = requests.get(api_url)
-        if response.status_code == 200:
-            data = response.json()
-
-            # Check if the API call was successful
-            if data["success"]:
-                for message in data["mssg"]:
-                    if message["jawaanId"] == "JW001" and not message["resolved"]:
-                        # Check if the message is new by comparing the messageId
-                        if message["messageId"] != last_message_id:
-                            last_message_id = message["messageId"]
-                            return message["message"]
-        else:
-            print(f"Failed to fetch data. Status code: {response.status_code}")
-    except Exception as e:
-        print(f"Error fetching data: {e}")
-
-    return None
+        return False
 
 def main():
-    while True:
-        # Fetch the latest message for JW001
-        latest_message = fetch_latest_message()
-
-        # If there's a new message, send it to the device
-        if latest_message:
-            send_data_to_device(latest_message)
-
-        # Wait for a few seconds before checking again
-        time.sleep(5)
+    # Messages for JW001 are sent to the device in order, whichever path they arrive on
+    router.register("JW001", send_data_to_device)
+    start_push_thread(router, default_jawaan_id="JW001")
+    fetcher.register("JW001", router.submit_threadsafe)
+    fetcher.run()
 
 if __name__ == "__main__":
     main()
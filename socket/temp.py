@@ -1,16 +1,26 @@
 import serial
-import re
-import requests
 import json
 import time
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import telemetry
+from backend import BackendClient
+from outbox import Outbox, script_outbox
+from serial_reader import SerialLineReader
+from uploader import BatchUploader
 
 # Configure the serial port and Bluetooth connection
 # Update 'COM3' with the appropriate virtual COM port assigned to your Bluetooth device
 SERIAL_PORT = 'COM4'
 BAUD_RATE = 115200
 TIMEOUT = 1
+STATS_INTERVAL = 60  # Seconds between read counter reports
 
 API_URL = "https://cms-backend-five.vercel.app/api/ble/esp"
+backend = BackendClient()
+uploader = BatchUploader(API_URL, outbox=Outbox(script_outbox(__file__)), backend=backend)
 
 def open_serial_connection():
     """
@@ -26,67 +36,15 @@ def open_serial_connection():
 
 def parse_data(data):
     """
-    Parse incoming Bluetooth data and extract sensor values using regular expressions.
+    Parse incoming Bluetooth data and extract sensor values in a single pass.
     """
-    parsed_data = {}
-
-    # Extract values using regular expressions
-    temp_match = re.search(r'Body temperature: (\d+)', data)
-    if temp_match:
-        parsed_data['Body temperature'] = int(temp_match.group(1))
-
-    resp_match = re.search(r'Respiration rate: (\d+)', data)
-    if resp_match:
-        parsed_data['Respiration rate'] = int(resp_match.group(1))
-
-    heart_rate_match = re.search(r'Heart Rate: (\d+)', data)
-    if heart_rate_match:
-        parsed_data['Heart Rate'] = int(heart_rate_match.group(1))
-
-    spo2_match = re.search(r'sPO2: (\d+)', data)
-    if spo2_match:
-        parsed_data['sPO2'] = int(spo2_match.group(1))
-
-    altitude_match = re.search(r'Altitude: (\d+)', data)
-    if altitude_match:
-        parsed_data['Altitude'] = int(altitude_match.group(1))
-
-    aqi_match = re.search(r'AQI: (\d+)', data)
-    if aqi_match:
-        parsed_data['AQI'] = int(aqi_match.group(1))
-
-    voc_match = re.search(r'VOC: ([\d.]+)', data)
-    if voc_match:
-        parsed_data['VOC'] = float(voc_match.group(1))
-
-    amb_pressure_match = re.search(r'Ambiet Pressure: ([\d.]+)', data)
-    if amb_pressure_match:
-        parsed_data['Ambient Pressure'] = float(amb_pressure_match.group(1))
-
-    humidity_match = re.search(r'Humidity: (\d+)', data)
-    if humidity_match:
-        parsed_data['Humidity'] = int(humidity_match.group(1))
-
-    amb_temp_match = re.search(r'Ambient temperature: (\d+)', data)
-    if amb_temp_match:
-        parsed_data['Ambient temperature'] = int(amb_temp_match.group(1))
-
-    battery_match = re.search(r'Battery Percentage: (\d+)', data)
-    if battery_match:
-        parsed_data['Battery Percentage'] = int(battery_match.group(1))
-
-    return parsed_data
+    return telemetry.parse_labels(data)
 
 def send_data_to_nodejs(parsed_data):
     """
-    Send parsed data to the specified Node.js backend API.
+    Queue parsed data for the batch uploader to send to the Node.js backend API.
     """
-    try:
-        response = requests.post(API_URL, json=parsed_data)
-        print(f"Data sent to API: {parsed_data}")
-        print(f"Response: {response.text}")
-    except Exception as e:
-        print(f"Error sending data to API: {e}")
+    uploader.submit(parsed_data)
 
 def main():
     """
@@ -98,12 +56,13 @@ def main():
     if ser is None:
         return
 
+    # Waits up to TIMEOUT for data, then drains every line already buffered
+    reader = SerialLineReader(ser)
+    next_report = time.monotonic() + STATS_INTERVAL
+
     try:
         while True:
-            # Read and decode a line of data from the serial port
-            data = ser.readline().decode('utf-8').strip()
-
-            if data:
+            for data in reader.read_lines():
                 print(f"Received: {data}")  # Optional: Log received data
                 parsed_data = parse_data(data)
 
@@ -111,7 +70,9 @@ def main():
                 if parsed_data:
                     send_data_to_nodejs(parsed_data)
 
-            time.sleep(0.1)  # Add a short delay to avoid overwhelming the serial port
+            if time.monotonic() >= next_report:
+                print(f"Serial read stats: {reader.stats()}")
+                next_report += STATS_INTERVAL
     except serial.SerialException as e:
         print(f"Serial communication error: {e}")
     except KeyboardInterrupt:
@@ -119,8 +80,10 @@ def main():
     finally:
         # Always close the serial connection when done
         if ser:
+            print(f"Serial read stats: {reader.stats()}")
             ser.close()
             print("Serial connection closed.")
 
 if __name__ == "__main__":
+    uploader.start()
     main()
@@ -0,0 +1,168 @@
+import re
+
+from reading import Environment, Reading
+
+# Label sent by the ESP32 -> (output field, nested under 'environment', converter)
+# Both spellings of the pressure label are in use across firmware versions.
+FIELDS = {
+    'Body temperature': ('bodyTemperature', False, int),
+    'Respiration rate': ('respiratoryRate', False, int),
+    'Heart Rate': ('heartRate', False, int),
+    'sPO2': ('spo2', False, int),
+    'Altitude': ('altitude', False, int),
+    'AQI': ('aqi', True, int),
+    'VOC': ('voc', True, float),
+    'Ambient Pressure': ('ambientPressure', True, float),
+    'Ambiet Pressure': ('ambientPressure', True, float),
+    'Humidity': ('relativeHumidity', False, int),
+    'Ambient temperature': ('ambientTemperature', True, int),
+    'Battery Percentage': ('battery', False, int),
+}
+
+# Labels as the socket/ scripts report them (raw label keys, one spelling for pressure)
+LABEL_KEYS = {label: label for label in FIELDS}
+LABEL_KEYS['Ambiet Pressure'] = 'Ambient Pressure'
+
+COMMAND_WORDS = ("YES", "NO", "HELP", "PENDING", "RESOLVED")
+
+# One alternation over every known label, so a line is scanned exactly once.
+# Longer labels first so "Ambient temperature" never loses to a shorter prefix.
+FIELD_PATTERN = re.compile(
+    r'(' + '|'.join(re.escape(label) for label in sorted(FIELDS, key=len, reverse=True)) + r'): ([\d.]+)'
+)
+DECIBEL_PATTERN = re.compile(r'(\d+)\s+dB')
+
+
+def _convert(converter, value):
+    # int fields keep only the leading digits, like the old (\d+) patterns did
+    try:
+        if converter is int:
+            return int(value.split('.', 1)[0])
+        return float(value)
+    except ValueError:
+        return None
+
+
+def scan_fields(data):
+    """
+    Tokenize a "Key: value" line in a single pass and return {label: value}.
+    The first occurrence of a label wins, matching the old per-field re.search.
+    """
+    values = {}
+    for match in FIELD_PATTERN.finditer(data):
+        label = match.group(1)
+        if label in values:
+            continue
+        value = _convert(FIELDS[label][2], match.group(2))
+        if value is not None:
+            values[label] = value
+    return values
+
+
+def decibel_command(decibel):
+    """Map a sound level to the textCommand the backend expects, or None outside the bands."""
+    if 10 < decibel < 30:
+        return "Warning"
+    if 40 < decibel < 60:
+        return "Alert"
+    if 70 < decibel < 90:
+        return "Emergency"
+    return None
+
+
+def parse_data(data, device_id=None, uid=None):
+    """
+    Parse one telemetry line into the backend /api/ble/esp schema.
+    'id' and 'uid' are only added when given, so callers keep their old payloads.
+    """
+    parsed_data = {}
+    if device_id is not None:
+        parsed_data['id'] = device_id
+    if uid is not None:
+        parsed_data['uid'] = uid
+
+    for match in FIELD_PATTERN.finditer(data):
+        field, nested, converter = FIELDS[match.group(1)]
+        target = parsed_data
+        if nested:
+            target = parsed_data.get('environment', {})
+        if field in target:
+            continue
+        value = _convert(converter, match.group(2))
+        if value is None:
+            continue
+        if nested and 'environment' not in parsed_data:
+            parsed_data['environment'] = target
+        target[field] = value
+
+    if 'dB' in data:
+        decibel_match = DECIBEL_PATTERN.search(data)
+        if decibel_match:
+            decibel = int(decibel_match.group(1))
+            parsed_data['rssi'] = decibel  # Assuming RSSI is decibel level
+
+            command = decibel_command(decibel)
+            if command:
+                parsed_data['textCommand'] = command
+
+    # Fall detection
+    if "Emergency" in data:
+        parsed_data['fallDamage'] = True
+
+    # Command responses from the ESP32
+    if is_command(data):
+        parsed_data['textCommand'] = data.strip()
+
+    return parsed_data
+
+
+def parse_reading(data, device_id=None, uid=None):
+    """
+    Parse one telemetry line into a slotted Reading, with the same fields and
+    values as parse_data.
+    """
+    values = {}
+    environment = None
+    # findall skips building a match object per field
+    for label, raw in FIELD_PATTERN.findall(data):
+        field, nested, converter = FIELDS[label]
+        target = values
+        if nested:
+            if environment is None:
+                environment = {}
+            target = environment
+        if field in target:
+            continue
+        value = _convert(converter, raw)
+        if value is not None:
+            target[field] = value
+
+    reading = Reading(device_id, uid, **values)
+    if environment:
+        reading.environment = Environment(**environment)
+
+    if 'dB' in data:
+        decibel_match = DECIBEL_PATTERN.search(data)
+        if decibel_match:
+            decibel = int(decibel_match.group(1))
+            reading.rssi = decibel
+            reading.textCommand = decibel_command(decibel)
+
+    if "Emergency" in data:
+        reading.fallDamage = True
+
+    if is_command(data):
+        reading.textCommand = data.strip()
+
+    return reading
+
+
+def parse_labels(data):
+    """
+    Parse a line into the flat label-keyed dict used by the socket/ scripts.
+    """
+    return {LABEL_KEYS[label]: value for label, value in scan_fields(data).items()}
+
+
+def is_command(data):
+    return any(word in data for word in COMMAND_WORDS)
@@ -0,0 +1,337 @@
+import collections
+import queue
+import threading
+import time
+
+from backend import BackendClient
+from encoding import get_encoder, join_encoded
+
+API_URL = "https://cms-backend-five.vercel.app/api/ble/esp"
+
+
+def _is_block(item):
+    # Queued readings are single readings (dicts or Readings) or columnar blocks
+    return hasattr(item, 'to_records')
+
+
+def _size(entry):
+    # Queue entries are (reading or block, its metrics traces or None)
+    item = entry[0]
+    return len(item) if _is_block(item) else 1
+
+
+class BatchUploader:
+    """
+    Queue readings and POST them to the backend in batches from a background thread.
+
+    A batch is flushed when it reaches max_batch readings or when its oldest reading
+    is max_age seconds old. The queue is bounded: when the backend falls behind,
+    submit() drops the oldest queued reading instead of blocking the caller, so a
+    slow endpoint never stalls read_from_device.
+
+    With an Outbox, readings are appended to disk instead of the in-memory queue and
+    only acknowledged after the backend accepts them, so an outage loses nothing;
+    failed batches are retried in order with exponential backoff.
+
+    A backlog decoded in bulk (columnar.Columns) is queued with submit_columns() as
+    max_batch-row blocks; they only become dicts on the uploader thread, one batch
+    at a time, just before they are posted.
+
+    Every reading is serialized exactly once by the pluggable `encoder` (see
+    encoding.py): a queued batch is encoded to one bytes body before the POST,
+    and outboxed readings are encoded on submit and later posted from their stored
+    bytes. Time spent encoding is reported in stats().
+
+    With a `delta` filter (deadband.DeltaFilter), each reading is reduced to the
+    fields that changed before it is queued, and readings with no change are not
+    uploaded at all; a columnar block is filtered as columns and stays one.
+
+    A reading that arrives as bytes was encoded (and delta-filtered, if at all)
+    elsewhere, e.g. in a sharded.py worker process; it is queued or outboxed as is.
+
+    With `metrics` (metrics.Metrics), each submitted reading keeps a trace that
+    is closed when its batch is acknowledged: queue time, serialization, the
+    POST and the end-to-end latency from the serial read. A trace is queued
+    together with its reading, so a dropped reading takes its trace with it; in
+    outbox mode it is kept next to the reading's outbox position, recorded under
+    one lock with the append so positions stay in order.
+    """
+
+    def __init__(self, url=API_URL, max_batch=50, max_age=0.5, max_queue=10000,
+                 pool_size=4, timeout=None, report_interval=60, outbox=None,
+                 retry_delay=1.0, max_retry_delay=30.0, encoder=None, backend=None, delta=None,
+                 metrics=None):
+        self.url = url
+        self.max_batch = max_batch
+        self.max_age = max_age
+        self.timeout = timeout
+        self.report_interval = report_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.outbox = outbox
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.encoder = encoder or get_encoder()
+        self.delta = delta
+        self.metrics = metrics
+        self._traces = collections.deque()  # (outbox position, trace), in position order
+        self._trace_lock = threading.Lock()
+        if metrics is not None:
+            metrics.gauge("uploader_queued", self.queue.qsize)
+            if outbox is not None:
+                metrics.gauge("outbox_pending_bytes", outbox.pending_bytes)
+
+        # Shared keep-alive client, so batches reuse the same TCP/TLS connection
+        self.backend = backend or BackendClient(pool_size=pool_size)
+
+        self.lock = threading.Lock()
+        self.submitted = 0
+        self.suppressed = 0
+        self.dropped = 0
+        self.sent = 0
+        self.failed = 0
+        self.batches = 0
+        self.flush_time_total = 0.0
+        self.flush_time_max = 0.0
+        self.last_batch_size = 0
+        self.last_flush_time = 0.0
+        self.encoded = 0
+        self.encoded_bytes = 0
+        self.encode_time_total = 0.0
+
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="uploader", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, reading):
+        """Queue one reading; returns False if an older reading had to be dropped."""
+        with self.lock:
+            self.submitted += 1
+        if type(reading) is not bytes and self.delta is not None:
+            reading = self.delta.filter(reading)
+            if reading is None:
+                with self.lock:
+                    self.suppressed += 1
+                return True
+        trace = self.metrics.submitted(reading) if self.metrics is not None else None
+        if self.outbox is not None:
+            body = reading if type(reading) is bytes else self._encode([reading], self.encoder.encode, reading)
+            self._append(body, trace)
+            self._wakeup.set()
+            return True
+        return self._put((reading, None if trace is None else [trace]))
+
+    def submit_columns(self, columns):
+        """Queue a block of columnar readings; returns False if older readings had to be dropped."""
+        if self.delta is not None:
+            rows = len(columns)
+            columns = self.delta.filter_columns(columns)
+            with self.lock:
+                self.submitted += rows - len(columns)
+                self.suppressed += rows - len(columns)
+        if self.outbox is not None:
+            readings = columns.to_records(skip_empty=True)
+            with self.lock:
+                self.submitted += len(readings)
+            for reading in readings:
+                trace = self.metrics.submitted(reading) if self.metrics is not None else None
+                self._append(self._encode([reading], self.encoder.encode, reading), trace)
+            self._wakeup.set()
+            return True
+        with self.lock:
+            self.submitted += len(columns)
+        ok = True
+        for start in range(0, len(columns), self.max_batch):
+            block = columns.slice(start, start + self.max_batch)
+            traces = None
+            if self.metrics is not None:
+                traces = [self.metrics.submitted(reading) for reading in block.to_records(skip_empty=True)]
+            ok = self._put((block, traces)) and ok
+        return ok
+
+    def _append(self, body, trace):
+        if trace is None:
+            self.outbox.append(body)
+            return
+        # One lock around both, so _traces stays in outbox position order across submitting threads
+        with self._trace_lock:
+            self._traces.append((self.outbox.append(body), trace))
+
+    def _put(self, entry):
+        try:
+            self.queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            pass
+        dropped = 0
+        try:
+            dropped += _size(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            dropped += _size(entry)
+        with self.lock:
+            self.dropped += dropped
+        return False
+
+    def _next_batch(self):
+        """The next batch of readings and, with metrics, their traces."""
+        try:
+            first, traces = self.queue.get(timeout=0.25)
+        except queue.Empty:
+            return [], []
+        traces = list(traces) if traces else []
+        if _is_block(first):
+            # A columnar block is already a full batch
+            return first.to_records(skip_empty=True), traces
+        batch = [first]
+        deadline = time.monotonic() + self.max_age
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item, item_traces = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item_traces:
+                traces.extend(item_traces)
+            if _is_block(item):
+                batch.extend(item.to_records(skip_empty=True))
+                break
+            batch.append(item)
+        return batch, traces
+
+    def _drain_outbox(self):
+        delay = self.retry_delay
+        while not self._stop.is_set():
+            # Posted as stored: the readings were encoded when they were submitted
+            batch, position = self.outbox.read_batch(self.max_batch, raw=True)
+            if not batch:
+                return
+            picked_up_at = time.perf_counter()
+            if not self.flush(batch):
+                # Backend is down: keep the readings on disk and retry the same batch later
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+                continue
+            self.outbox.ack(position)
+            if self.metrics is not None:
+                traces = []
+                while self._traces and self._traces[0][0] <= position:
+                    traces.append(self._traces.popleft()[1])
+                self.metrics.delivered(traces, picked_up_at, True)
+            delay = self.retry_delay
+            if len(batch) < self.max_batch:
+                return
+
+    def _run_outbox(self):
+        self._wakeup.wait(0.25)
+        if self._wakeup.is_set():
+            # Give the batch up to max_age to fill before reading it back
+            self._stop.wait(self.max_age)
+            self._wakeup.clear()
+        self._drain_outbox()
+
+    def _run(self):
+        last_report = time.monotonic()
+        while not self._stop.is_set() or not self.queue.empty():
+            if self.outbox is not None:
+                self._run_outbox()
+            else:
+                batch, traces = self._next_batch()
+                if batch:
+                    picked_up_at = time.perf_counter()
+                    ok = self.flush(batch)
+                    if self.metrics is not None:
+                        self.metrics.delivered(traces, picked_up_at, ok)
+            if self.report_interval and time.monotonic() - last_report >= self.report_interval:
+                last_report = time.monotonic()
+                print(f"Uploader stats: {self.stats()}")
+                if self.metrics is not None:
+                    print(f"Latency: {self.metrics.stats()}")
+
+    def _encode(self, readings, encode, payload):
+        start = time.perf_counter()
+        body = encode(payload)
+        elapsed = time.perf_counter() - start
+        if self.metrics is not None:
+            self.metrics.observe("serialize", elapsed)
+        with self.lock:
+            self.encoded += len(readings)
+            self.encoded_bytes += len(body)
+            self.encode_time_total += elapsed
+        return body
+
+    def encode_batch(self, batch):
+        """The JSON array body for `batch`; pre-encoded readings (bytes) are only joined."""
+        if batch and isinstance(batch[0], bytes):
+            return join_encoded(batch)
+        return self._encode(batch, self.encoder.encode_batch, batch)
+
+    def post(self, body):
+        kwargs = {} if self.timeout is None else {"timeout": self.timeout}
+        return self.backend.request("readings", url=self.url, data=body,
+                                    headers={'Content-Type': 'application/json'}, **kwargs)
+
+    def flush(self, batch):
+        body = self.encode_batch(batch)
+        start = time.perf_counter()
+        ok = True
+        try:
+            self.post(body)
+        except Exception as e:
+            ok = False
+            print(f"Error sending batch of {len(batch)} readings to Node.js: {e}")
+        elapsed = time.perf_counter() - start
+        if self.metrics is not None:
+            self.metrics.observe("http", elapsed)
+
+        with self.lock:
+            self.batches += 1
+            if ok:
+                self.sent += len(batch)
+            else:
+                self.failed += len(batch)
+            self.last_batch_size = len(batch)
+            self.last_flush_time = elapsed
+            self.flush_time_total += elapsed
+            self.flush_time_max = max(self.flush_time_max, elapsed)
+        return ok
+
+    def stats(self):
+        with self.lock:
+            batches = self.batches or 1
+            return {
+                "queued": self.queue.qsize(),
+                "outbox_bytes": self.outbox.pending_bytes() if self.outbox is not None else 0,
+                "submitted": self.submitted,
+                "suppressed": self.suppressed,
+                "sent": self.sent,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "batches": self.batches,
+                "avg_batch_size": round((self.sent + self.failed) / batches, 1),
+                "last_batch_size": self.last_batch_size,
+                "avg_flush_ms": round(self.flush_time_total / batches * 1000, 2),
+                "max_flush_ms": round(self.flush_time_max * 1000, 2),
+                "last_flush_ms": round(self.last_flush_time * 1000, 2),
+                "encoder": self.encoder.name,
+                "encode_us_per_reading": round(self.encode_time_total / self.encoded * 1e6, 2) if self.encoded else None,
+                "encoded_bytes_per_reading": round(self.encoded_bytes / self.encoded) if self.encoded else None,
+                "encode_ms_total": round(self.encode_time_total * 1000, 1),
+            }